@@ -1,26 +1,88 @@
 import asyncio
+import threading
 import chainlit as cl
-from contextlib import ExitStack
+from contextlib import AsyncExitStack
 from langchain_core.messages import HumanMessage
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from src.agent import build_graph  
-from src.config import logger
+from src.config import logger, BIGQUERY_WARMUP, USE_VECTOR_DB, CATEGORY_RETRIEVAL_WARMUP, CATEGORY_CATALOG_PRELOAD
+from src.bigquery import warm_up_bq_client
+from src.category_retrieval import warm_up_category_retriever
+from src.category_catalog import start_refresh_scheduler
+from src.streaming import stream_turn
 
 SQLITE_PATH = "agent_memory.sqlite"
 
-def _invoke_blocking(text: str, thread_id: str):
-    with SqliteSaver.from_conn_string(SQLITE_PATH) as saver:
-        app = build_graph().compile(checkpointer=saver)
-        inputs = {"messages": [HumanMessage(content=text)]}
-        config = {"configurable": {"thread_id": thread_id}}
-        return app.invoke(inputs, config=config)
+# Aquece o cliente compartilhado do BigQuery sem bloquear a subida do servidor
+if BIGQUERY_WARMUP:
+    threading.Thread(target=warm_up_bq_client, daemon=True).start()
+# Abre o índice de categorias uma única vez por processo, também em segundo plano
+if USE_VECTOR_DB and CATEGORY_RETRIEVAL_WARMUP:
+    threading.Thread(target=warm_up_category_retriever, daemon=True).start()
+# Carrega o catálogo de categorias do fallback e o recarrega periodicamente
+if CATEGORY_CATALOG_PRELOAD:
+    start_refresh_scheduler()
+
+async def _cancel_running_turn(reason: str):
+    """
+    Cancela o turno em andamento na sessão (se houver). O cancelamento chega ao
+    executor de SQL, que cancela o job do BigQuery em execução.
+    """
+    task: asyncio.Task | None = cl.user_session.get("turn_task")
+    if task is not None and not task.done():
+        logger.info(f"Cancelando o turno em andamento: {reason}.")
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+def _final_answer(final_state: dict | None) -> str:
+    error = final_state.get("error") if final_state else None
+    answer = final_state.get("answer") if final_state else None
+    if error:
+        return f"Não foi possível processar sua solicitação: {error}"
+    if not answer and final_state and final_state.get("messages"):
+        return final_state["messages"][-1].content
+    return answer or "(sem resposta)"
+
+async def _run_turn(app, inputs: dict, thread_id: str):
+    """
+    Executa o turno em streaming: uma mensagem de status mostra a etapa em
+    andamento e a resposta aparece token a token, assim que o LLM a gera.
+    """
+    status = cl.Message(content="")
+    answer_msg = cl.Message(content="")
+    streamed = status_sent = False
+    final_state = None
+    try:
+        async for kind, value in stream_turn(app, inputs, {"configurable": {"thread_id": thread_id}}):
+            if kind == "progress":
+                status.content = f"⏳ {value}..."
+                await (status.update() if status_sent else status.send())
+                status_sent = True
+            elif kind == "token":
+                streamed = True
+                await answer_msg.stream_token(value)
+            else:
+                final_state = value
+    finally:
+        if status_sent:
+            await status.remove()
+
+    answer = _final_answer(final_state)
+    if streamed and not (final_state or {}).get("error"):
+        answer_msg.content = answer
+        await answer_msg.update()
+    else:
+        await cl.Message(content=answer).send()
 
 @cl.on_chat_start
 async def on_start():
-    stack = ExitStack()
+    stack = AsyncExitStack()
 
-    saver: SqliteSaver = stack.enter_context(SqliteSaver.from_conn_string(SQLITE_PATH))
+    saver: AsyncSqliteSaver = await stack.enter_async_context(AsyncSqliteSaver.from_conn_string(SQLITE_PATH))
 
     app = build_graph().compile(checkpointer=saver)
     logger.info("\nGrafo compilado com memória e pronto para uso interativo.")
@@ -58,28 +120,31 @@ async def on_msg(msg: cl.Message):
 
     thread_id = cl.user_session.get("thread_id", f"thread-{cl.context.session.id}")
 
+    # Uma nova mensagem substitui o turno anterior ainda em andamento
+    await _cancel_running_turn("nova mensagem do usuário")
+    inputs = {"messages": [HumanMessage(content=txt)]}
+    task = asyncio.create_task(_run_turn(app, inputs, thread_id))
+    cl.user_session.set("turn_task", task)
+
     try:
-        final_state = await asyncio.to_thread(_invoke_blocking, txt, thread_id)
+        await task
+    except asyncio.CancelledError:
+        task.cancel()
+        logger.info("Turno cancelado.")
     except Exception as e:
         logger.error(f"Erro durante a execução do agente: {e}", exc_info=True)
         await cl.Message(content="Agente: Desculpe, ocorreu um erro. Veja `agent.log`.").send()
-        return
-
-    error = final_state.get("error") if final_state else None
-    answer = final_state.get("answer") if final_state else None
-
-    if error:
-        answer = f"Não foi possível processar sua solicitação: {error}"
-    elif not answer and final_state and final_state.get("messages"):
-        answer = final_state["messages"][-1].content
 
-    await cl.Message(content=answer or "(sem resposta)").send()
+@cl.on_stop
+async def on_stop():
+    await _cancel_running_turn("interrompido pelo usuário")
 
 @cl.on_chat_end
 async def on_end():
-    stack: ExitStack = cl.user_session.get("stack")
+    await _cancel_running_turn("sessão encerrada")
+    stack: AsyncExitStack = cl.user_session.get("stack")
     if stack:
         try:
-            stack.close()
+            await stack.aclose()
         except Exception:
             pass
@@ -0,0 +1,131 @@
+"""
+Acurácia e latência do classificador local de intenção contra o roteador com LLM.
+
+Cada exemplo (casos de test_cases.json e decisões do LLM registradas) é
+classificado localmente deixando-o de fora dos exemplos. O relatório mostra a
+cobertura (quantas perguntas o classificador decide sem o LLM), a acurácia
+dessas decisões contra o rótulo do exemplo e, com --llm, contra a decisão do
+roteador com LLM para a mesma pergunta, além da latência de cada um.
+
+Uso:
+  python intent_classifier_report.py [--llm] [--threshold 0.8]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src import config as app_config
+from src import intent_classifier
+from src.nodes.intent import route_with_llm
+
+EVAL_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = EVAL_DIR / "results"
+
+
+def percentile_ms(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def evaluate(classifier: intent_classifier.IntentClassifier, use_llm: bool) -> list[dict]:
+    rows = []
+    for i, example in enumerate(classifier.examples):
+        started = time.perf_counter()
+        decision = intent_classifier.rule_decision(example["question"]) or classifier.predict(example["question"], exclude=i)
+        local_s = time.perf_counter() - started
+        row = {
+            "question": example["question"],
+            "origin": example["origin"],
+            "label": example["plan"],
+            "local_plan": decision["plan"] if decision else None,
+            "local_source": decision["source"] if decision else None,
+            "confidence": decision["confidence"] if decision else 0.0,
+            "local_s": local_s,
+        }
+        if use_llm:
+            started = time.perf_counter()
+            try:
+                row["llm_plan"] = route_with_llm(example["question"])
+            except Exception as e:
+                print(f"  Falha no roteador com LLM para '{example['question'][:50]}': {e}")
+                row["llm_plan"] = None
+            row["llm_s"] = time.perf_counter() - started
+        rows.append(row)
+    return rows
+
+
+def summarize(rows: list[dict], threshold: float, use_llm: bool) -> dict:
+    decided = [r for r in rows if r["local_plan"] and r["confidence"] >= threshold]
+    summary = {
+        "exemplos": len(rows),
+        "limiar": threshold,
+        "cobertura_local": len(decided) / len(rows) if rows else 0.0,
+        "decididas_por_regras": sum(1 for r in decided if r["local_source"] == "regras"),
+        "acuracia_local_vs_rotulo": (
+            sum(r["local_plan"] == r["label"] for r in decided) / len(decided) if decided else 0.0
+        ),
+        "latencia_local_p50_ms": percentile_ms([r["local_s"] for r in rows], 50),
+        "latencia_local_p95_ms": percentile_ms([r["local_s"] for r in rows], 95),
+    }
+    if use_llm:
+        compared = [r for r in decided if r["llm_plan"]]
+        answered = [r for r in rows if r["llm_plan"]]
+        summary.update({
+            "acuracia_local_vs_llm": (
+                sum(r["local_plan"] == r["llm_plan"] for r in compared) / len(compared) if compared else 0.0
+            ),
+            "acuracia_llm_vs_rotulo": (
+                sum(r["llm_plan"] == r["label"] for r in answered) / len(answered) if answered else 0.0
+            ),
+            "latencia_llm_p50_ms": percentile_ms([r["llm_s"] for r in rows], 50),
+            "latencia_llm_p95_ms": percentile_ms([r["llm_s"] for r in rows], 95),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificador local de intenção x roteador com LLM")
+    parser.add_argument("--llm", action="store_true", help="Também consulta o roteador com LLM para comparar")
+    parser.add_argument("--threshold", type=float, default=app_config.INTENT_CLASSIFIER_THRESHOLD)
+    args = parser.parse_args()
+
+    classifier = intent_classifier.IntentClassifier(intent_classifier.load_examples())
+    if not classifier.examples:
+        print("Nenhum exemplo: crie eval/test_cases.json ou rode o agente para registrar decisões do LLM.")
+        return
+    print(f"Exemplos: {len(classifier.examples)}")
+    rows = evaluate(classifier, args.llm)
+    summary = summarize(rows, args.threshold, args.llm)
+
+    print("\n" + "=" * 70)
+    print("CLASSIFICADOR LOCAL DE INTENÇÃO")
+    print("=" * 70)
+    print(f"  Cobertura local (limiar {args.threshold:.2f}): {summary['cobertura_local']:.1%} "
+          f"({summary['decididas_por_regras']} por regras)")
+    print(f"  Acurácia local x rótulo: {summary['acuracia_local_vs_rotulo']:.1%}")
+    if args.llm:
+        print(f"  Acurácia local x LLM:    {summary['acuracia_local_vs_llm']:.1%}")
+        print(f"  Acurácia LLM x rótulo:   {summary['acuracia_llm_vs_rotulo']:.1%}")
+    print(f"  Latência local: p50={summary['latencia_local_p50_ms']:.1f} ms, p95={summary['latencia_local_p95_ms']:.1f} ms")
+    if args.llm:
+        print(f"  Latência LLM:   p50={summary['latencia_llm_p50_ms']:.0f} ms, p95={summary['latencia_llm_p95_ms']:.0f} ms")
+    errors = [r for r in rows if r["local_plan"] and r["confidence"] >= args.threshold and r["local_plan"] != r["label"]]
+    for row in errors[:10]:
+        print(f"    erro: '{row['question'][:55]}' -> {row['local_plan']} (esperado {row['label']})")
+    print("=" * 70)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    summary_path = RESULTS_DIR / f"intent_classifier_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"resumo": summary, "exemplos": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\nResumo salvo em: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Relatório de poda de partições do Agente 1746.
+
+Lê as análises registradas pelo nó Analisador de Partições
+(`partition_pruning.jsonl` no diretório de cache) e agrupa as consultas por
+situação (intervalo de datas, filtro não sargável, varredura completa) e por
+padrão de pergunta, destacando os padrões que mais causam varreduras completas.
+
+Uso:
+  python partition_pruning_report.py [--top N]
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.partition_pruning import PARTITION_STATS_PATH
+
+EVAL_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = EVAL_DIR / "results"
+STATUSES = ["bounded", "non_sargable", "full_scan", "not_analyzed"]
+
+
+def load_entries() -> list[dict]:
+    if not PARTITION_STATS_PATH.exists():
+        return []
+    with open(PARTITION_STATS_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def question_pattern(question: str) -> str:
+    """Normaliza a pergunta: sem acentos, minúsculas, textos entre aspas e números genéricos."""
+    text = unicodedata.normalize("NFKD", question).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"(['\"]).*?\1", "<texto>", text)
+    text = re.sub(r"\d+([/-]\d+)*", "<n>", text)
+    return re.sub(r"\s+", " ", re.sub(r"[^\w<> ]", " ", text)).strip()
+
+
+def calculate_summary(entries: list[dict], top: int) -> dict:
+    """Contagem por situação e padrões de pergunta com mais varreduras completas."""
+    by_status = Counter(e["status"] for e in entries)
+    patterns = defaultdict(Counter)
+    for entry in entries:
+        patterns[question_pattern(entry["question"])][entry["status"]] += 1
+
+    full_scan_patterns = sorted(
+        ((pattern, counts) for pattern, counts in patterns.items() if counts["full_scan"] or counts["non_sargable"]),
+        key=lambda item: (item[1]["full_scan"], item[1]["non_sargable"]),
+        reverse=True,
+    )
+    return {
+        "total": len(entries),
+        "por_situacao": {status: by_status.get(status, 0) for status in STATUSES},
+        "reescritas": sum(1 for e in entries if e["rewrites"]),
+        "filtros_de_particao": sum(1 for e in entries if e["partition_filter_added"]),
+        "padroes_sem_poda": [
+            {"padrao": pattern, "full_scan": counts["full_scan"], "non_sargable": counts["non_sargable"],
+             "total": sum(counts.values())}
+            for pattern, counts in full_scan_patterns[:top]
+        ],
+    }
+
+
+def save_results(entries: list[dict], summary: dict, run_id: str):
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    details_path = RESULTS_DIR / f"partition_pruning_details_{run_id}.csv"
+    fields = ["timestamp", "status", "rewrites", "partition_filter_added", "question", "original_sql", "sql"]
+    with open(details_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows({**e, "rewrites": ",".join(e["rewrites"])} for e in entries)
+
+    summary_path = RESULTS_DIR / f"partition_pruning_summary_{run_id}.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\nResultados salvos em:")
+    print(f"  Detalhes: {details_path}")
+    print(f"  Resumo:   {summary_path}")
+
+
+def print_summary(summary: dict):
+    print("\n" + "=" * 70)
+    print("PODA DE PARTIÇÕES POR CONSULTA")
+    print("=" * 70)
+    for status, count in summary["por_situacao"].items():
+        share = count / summary["total"] if summary["total"] else 0
+        print(f"  {status:23s} {count:>6d} {share:>9.1%}")
+    print(f"  {'reescritas':23s} {summary['reescritas']:>6d}")
+    print(f"  {'filtros de partição':23s} {summary['filtros_de_particao']:>6d}")
+    print("-" * 70)
+    print("Padrões de pergunta sem poda (varredura completa / não sargável):")
+    for item in summary["padroes_sem_poda"]:
+        print(f"  {item['full_scan']:>4d} / {item['non_sargable']:<4d} {item['padrao'][:55]}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de poda de partições")
+    parser.add_argument("--top", type=int, default=20, help="Quantos padrões de pergunta listar")
+    args = parser.parse_args()
+
+    entries = load_entries()
+    print(f"Total de consultas analisadas: {len(entries)}")
+    if not entries:
+        return
+
+    summary = calculate_summary(entries, args.top)
+    save_results(entries, summary, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
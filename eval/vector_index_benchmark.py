@@ -0,0 +1,177 @@
+"""
+Comparação dos backends do índice de categorias: ChromaDB x matriz NumPy.
+
+Cada backend é medido em um processo separado, para que a memória de um não
+contamine a do outro: tempo de carga (criação do serviço + aquecimento),
+latência de busca por consulta (p50/p95, com os embeddings das consultas já
+calculados, isolando o índice) e memória residente (RSS) acrescida pela carga.
+Também compara os top-k dos dois backends (sobreposição média).
+
+As consultas são as perguntas de test_cases.json mais uma amostra dos próprios
+textos indexados; os embeddings vêm do cache de embeddings.
+
+Uso:
+  python vector_index_benchmark.py [--sample N] [--top-k K] [--repeat R]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src import config as _config
+from src.config import EMBEDDING_MODEL_NAME, NUMPY_INDEX_PATH
+from src.vector_index import METADATA_FILE, current_version, numpy_index_dir
+
+EVAL_DIR = Path(__file__).resolve().parent
+TEST_CASES_PATH = EVAL_DIR / "test_cases.json"
+RESULTS_DIR = EVAL_DIR / "results"
+BACKENDS = ["chroma", "numpy"]
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_worker(backend: str, queries_path: str, top_k: int, repeat: int):
+    """Executado no processo filho: mede um backend e imprime o resultado em JSON."""
+    from src import category_retrieval
+
+    _config.VECTOR_INDEX_BACKEND = backend
+    _config.HYBRID_RETRIEVAL_ENABLED = False
+    queries = np.load(queries_path)
+    rss_before = _rss_mib()
+    started = time.perf_counter()
+    retriever, _ = category_retrieval.get_retriever()
+    retriever.warm_up()
+    load_seconds = time.perf_counter() - started
+    rss_after_load = _rss_mib()
+
+    if backend == "chroma":
+        def search(vector):
+            result = retriever.collection.query(query_embeddings=[vector.tolist()], n_results=top_k,
+                                                include=["documents"])
+            return result["documents"][0]
+    else:
+        def search(vector):
+            return [retriever.index.documents[i] for i, _ in retriever.index.search(vector, top_k)[0]]
+
+    latencies, top = [], []
+    for _ in range(repeat):
+        for vector in queries:
+            started = time.perf_counter()
+            documents = search(vector)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if len(top) < len(queries):
+                top.append(documents)
+
+    batch_ms = None
+    if backend == "numpy":
+        started = time.perf_counter()
+        retriever.index.search(queries, top_k)
+        batch_ms = (time.perf_counter() - started) * 1000
+
+    print(json.dumps({
+        "backend": backend,
+        "load_ms": load_seconds * 1000,
+        "rss_load_mib": rss_after_load - rss_before,
+        "rss_total_mib": _rss_mib(),
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "batch_ms": batch_ms,
+        "top": top,
+    }))
+
+
+def load_queries(sample: int) -> list[str]:
+    """Perguntas dos casos de teste mais uma amostra dos textos indexados."""
+    questions = []
+    if TEST_CASES_PATH.exists():
+        with open(TEST_CASES_PATH, "r", encoding="utf-8") as f:
+            questions = [case["question"] for case in json.load(f).get("single_turn", [])]
+    with open(numpy_index_dir(NUMPY_INDEX_PATH, current_version(NUMPY_INDEX_PATH)) / METADATA_FILE, "r", encoding="utf-8") as f:
+        documents = json.load(f)["documents"]
+    return questions + random.Random(0).sample(documents, min(sample, len(documents)))
+
+
+def measure(backend: str, queries_path: str, top_k: int, repeat: int) -> dict | None:
+    completed = subprocess.run(
+        [sys.executable, __file__, "--worker", backend, "--queries-path", queries_path,
+         "--top-k", str(top_k), "--repeat", str(repeat)],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        print(f"  {backend}: falhou\n{completed.stderr.strip()[-2000:]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_summary(results: list[dict], overlap: float | None):
+    print("\n" + "=" * 70)
+    print("ÍNDICE DE CATEGORIAS: CHROMADB x NUMPY")
+    print("=" * 70)
+    print(f"  {'backend':8s} {'carga (ms)':>11s} {'RSS carga':>10s} {'RSS total':>10s} {'p50 (ms)':>9s} {'p95 (ms)':>9s}")
+    for r in results:
+        print(f"  {r['backend']:8s} {r['load_ms']:>11.1f} {r['rss_load_mib']:>9.1f}M {r['rss_total_mib']:>9.1f}M "
+              f"{r['query_p50_ms']:>9.3f} {r['query_p95_ms']:>9.3f}")
+    for r in results:
+        if r["batch_ms"] is not None:
+            print(f"  {r['backend']}: lote com todas as consultas em {r['batch_ms']:.2f} ms")
+    if overlap is not None:
+        print(f"  Sobreposição média dos top-k entre os backends: {overlap:.1%}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends do índice de categorias")
+    parser.add_argument("--sample", type=int, default=200, help="Textos indexados usados como consultas")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições de cada consulta")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--queries-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.queries_path, args.top_k, args.repeat)
+        return
+
+    from src.embedding_cache import embed_texts
+
+    queries = load_queries(args.sample)
+    print(f"Consultas: {len(queries)} (top-{args.top_k}, {args.repeat} repetições)")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queries_path = str(Path(tmp_dir) / "queries.npy")
+        np.save(queries_path, embed_texts(queries, EMBEDDING_MODEL_NAME))
+        results = [r for r in (measure(b, queries_path, args.top_k, args.repeat) for b in BACKENDS) if r]
+
+    overlap = None
+    if len(results) == 2:
+        overlap = statistics.mean(
+            len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(results[0]["top"], results[1]["top"])
+        )
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    summary_path = RESULTS_DIR / f"vector_index_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"consultas": len(queries), "top_k": args.top_k, "sobreposicao": overlap,
+                   "backends": [{k: v for k, v in r.items() if k != "top"} for r in results]},
+                  f, ensure_ascii=False, indent=2)
+    print_summary(results, overlap)
+    print(f"\nResumo salvo em: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 from langchain_core.messages import HumanMessage
 from langgraph.checkpoint.sqlite import SqliteSaver
 from src.agent import build_graph
-from src.config import logger
+from src.config import logger, BIGQUERY_WARMUP, USE_VECTOR_DB, CATEGORY_RETRIEVAL_WARMUP, CATEGORY_CATALOG_PRELOAD
+from src.bigquery import warm_up_bq_client
+from src.category_retrieval import warm_up_category_retriever
+from src.category_catalog import start_refresh_scheduler
 
 def main():
+    if BIGQUERY_WARMUP:
+        warm_up_bq_client()
+    if USE_VECTOR_DB and CATEGORY_RETRIEVAL_WARMUP:
+        warm_up_category_retriever()
+    if CATEGORY_CATALOG_PRELOAD:
+        start_refresh_scheduler()
+
     with SqliteSaver.from_conn_string("agent_memory.sqlite") as memory:
         compiled_graph = build_graph().compile(checkpointer=memory)
         logger.info("\nGrafo compilado com memória e pronto para uso interativo.")
@@ -0,0 +1,103 @@
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta, timezone
+from google.api_core.exceptions import NotFound
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from src.config import ROLLUP_TABLE_FULL_PATH, ROLLUP_REFRESH_DAYS, SQL_EXECUTOR_BACKEND, LOCAL_MIRROR_PATH, logger
+from src.bigquery import get_bq_client
+from src.rollups import ROLLUP_DATE_COLUMN, ROLLUP_DIMENSIONS, ROLLUP_COUNT_COLUMN, build_rollup_select
+from src import schema_cache
+
+def _last_rollup_day(client):
+    """Último dia presente nos agregados do BigQuery (None se a tabela não existe)."""
+    try:
+        query = f"SELECT MAX({ROLLUP_DATE_COLUMN}) AS ultimo FROM `{ROLLUP_TABLE_FULL_PATH}`"
+        return next(iter(client.query(query).result())).ultimo
+    except NotFound:
+        return None
+
+def build_on_bigquery(full: bool):
+    """
+    Mantém os agregados no BigQuery. A primeira execução (ou `--full`) recria a
+    tabela inteira; as seguintes recalculam apenas os últimos
+    `ROLLUP_REFRESH_DAYS` dias, numa transação.
+    """
+    client = get_bq_client()
+    project, dataset, _ = ROLLUP_TABLE_FULL_PATH.split(".")
+    client.create_dataset(f"{project}.{dataset}", exists_ok=True)
+
+    last_day = None if full else _last_rollup_day(client)
+    if last_day is None:
+        logger.info(f"Recriando a tabela de agregados '{ROLLUP_TABLE_FULL_PATH}'...")
+        client.query(
+            f"CREATE OR REPLACE TABLE `{ROLLUP_TABLE_FULL_PATH}`\n"
+            f"PARTITION BY {ROLLUP_DATE_COLUMN}\n"
+            f"CLUSTER BY categoria, tipo, subtipo\n"
+            f"AS\n{build_rollup_select()}"
+        ).result()
+    else:
+        since = (last_day - timedelta(days=ROLLUP_REFRESH_DAYS)).isoformat()
+        logger.info(f"Atualizando a tabela de agregados a partir de {since}...")
+        columns = ", ".join([ROLLUP_DATE_COLUMN, *ROLLUP_DIMENSIONS, ROLLUP_COUNT_COLUMN])
+        client.query(
+            "BEGIN TRANSACTION;\n"
+            f"DELETE FROM `{ROLLUP_TABLE_FULL_PATH}` WHERE {ROLLUP_DATE_COLUMN} >= '{since}';\n"
+            f"INSERT INTO `{ROLLUP_TABLE_FULL_PATH}` ({columns})\n{build_rollup_select(since)};\n"
+            "COMMIT TRANSACTION;"
+        ).result()
+    schema_cache.invalidate(ROLLUP_TABLE_FULL_PATH)
+
+def build_on_local_mirror():
+    """
+    Recalcula os agregados a partir do espelho local (operação barata, sempre
+    completa) e troca o arquivo Parquet de forma atômica.
+    """
+    from src.local_mirror import (
+        MIRROR_TABLES, get_connection, reset_connection, read_manifest, save_manifest, translate_bigquery_sql,
+    )
+
+    view = MIRROR_TABLES[ROLLUP_TABLE_FULL_PATH]
+    path = LOCAL_MIRROR_PATH / view / "data.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    query = translate_bigquery_sql(build_rollup_select())
+    get_connection().cursor().execute(
+        f"COPY ({query}) TO '{tmp_path}' (FORMAT PARQUET, COMPRESSION ZSTD)"
+    )
+    os.replace(tmp_path, path)
+
+    manifest = read_manifest()
+    manifest[view] = {"synced_at": datetime.now(timezone.utc).isoformat()}
+    save_manifest(manifest)
+    reset_connection()
+
+def main():
+    """
+    Cria ou atualiza a tabela de agregados diários usada pelo reescritor de
+    consultas (`src/rollups.py`).
+    """
+    parser = argparse.ArgumentParser(description="Atualiza a tabela de agregados diários de chamados")
+    parser.add_argument("--backend", choices=["bigquery", "duckdb"], default=SQL_EXECUTOR_BACKEND,
+                        help="Onde manter os agregados. Padrão: SQL_EXECUTOR_BACKEND.")
+    parser.add_argument("--full", action="store_true",
+                        help="Recria a tabela inteira em vez de recalcular apenas os dias recentes.")
+    args = parser.parse_args()
+
+    logger.info(f"Iniciando atualização dos agregados ({args.backend}): {ROLLUP_TABLE_FULL_PATH}")
+    try:
+        if args.backend == "duckdb":
+            build_on_local_mirror()
+        else:
+            build_on_bigquery(args.full)
+    except Exception as e:
+        logger.error(f"Falha ao atualizar os agregados: {e}")
+        return
+
+    logger.info("Agregados atualizados com sucesso!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import argparse
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from src.config import CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH, BIGQUERY_BACKEND, LOCAL_MIRROR_PATH, logger
+from src.local_mirror import MIRROR_TABLES, read_manifest, save_manifest, reset_connection
+
+# Amostra sintética: bairro -> subprefeitura
+BAIRROS = {
+    "Centro": "Centro", "Lapa": "Centro", "Santa Teresa": "Centro", "Botafogo": "Zona Sul",
+    "Copacabana": "Zona Sul", "Flamengo": "Zona Sul", "Ipanema": "Zona Sul", "Leblon": "Zona Sul",
+    "Tijuca": "Grande Tijuca", "Vila Isabel": "Grande Tijuca", "Maracanã": "Grande Tijuca",
+    "Méier": "Zona Norte", "Madureira": "Zona Norte", "Penha": "Zona Norte", "Irajá": "Zona Norte",
+    "Bonsucesso": "Zona Norte", "Ilha do Governador": "Ilha do Governador", "Barra da Tijuca": "Barra da Tijuca",
+    "Recreio dos Bandeirantes": "Barra da Tijuca", "Jacarepaguá": "Jacarepaguá", "Taquara": "Jacarepaguá",
+    "Campo Grande": "Zona Oeste", "Bangu": "Zona Oeste", "Realengo": "Zona Oeste", "Santa Cruz": "Zona Oeste",
+    "Guaratiba": "Zona Oeste",
+}
+# Amostra sintética: categoria -> tipo -> subtipos
+SERVICOS = {
+    "Serviço": {
+        "Iluminação Pública": ["Reparo de lâmpada apagada", "Reparo de luminária", "Reparo de poste fora de prumo"],
+        "Conservação de Vias": ["Reparo de buraco, deformação ou afundamento na pista", "Reparo de calçada"],
+        "Poda e Remoção de Árvores": ["Poda de árvore em logradouro", "Remoção de árvore", "Avaliação de risco de árvore"],
+        "Limpeza Urbana": ["Remoção de entulho e bens inservíveis", "Varrição de logradouro", "Coleta de lixo"],
+        "Drenagem": ["Desobstrução de bueiros, galerias ou ramais", "Reparo de tampão ou grelha"],
+    },
+    "Reclamação": {
+        "Fiscalização de Estacionamento": ["Estacionamento irregular", "Veículo abandonado"],
+        "Poluição Sonora": ["Perturbação do sossego"],
+        "Ordem Pública": ["Ocupação irregular de via pública", "Comércio ambulante irregular"],
+    },
+    "Informação": {
+        "Transporte": ["Informações sobre linhas de ônibus"],
+        "Tributos": ["Informações sobre IPTU"],
+    },
+    "Solicitação": {
+        "Estrutura de Imóvel": ["Verificação de ameaça de desabamento de estrutura", "Fiscalização de obras em imóvel privado"],
+        "Vigilância Sanitária": ["Fiscalização de condições sanitárias", "Controle de roedores e vetores"],
+    },
+}
+STATUS = ["Fechado com solução", "Fechado sem solução", "Aberto", "Em andamento", "Não constatado"]
+STATUS_WEIGHTS = [0.62, 0.12, 0.1, 0.1, 0.06]
+
+
+def _write_parquet(table: pa.Table, path):
+    """Grava o Parquet em arquivo temporário e o move para o destino (troca atômica)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def _zipf_weights(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Pesos de cauda longa, como a distribuição real dos serviços e bairros."""
+    weights = 1.0 / np.arange(1, n + 1) ** 1.1
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def synthetic_tables(rows: int, start: date, end: date, seed: int) -> tuple[pa.Table, pa.Table]:
+    """Tabelas de bairros e de chamados sintéticas, com as colunas usadas pelo agente."""
+    rng = np.random.default_rng(seed)
+    bairro_ids = [str(i + 1) for i in range(len(BAIRROS))]
+    bairros = pa.table({
+        "id_bairro": bairro_ids,
+        "nome": list(BAIRROS),
+        "subprefeitura": list(BAIRROS.values()),
+    })
+
+    services = [(cat, tipo, sub) for cat, tipos in SERVICOS.items() for tipo, subs in tipos.items() for sub in subs]
+    service = rng.choice(len(services), size=rows, p=_zipf_weights(len(services), rng))
+    bairro = rng.choice(len(bairro_ids), size=rows, p=_zipf_weights(len(bairro_ids), rng))
+    span = int((datetime.combine(end, datetime.min.time()) - datetime.combine(start, datetime.min.time())).total_seconds())
+    offsets = np.sort(rng.integers(0, span, size=rows))
+    inicio = np.datetime64(start.isoformat(), "s") + offsets.astype("timedelta64[s]")
+    duracao = (rng.exponential(5 * 86400, size=rows)).astype("timedelta64[s]")
+    status = rng.choice(len(STATUS), size=rows, p=STATUS_WEIGHTS)
+    fechado = np.isin(status, [0, 1, 4])
+
+    inicio_dt = inicio.astype("datetime64[us]")
+    chamados = pa.table({
+        "id_chamado": [f"{i:08d}" for i in range(1, rows + 1)],
+        "data_inicio": pa.array(inicio_dt, type=pa.timestamp("us")),
+        "data_fim": pa.array(np.where(fechado, inicio_dt + duracao, np.datetime64("NaT", "us")), type=pa.timestamp("us")),
+        "id_bairro": [bairro_ids[i] for i in bairro],
+        "categoria": [services[i][0] for i in service],
+        "tipo": [services[i][1] for i in service],
+        "subtipo": [services[i][2] for i in service],
+        "status": [STATUS[i] for i in status],
+        "data_particao": pa.array(inicio.astype("datetime64[M]").astype("datetime64[D]"), type=pa.date32()),
+    })
+    return bairros, chamados
+
+
+def bigquery_sample(percent: float) -> tuple[pa.Table, pa.Table]:
+    """Amostra das tabelas reais (TABLESAMPLE) e a tabela de bairros inteira."""
+    from src.bigquery import get_bq_client
+    if BIGQUERY_BACKEND == "local":
+        raise SystemExit("--bigquery-percent lê as tabelas reais: use BIGQUERY_BACKEND=bigquery.")
+    client = get_bq_client()
+    bairros = client.query(f"SELECT * FROM `{BAIRROS_TABLE_FULL_PATH}`").result().to_arrow()
+    chamados = client.query(
+        f"SELECT * FROM `{CHAMADOS_TABLE_FULL_PATH}` TABLESAMPLE SYSTEM ({percent:g} PERCENT)"
+    ).result().to_arrow()
+    return bairros, chamados
+
+
+def write_mirror(bairros: pa.Table, chamados: pa.Table):
+    """Grava as tabelas no formato do espelho (chamados em partições `mes=AAAA-MM`) e o manifesto."""
+    synced_at = datetime.now(timezone.utc).isoformat()
+    manifest = read_manifest()
+
+    view = MIRROR_TABLES[BAIRROS_TABLE_FULL_PATH]
+    _write_parquet(bairros, LOCAL_MIRROR_PATH / view / "data.parquet")
+    manifest[view] = {"synced_at": synced_at}
+
+    view = MIRROR_TABLES[CHAMADOS_TABLE_FULL_PATH]
+    months = pc.strftime(chamados["data_inicio"], format="%Y-%m")
+    partitions = sorted(month for month in pc.unique(months).to_pylist() if month)
+    for partition in partitions:
+        _write_parquet(chamados.filter(pc.equal(months, partition)), LOCAL_MIRROR_PATH / view / f"mes={partition}" / "data.parquet")
+    manifest[view] = {"last_partition": partitions[-1] if partitions else None, "synced_at": synced_at}
+    save_manifest(manifest)
+    reset_connection()
+    logger.info(
+        f"Amostra gravada em '{LOCAL_MIRROR_PATH}': {bairros.num_rows} bairros, "
+        f"{chamados.num_rows} chamados em {len(partitions)} partições."
+    )
+
+
+def main():
+    """
+    Cria no espelho local uma amostra das tabelas do 1746 para o cliente local
+    compatível com o BigQuery (BIGQUERY_BACKEND=local) e para o backend DuckDB:
+    sintética por padrão ou, com --bigquery-percent, amostrada das tabelas reais.
+    """
+    parser = argparse.ArgumentParser(description="Cria uma amostra local das tabelas do 1746")
+    parser.add_argument("--rows", type=int, default=200_000, help="Chamados sintéticos. Padrão: 200000.")
+    parser.add_argument("--start", type=str, default="2021-01", help="Mês inicial (AAAA-MM) dos chamados sintéticos.")
+    parser.add_argument("--end", type=str, default=None, help="Mês final (AAAA-MM). Padrão: mês atual.")
+    parser.add_argument("--seed", type=int, default=1746)
+    parser.add_argument("--bigquery-percent", type=float, default=None,
+                        help="Amostra este percentual das tabelas reais em vez de gerar dados sintéticos.")
+    args = parser.parse_args()
+
+    if args.bigquery_percent:
+        logger.info(f"Amostrando {args.bigquery_percent:g}% de '{CHAMADOS_TABLE_FULL_PATH}' do BigQuery...")
+        bairros, chamados = bigquery_sample(args.bigquery_percent)
+    else:
+        start = datetime.strptime(args.start, "%Y-%m").date()
+        end_month = datetime.strptime(args.end, "%Y-%m").date() if args.end else date.today().replace(day=1)
+        end = (end_month + timedelta(days=32)).replace(day=1)
+        logger.info(f"Gerando {args.rows} chamados sintéticos de {start:%Y-%m} a {end_month:%Y-%m}...")
+        bairros, chamados = synthetic_tables(args.rows, start, end, args.seed)
+    write_mirror(bairros, chamados)
+    print(f"Amostra gravada em {LOCAL_MIRROR_PATH} ({chamados.num_rows} chamados).")
+
+
+if __name__ == "__main__":
+    main()
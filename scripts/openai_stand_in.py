@@ -0,0 +1,392 @@
+"""
+Servidor local compatível com a API da OpenAI, para testes de carga offline.
+
+Responde a `/v1/chat/completions` (com e sem streaming, saída estruturada por
+`tools` ou `response_format`), `/v1/embeddings` e `/v1/models`, com latências
+sorteadas das distribuições configuradas (`src/latency.py`). As respostas vêm
+das regras de `--responses` (lista JSON de `{"match": regex, "response": texto
+ou objeto, "latency": distribuição opcional}`, testadas na ordem contra o
+prompt) ou de respostas padrão plausíveis para cada nó do agente. Os
+embeddings são determinísticos (saco de palavras com hash), então o cache
+semântico e o índice de categorias funcionam entre processos.
+
+Uso (com LOCAL_STAND_INS=true o agente aponta para http://127.0.0.1:8765/v1):
+  python scripts/openai_stand_in.py [--port 8765] [--chat-latency lognormal:700:0.4]
+  curl http://127.0.0.1:8765/stats
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import unicodedata
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from src.config import CHAMADOS_TABLE_FULL_PATH, logger
+from src.latency import LatencyDistribution
+
+# Pergunta do usuário em cada prompt do agente (roteador, expansão, SQL, chat, síntese)
+QUESTION_PATTERNS = [
+    re.compile(r'ÚLTIMA Pergunta:\s*"(.*?)"\s*$', re.DOTALL),
+    re.compile(r'PERGUNTA DO USUÁRIO:\s*"(.*?)"', re.DOTALL),
+    re.compile(r'A pergunta atual do usuário é:\s*"(.*?)"', re.DOTALL),
+    re.compile(r'<PERGUNTA>\s*(.*?)\s*</PERGUNTA>', re.DOTALL),
+    re.compile(r'Pergunta:\s*"(.*?)"', re.DOTALL),
+]
+GREETING = re.compile(r"^\s*(oi|olá|ola|bom dia|boa tarde|boa noite|obrigad[oa]|valeu|tchau)\b", re.IGNORECASE)
+FILLER = (
+    "Segundo os dados do 1746, este é o resultado consolidado para o período consultado, "
+    "considerando todos os chamados registrados pela central de atendimento da Prefeitura do Rio."
+).split()
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    """Texto de todas as mensagens (o conteúdo pode vir em partes)."""
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _question(prompt: str) -> str:
+    for pattern in QUESTION_PATTERNS:
+        match = pattern.search(prompt)
+        if match:
+            return match.group(1).strip()
+    return prompt.strip().splitlines()[-1] if prompt.strip() else ""
+
+
+def _tokens(text: str) -> int:
+    """Estimativa de tokens (~4 caracteres por token), só para o campo `usage`."""
+    return max(1, len(text) // 4)
+
+
+def default_plan(question: str) -> str:
+    if GREETING.search(question):
+        return "chat"
+    return "sql_contextual" if re.search(r"['\"“”]", question) else "sql_direct"
+
+
+def default_sql(question: str) -> str:
+    """Uma contagem de chamados válida no espelho, filtrada pelo ano citado e pelo serviço entre aspas."""
+    filters = []
+    year = re.search(r"\b(20\d\d)\b", question)
+    if year:
+        filters.append(f"EXTRACT(YEAR FROM data_inicio) = {year.group(1)}")
+    quoted = re.search(r"['\"“]([^'\"”]+)['\"”]", question)
+    if quoted:
+        value = quoted.group(1).replace("'", "\\'")
+        filters.append(f"LOWER(subtipo) = LOWER('{value}')")
+    where = f"\nWHERE {' AND '.join(filters)}" if filters else ""
+    return f"SELECT COUNT(*) AS total_chamados\nFROM `{CHAMADOS_TABLE_FULL_PATH}`{where}"
+
+
+def default_text(prompt: str, words: int) -> str:
+    question = _question(prompt)
+    if "SQL GERADO:" in prompt:
+        return default_sql(question)
+    if "pergunta expandida" in prompt:
+        return question
+    if "Resumo atual" in prompt:
+        return "O usuário consultou quantidades de chamados do 1746 por período e serviço."
+    if GREETING.search(question):
+        return "Olá! Posso ajudar com perguntas sobre os chamados do 1746."
+    return " ".join(FILLER[i % len(FILLER)] for i in range(words))
+
+
+def default_structured(schema: dict, prompt: str):
+    """Objeto mínimo que satisfaz o esquema (o campo `plan` segue a heurística do roteador)."""
+    result = {}
+    for name, spec in (schema.get("properties") or {}).items():
+        if name == "plan":
+            result[name] = default_plan(_question(prompt))
+        elif spec.get("enum"):
+            result[name] = spec["enum"][0]
+        else:
+            result[name] = {"string": "", "integer": 0, "number": 0, "boolean": False, "array": []}.get(spec.get("type"), None)
+    return result
+
+
+def hashed_embedding(text: str, dimensions: int) -> list[float]:
+    """Vetor determinístico: palavras e trigramas com hash estável, normalizado."""
+    normalized = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    words = re.findall(r"\w+", normalized)
+    features = words + [word[i:i + 3] for word in words for i in range(max(len(word) - 2, 1))]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in features:
+        digest = hashlib.md5(feature.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class StandIn:
+    """Configuração, regras de resposta e estatísticas do servidor (compartilhadas entre as threads)."""
+
+    def __init__(self, args):
+        self.chat_latency = LatencyDistribution(args.chat_latency, seed=args.seed)
+        self.embeddings_latency = LatencyDistribution(args.embeddings_latency, seed=args.seed)
+        self.token_interval = args.token_interval_ms / 1000
+        self.answer_words = args.answer_words
+        self.dimensions = args.dimensions
+        self.error_rate = args.error_rate
+        self.rules = []
+        if args.responses:
+            with open(args.responses, encoding="utf-8") as f:
+                for rule in json.load(f):
+                    self.rules.append({
+                        "match": re.compile(rule["match"], re.DOTALL),
+                        "response": rule["response"],
+                        "latency": LatencyDistribution(rule["latency"]) if rule.get("latency") else None,
+                    })
+        self._random = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._latencies = {"chat": deque(maxlen=10_000), "embeddings": deque(maxlen=10_000)}
+        self._in_flight = 0
+        self._max_in_flight = 0
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def rule_for(self, prompt: str) -> dict | None:
+        return next((rule for rule in self.rules if rule["match"].search(prompt)), None)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def leave(self, kind: str, seconds: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._latencies[kind].append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = {
+                kind: {
+                    "n": len(values),
+                    "p50_ms": float(np.percentile(values, 50)) * 1000 if values else 0.0,
+                    "p95_ms": float(np.percentile(values, 95)) * 1000 if values else 0.0,
+                }
+                for kind, values in self._latencies.items()
+            }
+            return {
+                **dict(self._counts), "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight, "latency": latencies,
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stand_in: StandIn
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict | None = None):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: str):
+        payload = data.encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _rate_limited(self) -> bool:
+        if not self.stand_in.should_fail():
+            return False
+        self.stand_in.count("erros_429")
+        self._send_json(
+            {"error": {"message": "Rate limit simulado pelo substituto local.", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+            status=429, headers={"retry-after": "0"},
+        )
+        return True
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": "stand-in", "object": "model", "owned_by": "local"}]})
+        elif self.path.rstrip("/") == "/stats":
+            self._send_json(self.stand_in.stats())
+        else:
+            self._send_json({"error": {"message": f"Rota desconhecida: {self.path}"}}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json({"error": {"message": "JSON inválido."}}, status=400)
+            return
+        path = self.path.rstrip("/")
+        if path == "/v1/chat/completions":
+            self._timed("chat", self._chat, body)
+        elif path == "/v1/embeddings":
+            self._timed("embeddings", self._embeddings, body)
+        else:
+            self._send_json({"error": {"message": f"Rota desconhecida: {self.path}"}}, status=404)
+
+    def _timed(self, kind: str, handler, body: dict):
+        started = time.perf_counter()
+        self.stand_in.enter()
+        try:
+            self.stand_in.count(kind)
+            if not self._rate_limited():
+                handler(body)
+        finally:
+            self.stand_in.leave(kind, time.perf_counter() - started)
+
+    def _chat(self, body: dict):
+        prompt = _prompt_text(body.get("messages") or [])
+        rule = self.stand_in.rule_for(prompt)
+        (rule["latency"] if rule and rule["latency"] else self.stand_in.chat_latency).sleep()
+
+        schema, tool_name = None, None
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"].get("schema") or {}
+        elif body.get("tools"):
+            function = body["tools"][0]["function"]
+            schema, tool_name = function.get("parameters") or {}, function["name"]
+
+        if schema is not None:
+            scripted = rule["response"] if rule else None
+            if isinstance(scripted, str):
+                scripted = json.loads(scripted)
+            content = json.dumps(scripted if scripted is not None else default_structured(schema, prompt), ensure_ascii=False)
+        else:
+            content = str(rule["response"]) if rule else default_text(prompt, self.stand_in.answer_words)
+
+        message = {"role": "assistant", "content": content}
+        finish_reason = "stop"
+        if tool_name:
+            call = {"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function", "function": {"name": tool_name, "arguments": content}}
+            message = {"role": "assistant", "content": None, "tool_calls": [call]}
+            finish_reason = "tool_calls"
+        usage = {
+            "prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(content),
+            "total_tokens": _tokens(prompt) + _tokens(content),
+        }
+        self.stand_in.count("tokens_gerados", usage["completion_tokens"])
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()), "model": body.get("model", "stand-in")}
+
+        if not body.get("stream"):
+            self._send_json({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta: dict, finish: str | None = None, **extra):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}], **extra}
+            self._send_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+
+        if tool_name:
+            call = message["tool_calls"][0]
+            event({"role": "assistant", "content": None, "tool_calls": [{"index": 0, **call}]})
+        else:
+            event({"role": "assistant", "content": ""})
+            for piece in re.findall(r"\S+\s*|\s+", content):
+                if self.stand_in.token_interval:
+                    time.sleep(self.stand_in.token_interval)
+                event({"content": piece})
+        event({}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._send_chunk("data: [DONE]\n\n")
+        self._send_chunk("")
+
+    def _embeddings(self, body: dict):
+        self.stand_in.embeddings_latency.sleep()
+        texts = body.get("input") or []
+        if isinstance(texts, str) or (texts and isinstance(texts[0], int)):
+            texts = [texts]
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in texts]
+        dimensions = int(body.get("dimensions") or self.stand_in.dimensions)
+        data = []
+        for i, text in enumerate(texts):
+            vector = hashed_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(_tokens(text) for text in texts)
+        self.stand_in.count("textos_embedados", len(texts))
+        self._send_json({
+            "object": "list", "data": data, "model": body.get("model", "stand-in"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API da OpenAI")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chat-latency", type=str, default="lognormal:700:0.4",
+                        help="Distribuição da latência até a resposta (ou o primeiro token). Padrão: lognormal:700:0.4.")
+    parser.add_argument("--embeddings-latency", type=str, default="lognormal:80:0.3")
+    parser.add_argument("--token-interval-ms", type=float, default=15, help="Intervalo entre tokens no streaming.")
+    parser.add_argument("--answer-words", type=int, default=60, help="Tamanho das respostas padrão em texto.")
+    parser.add_argument("--responses", type=str, default=None, help="Arquivo JSON com as respostas roteirizadas.")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração das chamadas respondidas com 429.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    Handler.stand_in = StandIn(args)
+    server = StandInServer((args.host, args.port), Handler)
+    logger.info(
+        f"Substituto da OpenAI em http://{args.host}:{args.port}/v1 "
+        f"(chat {args.chat_latency}, embeddings {args.embeddings_latency}, {len(Handler.stand_in.rules)} regras)."
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(Handler.stand_in.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import argparse
+from datetime import date, datetime, timezone
+import pyarrow.parquet as pq
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from src.config import CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH, LOCAL_MIRROR_PATH, USE_BQ_STORAGE_API, logger
+from src.bigquery import get_bq_client, get_bqstorage_client
+from src.local_mirror import MIRROR_TABLES, read_manifest, save_manifest
+
+def _next_month(month: date) -> date:
+    return date(month.year + (month.month // 12), month.month % 12 + 1, 1)
+
+def _write_parquet(table, path):
+    """Grava o Parquet em arquivo temporário e o move para o destino (troca atômica)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+def _to_arrow(client, query: str):
+    bqstorage_client = get_bqstorage_client() if USE_BQ_STORAGE_API else None
+    return client.query(query).result().to_arrow(bqstorage_client=bqstorage_client)
+
+def sync_chamados(client, manifest: dict, since: date | None):
+    """
+    Sincroniza a tabela de chamados mês a mês (partição `mes=AAAA-MM` por `data_inicio`).
+    Recomeça pelo último mês sincronizado, que pode ter recebido chamados novos.
+    """
+    view = MIRROR_TABLES[CHAMADOS_TABLE_FULL_PATH]
+    state = manifest.get(view, {})
+
+    if since is None and state.get("last_partition"):
+        since = datetime.strptime(state["last_partition"], "%Y-%m").date()
+    if since is None:
+        query = f"SELECT DATE_TRUNC(DATE(MIN(data_inicio)), MONTH) AS inicio FROM `{CHAMADOS_TABLE_FULL_PATH}`"
+        since = next(iter(client.query(query).result())).inicio
+
+    today = date.today()
+    current = date(today.year, today.month, 1)
+    month = date(since.year, since.month, 1)
+    while month <= current:
+        end = _next_month(month)
+        query = (
+            f"SELECT * FROM `{CHAMADOS_TABLE_FULL_PATH}` "
+            f"WHERE data_inicio >= '{month.isoformat()}' AND data_inicio < '{end.isoformat()}'"
+        )
+        table = _to_arrow(client, query)
+        partition = month.strftime("%Y-%m")
+        _write_parquet(table, LOCAL_MIRROR_PATH / view / f"mes={partition}" / "data.parquet")
+        logger.info(f"Partição {partition} de '{view}' sincronizada ({table.num_rows} linhas).")
+
+        manifest[view] = {
+            "last_partition": partition,
+            "synced_at": datetime.now(timezone.utc).isoformat(),
+        }
+        save_manifest(manifest)
+        month = end
+
+def sync_bairros(client, manifest: dict):
+    """A tabela de bairros é pequena e é sempre copiada por inteiro."""
+    view = MIRROR_TABLES[BAIRROS_TABLE_FULL_PATH]
+    table = _to_arrow(client, f"SELECT * FROM `{BAIRROS_TABLE_FULL_PATH}`")
+    _write_parquet(table, LOCAL_MIRROR_PATH / view / "data.parquet")
+    manifest[view] = {"synced_at": datetime.now(timezone.utc).isoformat()}
+    save_manifest(manifest)
+    logger.info(f"Tabela '{view}' sincronizada ({table.num_rows} linhas).")
+
+def main():
+    """
+    Atualiza incrementalmente o espelho local (Parquet) das tabelas do 1746
+    usado pelo backend de execução DuckDB.
+    """
+    parser = argparse.ArgumentParser(description="Sincroniza o espelho local das tabelas do 1746")
+    parser.add_argument("--since", type=str, default=None,
+                        help="Mês inicial (AAAA-MM). Padrão: último mês sincronizado ou o início da tabela.")
+    args = parser.parse_args()
+    since = datetime.strptime(args.since, "%Y-%m").date() if args.since else None
+
+    logger.info(f"Iniciando sincronização do espelho local em: {LOCAL_MIRROR_PATH}")
+    try:
+        client = get_bq_client()
+        manifest = read_manifest()
+        sync_bairros(client, manifest)
+        sync_chamados(client, manifest, since)
+    except Exception as e:
+        logger.error(f"Falha na sincronização do espelho local: {e}")
+        return
+
+    logger.info("Sincronização do espelho local concluída com sucesso!")
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,234 @@
 import os
 import sys
-import chromadb
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+import time
+import random
+import shutil
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
-from src.config import CHAMADOS_TABLE_FULL_PATH, CATEGORICAL_COLUMNS, logger
-from src.bigquery import get_bq_client
+from src.config import (
+    EMBEDDING_MODEL_NAME, CHROMA_PATH, NUMPY_INDEX_PATH, VECTOR_INDEX_BACKEND, OPENAI_API_KEY, OPENAI_BASE_URL, logger,
+)
+from src import category_catalog
+from src.category_retrieval import chroma_collection_name
+from src.embedding_cache import embed_texts, format_stats as embedding_cache_stats
+from src.vector_index import (
+    NumpyVectorIndex, category_id, current_version, set_current_version, numpy_index_dir, save_index,
+)
 
-CHROMA_PATH = os.path.join(project_root, "chroma_db_index")
-EMBEDDING_MODEL_NAME = "text-embedding-3-small"
-COLLECTION_NAME = "categories_1746"
+# Versões mantidas além da ativa (a anterior serve de rollback)
+KEEP_PREVIOUS_VERSIONS = 1
 
-def main():
+
+def load_categories() -> list[dict]:
+    """Valores e contagens das colunas categóricas, em uma varredura do BigQuery (catálogo)."""
+    catalog = category_catalog.refresh()
+    return [
+        {
+            "id": category_id(column, value),
+            "text": value,
+            "metadata": {"source_column": column, "n_chamados": n_chamados},
+        }
+        for column, values in catalog["columns"].items()
+        for value, n_chamados in values
+    ]
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or "rate limit" in str(error).lower()
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _embed_with_backoff(texts: list[str], max_retries: int, refresh: bool = False) -> np.ndarray:
+    """Embeddings de um lote, com espera exponencial (e `retry-after`) em limites de taxa."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embed_texts(texts, EMBEDDING_MODEL_NAME, refresh=refresh)
+        except Exception as e:
+            if attempt == max_retries or not _is_rate_limit(e):
+                raise
+            wait = _retry_after(e) or min(60.0, 2 ** attempt) * (1 + random.random())
+            logger.warning(f"Limite de taxa da API de embeddings; nova tentativa em {wait:.1f}s.")
+            time.sleep(wait)
+
+
+def embed_new(
+    documents: list[str], batch_size: int, workers: int, max_retries: int, refresh: bool = False
+) -> np.ndarray:
     """
-    Busca categorias do BigQuery, gera embeddings e os armazena no ChromaDB.
+    Embeddings dos textos novos, em lotes processados em paralelo (com `refresh`,
+    sem reaproveitar o cache de embeddings).
     """
-    logger.info("Iniciando processo de indexação de categorias para RAG...")
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for n, matrix in enumerate(executor.map(lambda batch: _embed_with_backoff(batch, max_retries, refresh), batches), 1):
+            results.append(matrix)
+            logger.info(f"Processado lote {n}/{len(batches)}")
+    return np.vstack(results)
 
-    try:
-        client = get_bq_client()
-        all_documents = []
-        for column in CATEGORICAL_COLUMNS:
-            logger.info(f"Buscando valores distintos para a coluna: {column}")
-            query = f"SELECT DISTINCT {column} FROM `{CHAMADOS_TABLE_FULL_PATH}` WHERE {column} IS NOT NULL"
-            results = client.query(query).to_dataframe()
-            for value in results[column].tolist():
-                all_documents.append({
-                    "text": value,
-                    "metadata": {"source_column": column}
-                })
-        logger.info(f"Total de {len(all_documents)} categorias únicas encontradas.")
-    except Exception as e:
-        logger.error(f"Falha ao buscar dados do BigQuery: {e}")
-        return
 
-    logger.info(f"Carregando modelo de embedding: {EMBEDDING_MODEL_NAME}...")
-    embedding_fn = OpenAIEmbeddingFunction(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        model_name=EMBEDDING_MODEL_NAME,
+def build_embeddings(categories: list[dict], previous: dict[str, np.ndarray], args) -> np.ndarray:
+    """
+    Matriz na ordem de `categories`: vetores de IDs já indexados são
+    reaproveitados e só os valores novos vão para a API de embeddings.
+    """
+    new = [item for item in categories if item["id"] not in previous]
+    stale = len(set(previous) - {item["id"] for item in categories})
+    logger.info(
+        f"Diferença com o índice ativo: {len(categories) - len(new)} reaproveitados, "
+        f"{len(new)} novos, {stale} removidos."
+    )
+    started = time.perf_counter()
+    computed = dict(zip(
+        (item["id"] for item in new),
+        embed_new([item["text"] for item in new], args.batch_size, args.workers, args.max_retries, args.full),
+    ))
+    if new:
+        logger.info(f"Embeddings dos valores novos calculados em {time.perf_counter() - started:.1f}s.")
+    return np.vstack([previous.get(item["id"], computed.get(item["id"])) for item in categories])
+
+
+def prune_versions(versions: list[str], active: str, remove):
+    """Remove as versões antigas, mantendo a ativa e as `KEEP_PREVIOUS_VERSIONS` anteriores."""
+    older = sorted(v for v in versions if v < active)
+    for version in older[:max(0, len(older) - KEEP_PREVIOUS_VERSIONS)]:
+        remove(version)
+        logger.info(f"Versão antiga removida: {version}")
+
+
+def index_on_numpy(categories: list[dict], version: str, args):
+    """
+    Grava as categorias como matriz NumPy normalizada + metadados, o formato
+    lido pelo backend "numpy" do serviço de busca, em um diretório de versão.
+    """
+    logger.info(f"Gerando o índice NumPy no diretório: {NUMPY_INDEX_PATH}")
+    previous = {}
+    active = current_version(NUMPY_INDEX_PATH)
+    if not args.full:
+        try:
+            index = NumpyVectorIndex(numpy_index_dir(NUMPY_INDEX_PATH, active))
+            if index.model == EMBEDDING_MODEL_NAME and index.ids:
+                previous = dict(zip(index.ids, np.asarray(index.vectors)))
+        except FileNotFoundError:
+            pass
+
+    embeddings = build_embeddings(categories, previous, args)
+    NUMPY_INDEX_PATH.mkdir(parents=True, exist_ok=True)
+    save_index(NUMPY_INDEX_PATH / version, embeddings, [item["text"] for item in categories],
+               [item["metadata"] for item in categories], EMBEDDING_MODEL_NAME,
+               ids=[item["id"] for item in categories])
+    set_current_version(NUMPY_INDEX_PATH, version)
+    logger.info(f"Índice NumPy {version} publicado com {len(categories)} itens ({embeddings.nbytes / 1024**2:.1f} MiB).")
+
+    prune_versions(
+        [p.name for p in NUMPY_INDEX_PATH.iterdir() if p.is_dir() and p.name.isdigit()],
+        version, lambda v: shutil.rmtree(NUMPY_INDEX_PATH / v, ignore_errors=True),
     )
 
+
+def _chroma_embeddings(collection, ids: list[str], batch_size: int) -> dict[str, np.ndarray]:
+    vectors = {}
+    for i in range(0, len(ids), batch_size):
+        result = collection.get(ids=ids[i:i + batch_size], include=["embeddings"])
+        vectors.update(zip(result["ids"], np.asarray(result["embeddings"], dtype=np.float32)))
+    return vectors
+
+
+def index_on_chroma(categories: list[dict], version: str, args):
+    """Grava as categorias em uma nova coleção do ChromaDB e a publica como versão ativa."""
+    import chromadb
+    from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+
     logger.info(f"Configurando ChromaDB no diretório: {CHROMA_PATH}")
-    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-    
-    if COLLECTION_NAME in [c.name for c in chroma_client.list_collections()]:
-        logger.warning(f"Coleção '{COLLECTION_NAME}' já existe. Removendo para recriar.")
-        chroma_client.delete_collection(name=COLLECTION_NAME)
+    chroma_client = chromadb.PersistentClient(path=str(CHROMA_PATH))
+    embedding_fn = OpenAIEmbeddingFunction(
+        api_key=OPENAI_API_KEY, model_name=EMBEDDING_MODEL_NAME, api_base=OPENAI_BASE_URL
+    )
+    existing = {c.name for c in chroma_client.list_collections()}
+
+    previous = {}
+    active_name = chroma_collection_name(current_version(CHROMA_PATH))
+    if not args.full and active_name in existing:
+        active = chroma_client.get_collection(name=active_name, embedding_function=embedding_fn)
+        if (active.metadata or {}).get("embedding_model") == EMBEDDING_MODEL_NAME:
+            wanted = [item["id"] for item in categories]
+            previous = _chroma_embeddings(active, wanted, args.batch_size)
 
+    embeddings = build_embeddings(categories, previous, args)
+    name = chroma_collection_name(version)
+    if name in existing:
+        chroma_client.delete_collection(name=name)
     collection = chroma_client.create_collection(
-        name=COLLECTION_NAME,
+        name=name,
         embedding_function=embedding_fn,
+        metadata={"embedding_model": EMBEDDING_MODEL_NAME},
     )
-    
-    logger.info("Iniciando a adição de documentos ao ChromaDB (pode levar vários minutos)...")
-    
-    batch_size = 200
-    for i in range(0, len(all_documents), batch_size):
-        batch = all_documents[i:i + batch_size]
-        
+    for i in range(0, len(categories), args.batch_size):
+        batch = categories[i:i + args.batch_size]
         collection.add(
-            documents=[item['text'] for item in batch],
-            metadatas=[item['metadata'] for item in batch],
-            ids=[f"cat_{i+j}" for j in range(len(batch))] # IDs únicos são necessários
+            ids=[item["id"] for item in batch],
+            documents=[item["text"] for item in batch],
+            embeddings=embeddings[i:i + args.batch_size],
+            metadatas=[item["metadata"] for item in batch],
         )
-        logger.info(f"Processado lote {i//batch_size + 1}/{(len(all_documents)//batch_size) + 1}")
+    set_current_version(CHROMA_PATH, version)
+    logger.info(f"Coleção '{name}' publicada com {collection.count()} itens.")
+
+    prefix = chroma_collection_name("")
+    prune_versions(
+        [n.removeprefix(f"{prefix}_") for n in existing if n.startswith(f"{prefix}_")],
+        version, lambda v: chroma_client.delete_collection(name=chroma_collection_name(v)),
+    )
+
+
+def main():
+    """
+    Busca as categorias do BigQuery e atualiza o índice do ChromaDB ou o
+    índice NumPy (`--backend`) de forma incremental: IDs estáveis (hash da
+    coluna e do valor) permitem reaproveitar os vetores já indexados, só os
+    valores novos são enviados à API de embeddings (em paralelo) e os que
+    sumiram ficam fora da nova versão. A nova versão é publicada de uma vez,
+    e o agente em execução passa a usá-la na próxima busca.
+    """
+    parser = argparse.ArgumentParser(description="Indexa as categorias de chamados para o RAG")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default=VECTOR_INDEX_BACKEND,
+                        help="Índice a gerar. Padrão: VECTOR_INDEX_BACKEND.")
+    parser.add_argument("--full", action="store_true",
+                        help="Recalcula todos os vetores na API de embeddings, sem reaproveitar o índice ativo nem o cache de embeddings.")
+    parser.add_argument("--workers", type=int, default=4, help="Lotes de embeddings enviados em paralelo.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Textos por lote de embeddings.")
+    parser.add_argument("--max-retries", type=int, default=6, help="Tentativas por lote em limites de taxa.")
+    args = parser.parse_args()
+
+    logger.info("Iniciando processo de indexação de categorias para RAG...")
+    try:
+        categories = load_categories()
+        logger.info(f"Total de {len(categories)} categorias únicas encontradas.")
+    except Exception as e:
+        logger.error(f"Falha ao buscar dados do BigQuery: {e}")
+        return
 
+    version = time.strftime("%Y%m%d%H%M%S")
+    if args.backend == "numpy":
+        index_on_numpy(categories, version, args)
+    else:
+        index_on_chroma(categories, version, args)
     logger.info("Indexação concluída com sucesso!")
-    count = collection.count()
-    logger.info(f"A coleção '{COLLECTION_NAME}' agora contém {count} itens.")
+    logger.info(f"Cache de embeddings: {embedding_cache_stats()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,33 +1,59 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from .models import AgentState
 from .config import logger
+from . import config as _config
 from .nodes.intent import intent_router
 from .nodes.schema import schema_fetcher
+from .nodes.schemaselect import schema_selector
 from .nodes.category import category_fetcher
+from .nodes.expansion import query_expander
 from .nodes.sqlgen import sql_generator
-from .nodes.sqlexec import sql_executor
+from .nodes.sqlexec import sql_executor, sql_executor_async
 from .nodes.sqlrespond import response_synthesizer
 from .nodes.chat import conversational_responder
 from .nodes.sqlvalid import sql_validator
+from .nodes.sqlcost import sql_cost_guard
+from .nodes.rollup import rollup_rewriter
+from .nodes.partition import partition_analyzer
+from .nodes.summary import history_summarizer
+from .history import pending_messages
 
 def build_graph() -> StateGraph:
     graph = StateGraph(AgentState)
     
     graph.add_node("intent_router", intent_router)
     graph.add_node("schema_fetcher", schema_fetcher)
+    graph.add_node("schema_selector", schema_selector)
     graph.add_node("category_fetcher", category_fetcher)
+    graph.add_node("query_expander", query_expander)
     graph.add_node("sql_generator", sql_generator)
     graph.add_node("sql_validator", sql_validator)
-    graph.add_node("sql_executor", sql_executor)
+    graph.add_node("rollup_rewriter", rollup_rewriter)
+    graph.add_node("partition_analyzer", partition_analyzer)
+    graph.add_node("sql_cost_guard", sql_cost_guard)
+    # O executor tem versão assíncrona para `ainvoke`, que permite cancelar o job em andamento
+    graph.add_node("sql_executor", RunnableLambda(sql_executor, afunc=sql_executor_async, name="sql_executor"))
     graph.add_node("response_synthesizer", response_synthesizer)
     graph.add_node("conversational_responder", conversational_responder)
+    graph.add_node("history_summarizer", history_summarizer)
 
     graph.set_entry_point("intent_router")
     graph.add_edge("category_fetcher", "sql_generator")
     graph.add_edge("sql_generator", "sql_validator")
-    graph.add_edge("sql_executor", "response_synthesizer")
-    graph.add_edge("response_synthesizer", END)
-    graph.add_edge("conversational_responder", END)
+    graph.add_edge("rollup_rewriter", "partition_analyzer")
+    graph.add_edge("query_expander", END)
+    graph.add_edge("history_summarizer", END)
+
+    def _decide_after_answer(state: AgentState):
+        """Resume os turnos que saíram da janela de histórico recente, se houver."""
+        return "history_summarizer" if pending_messages(state) else END
+
+    for answer_node in ("response_synthesizer", "conversational_responder"):
+        graph.add_conditional_edges(answer_node, _decide_after_answer, {
+            "history_summarizer": "history_summarizer",
+            END: END
+        })
 
     def _route_after_intent(state: AgentState):
         """Decide para onde ir após a intenção inicial."""
@@ -37,12 +63,21 @@ def build_graph() -> StateGraph:
         plan = state.get("plan")
         if plan == "chat":
             return "conversational_responder"
-        else: # Para qualquer tipo de SQL, o primeiro passo é sempre pegar o esquema
-            return "schema_fetcher"
+        if state.get("question_cache_entry"):
+            # Paráfrase de uma pergunta já respondida: o SQL guardado já foi validado, mas
+            # ainda passa pelos agregados, pela poda de partições e pelo orçamento
+            return "rollup_rewriter"
+        if plan == "sql_contextual" and _config.USE_VECTOR_DB and _config.QUERY_EXPANSION_PARALLEL:
+            # A expansão da pergunta roda junto com a busca do esquema
+            return ["schema_fetcher", "query_expander"]
+        # Para qualquer tipo de SQL, o primeiro passo é sempre pegar o esquema
+        return "schema_fetcher"
 
     graph.add_conditional_edges("intent_router", _route_after_intent, {
         "conversational_responder": "conversational_responder",
         "schema_fetcher": "schema_fetcher",
+        "query_expander": "query_expander",
+        "rollup_rewriter": "rollup_rewriter",
         END: END
     })
 
@@ -64,8 +99,18 @@ def build_graph() -> StateGraph:
             return "sql_generator"
 
 
+    def _decide_after_fetch(state: AgentState):
+        """Segue para a seleção de esquema, a menos que a busca tenha falhado."""
+        if "error" in state and state["error"]: return END
+        return "schema_selector"
+
+    graph.add_conditional_edges("schema_fetcher", _decide_after_fetch, {
+        "schema_selector": "schema_selector",
+        END: END
+    })
+
     graph.add_conditional_edges(
-        "schema_fetcher",
+        "schema_selector",
         _decide_after_schema,
         {
             "category_fetcher": "category_fetcher",
@@ -76,20 +121,85 @@ def build_graph() -> StateGraph:
 
     def decide_after_validation(state: AgentState):
         """
-        Após a validação, decide se continua para a execução ou termina com erro.
+        Após a validação, decide se continua para a reescrita em agregados ou termina com erro.
         """
         logger.info("Avaliando resultado da validação do SQL...")
         if state.get("error"):
             logger.warning("Fluxo interrompido devido a SQL inválido.")
             return END
         else:
-            logger.info("SQL válido, prosseguindo para a execução.")
-            return "sql_executor"
+            logger.info("SQL válido, prosseguindo para a reescrita em agregados.")
+            return "rollup_rewriter"
 
     graph.add_conditional_edges(
         "sql_validator", 
         decide_after_validation, {
+        "rollup_rewriter": "rollup_rewriter",
+        END: END
+        }
+    )
+
+    def _back_to_generator(state: AgentState):
+        """Um SQL reaproveitado do cache semântico não tem esquema no estado: o gerador parte do buscador."""
+        return "schema_fetcher" if state.get("question_cache_entry") else "sql_generator"
+
+    def decide_after_partition(state: AgentState):
+        """
+        Após a análise de partições, segue para a estimativa de custo, devolve
+        a consulta ao gerador (política `require`) ou termina com erro.
+        """
+        if state.get("error"):
+            logger.warning("Fluxo interrompido: consulta sem filtro de data rejeitada.")
+            return END
+        if state.get("cost_feedback"):
+            logger.info("Consulta sem filtro de data, voltando ao gerador de SQL.")
+            return _back_to_generator(state)
+        return "sql_cost_guard"
+
+    graph.add_conditional_edges(
+        "partition_analyzer",
+        decide_after_partition, {
+        "sql_cost_guard": "sql_cost_guard",
+        "sql_generator": "sql_generator",
+        "schema_fetcher": "schema_fetcher",
+        END: END
+        }
+    )
+
+    def decide_after_cost(state: AgentState):
+        """
+        Após o dry-run, executa a consulta, devolve-a ao gerador para reescrita
+        ou termina se ela foi rejeitada pelo orçamento.
+        """
+        if state.get("error"):
+            logger.warning("Fluxo interrompido: consulta rejeitada pelo guardião de custo.")
+            return END
+        if state.get("cost_feedback"):
+            logger.info("Consulta acima do orçamento, voltando ao gerador de SQL.")
+            return _back_to_generator(state)
+        return "sql_executor"
+
+    graph.add_conditional_edges(
+        "sql_cost_guard",
+        decide_after_cost, {
         "sql_executor": "sql_executor",
+        "sql_generator": "sql_generator",
+        "schema_fetcher": "schema_fetcher",
+        END: END
+        }
+    )
+
+    def decide_after_execution(state: AgentState):
+        """Sintetiza a resposta, a menos que a execução tenha falhado ou estourado o prazo."""
+        if state.get("error"):
+            logger.warning("Fluxo interrompido: falha na execução da consulta.")
+            return END
+        return "response_synthesizer"
+
+    graph.add_conditional_edges(
+        "sql_executor",
+        decide_after_execution, {
+        "response_synthesizer": "response_synthesizer",
         END: END
         }
     )
@@ -1,5 +1,100 @@
+"""
+Provedor do cliente do BigQuery.
+
+Um único `bigquery.Client` é criado por processo e compartilhado por todos os nós
+(inclusive quando chamados via `asyncio.to_thread`). As credenciais são resolvidas
+uma vez e a sessão HTTP autenticada reutiliza um pool de conexões cujo tamanho é
+configurável por `BIGQUERY_POOL_SIZE`, permitindo consultas concorrentes de várias
+sessões sem abrir novas conexões TLS a cada chamada.
+
+Com `BIGQUERY_BACKEND=local`, o cliente é o `LocalBigQueryClient`
+(`src/bigquery_local.py`), respondido pelo espelho local, para testes offline.
+"""
+import threading
+import google.auth
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.cloud import bigquery
-from .config import BIGQUERY_PROJECT
+from google.cloud import bigquery_storage
+from requests.adapters import HTTPAdapter
+from .config import logger, BIGQUERY_PROJECT, BIGQUERY_POOL_SIZE, BIGQUERY_BACKEND, CHAMADOS_TABLE_FULL_PATH
+
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+_lock = threading.Lock()
+_client: bigquery.Client | None = None
+_bqstorage_client: bigquery_storage.BigQueryReadClient | None = None
+
+
+def _build_session(credentials) -> AuthorizedSession:
+    """Cria a sessão HTTP autenticada com o pool de conexões dimensionado."""
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=BIGQUERY_POOL_SIZE, pool_maxsize=BIGQUERY_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_bq_client() -> bigquery.Client:
+    """
+    Retorna o cliente compartilhado do BigQuery, criando-o na primeira chamada.
+    A criação é protegida por lock, então threads concorrentes recebem sempre
+    a mesma instância.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None and BIGQUERY_BACKEND == "local":
+                from .bigquery_local import LocalBigQueryClient
+                _client = LocalBigQueryClient()
+                logger.info("Cliente local compatível com o BigQuery criado (espelho local).")
+            elif _client is None:
+                credentials, _ = google.auth.default(scopes=BIGQUERY_SCOPES)
+                _client = bigquery.Client(
+                    project=BIGQUERY_PROJECT,
+                    credentials=credentials,
+                    _http=_build_session(credentials),
+                )
+                logger.info(f"Cliente do BigQuery criado (pool de {BIGQUERY_POOL_SIZE} conexões).")
+    return _client
+
+
+def get_bqstorage_client() -> bigquery_storage.BigQueryReadClient | None:
+    """
+    Retorna o cliente compartilhado da BigQuery Storage Read API, usado para
+    ler resultados grandes em lotes Arrow. Reaproveita as credenciais do
+    cliente principal. Com o cliente local não há Storage Read API (None).
+    """
+    global _bqstorage_client
+    if BIGQUERY_BACKEND == "local":
+        return None
+    if _bqstorage_client is None:
+        credentials = get_bq_client()._credentials
+        with _lock:
+            if _bqstorage_client is None:
+                _bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+                logger.info("Cliente da BigQuery Storage Read API criado.")
+    return _bqstorage_client
+
+
+def warm_up_bq_client():
+    """
+    Cria o cliente, renova o token de acesso e abre uma conexão do pool
+    antecipadamente, para que a primeira pergunta não pague esse custo.
+    """
+    try:
+        client = get_bq_client()
+        if BIGQUERY_BACKEND != "local":
+            client._http.credentials.refresh(Request())
+        client.get_table(CHAMADOS_TABLE_FULL_PATH)
+        logger.info("Cliente do BigQuery aquecido.")
+    except Exception as e:
+        logger.warning(f"Falha ao aquecer o cliente do BigQuery: {e}")
+
 
-def get_bq_client():
-    return bigquery.Client(project=BIGQUERY_PROJECT)
+def reset_bq_client():
+    """Descarta o cliente compartilhado (ex.: após troca de credenciais)."""
+    global _client, _bqstorage_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _bqstorage_client = None
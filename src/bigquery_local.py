@@ -0,0 +1,263 @@
+"""
+Cliente local compatível com o BigQuery, para testes de carga offline.
+
+Com `BIGQUERY_BACKEND=local`, `get_bq_client()` retorna um
+`LocalBigQueryClient`, que responde às chamadas usadas pelo agente (`query`,
+dry-run, `get_table`, polling e cancelamento de jobs) com o espelho local em
+DuckDB (`src/local_mirror.py`), por exemplo a amostra criada por
+`scripts/build_sample_mirror.py`. Um job só fica pronto depois de uma latência
+sorteada de `LOCAL_BIGQUERY_LATENCY`, então o executor, o prazo do turno e o
+cancelamento se comportam como com o BigQuery real, sem custo.
+
+Os bytes estimados (e faturados) são o tamanho descomprimido das colunas
+referenciadas de cada tabela, multiplicado por `LOCAL_BIGQUERY_SCAN_SCALE`;
+a poda de partições não é considerada.
+"""
+import re
+import time
+import uuid
+import threading
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from google.api_core import exceptions
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+from . import local_mirror
+from .config import (
+    logger, LOCAL_MIRROR_PATH, CHAMADOS_TABLE_FULL_PATH, BIGQUERY_POOL_SIZE,
+    LOCAL_BIGQUERY_LATENCY, LOCAL_BIGQUERY_SCAN_SCALE,
+)
+from .latency import LatencyDistribution
+
+# Particionamento declarado das tabelas espelhadas (coluna, granularidade), como no BigQuery
+LOCAL_PARTITIONING = {CHAMADOS_TABLE_FULL_PATH: ("data_particao", "MONTH")}
+# Colunas criadas pelo particionamento Hive do espelho, que não existem no BigQuery
+MIRROR_ONLY_COLUMNS = {"mes"}
+
+_DUCKDB_TO_BIGQUERY = {
+    "VARCHAR": "STRING", "BIGINT": "INTEGER", "INTEGER": "INTEGER", "SMALLINT": "INTEGER", "TINYINT": "INTEGER",
+    "HUGEINT": "INTEGER", "UBIGINT": "INTEGER", "DOUBLE": "FLOAT", "FLOAT": "FLOAT", "BOOLEAN": "BOOLEAN",
+    "DATE": "DATE", "TIMESTAMP": "DATETIME", "TIMESTAMP WITH TIME ZONE": "TIMESTAMP", "TIME": "TIME",
+}
+
+
+def _bigquery_type(duckdb_type: str) -> str:
+    if duckdb_type.startswith("DECIMAL"):
+        return "NUMERIC"
+    return _DUCKDB_TO_BIGQUERY.get(duckdb_type, "STRING")
+
+
+@dataclass
+class LocalTable:
+    """Os metadados de `bigquery.Table` lidos pelo cache de esquema."""
+    full_table_id: str
+    schema: list
+    etag: str
+    modified: datetime | None
+    time_partitioning: bigquery.TimePartitioning | None
+    clustering_fields: list | None
+    num_rows: int
+
+
+class LocalRowIterator:
+    """Resultado de um job: o subconjunto de `RowIterator` usado pelo agente."""
+
+    def __init__(self, table: pa.Table):
+        self._table = table
+        self.total_rows = table.num_rows
+
+    def __iter__(self):
+        field_to_index = {name: i for i, name in enumerate(self._table.column_names)}
+        for record in self._table.to_pylist():
+            yield Row(tuple(record.values()), field_to_index)
+
+    def to_arrow_iterable(self, bqstorage_client=None, max_queue_size=None):
+        return iter(self._table.to_batches())
+
+    def to_arrow(self, bqstorage_client=None, **kwargs) -> pa.Table:
+        return self._table
+
+    def to_dataframe(self, bqstorage_client=None, **kwargs):
+        return self._table.to_pandas()
+
+
+class LocalQueryJob:
+    """
+    Job executado no espelho em segundo plano. `done()` só retorna True depois
+    da latência sorteada, e `cancel()` interrompe a consulta no DuckDB.
+    """
+
+    def __init__(self, client: "LocalBigQueryClient", sql: str, job_config: bigquery.QueryJobConfig | None):
+        self.job_id = f"local_{uuid.uuid4().hex[:12]}"
+        self.query = sql
+        self.state = "RUNNING"
+        self.error_result = None
+        self.errors = None
+        self.total_bytes_processed = client.estimate_bytes(sql)
+        self.total_bytes_billed = self.total_bytes_processed
+        self._error: Exception | None = None
+        self._table: pa.Table | None = None
+        self._cursor: duckdb.DuckDBPyConnection | None = None
+        self._cancelled = threading.Event()
+
+        latency = client.latency.sample()
+        timeout_ms = int(getattr(job_config, "job_timeout_ms", None) or 0)
+        if timeout_ms and latency * 1000 > timeout_ms:
+            latency = timeout_ms / 1000
+            self._error = exceptions.BadRequest(f"Job {self.job_id} excedeu o tempo limite de {timeout_ms} ms.")
+        limit = getattr(job_config, "maximum_bytes_billed", None)
+        if limit and self.total_bytes_processed > int(limit):
+            self._error = exceptions.BadRequest(
+                f"Query exceeded limit for bytes billed: {limit}. {self.total_bytes_processed} or higher required."
+            )
+        self._ready_at = time.time() + latency
+        self._future = client.executor.submit(self._run) if self._error is None else None
+
+    def _run(self):
+        if self._cancelled.is_set():
+            return
+        self._cursor = local_mirror.get_connection().cursor()
+        try:
+            self._table = self._cursor.execute(local_mirror.translate_bigquery_sql(self.query)).fetch_arrow_table()
+        except duckdb.Error as e:
+            if not self._cancelled.is_set():
+                self._error = exceptions.BadRequest(str(e))
+
+    def done(self, *args, **kwargs) -> bool:
+        if self._cancelled.is_set() or (
+            time.time() >= self._ready_at and (self._future is None or self._future.done())
+        ):
+            self.state = "DONE"
+            return True
+        return False
+
+    def reload(self, *args, **kwargs):
+        self.done()
+
+    def cancel(self, *args, **kwargs) -> bool:
+        self._cancelled.set()
+        self.state = "DONE"
+        self.error_result = {"reason": "stopped", "message": "Job cancelado."}
+        if self._cursor is not None:
+            self._cursor.interrupt()
+        return True
+
+    def result(self, timeout: float | None = None, **kwargs) -> LocalRowIterator:
+        if self._future is not None:
+            self._future.result(timeout=timeout)
+        remaining = self._ready_at - time.time()
+        if remaining > 0 and not self._cancelled.is_set():
+            time.sleep(remaining)
+        self.state = "DONE"
+        if self._cancelled.is_set():
+            raise exceptions.BadRequest(f"Job {self.job_id} foi cancelado.")
+        if self._error is not None:
+            self.error_result = {"reason": "invalidQuery", "message": str(self._error)}
+            raise self._error
+        return LocalRowIterator(self._table)
+
+    def to_dataframe(self, **kwargs):
+        return self.result().to_dataframe()
+
+
+class LocalDryRunJob:
+    """Dry-run: valida o SQL no espelho (EXPLAIN) e estima os bytes, sem executar."""
+
+    def __init__(self, client: "LocalBigQueryClient", sql: str):
+        self.job_id = f"local_dry_{uuid.uuid4().hex[:12]}"
+        self.query = sql
+        self.state = "DONE"
+        self.error_result = None
+        self.errors = None
+        client.latency.sleep()
+        try:
+            local_mirror.get_connection().cursor().execute(f"EXPLAIN {local_mirror.translate_bigquery_sql(sql)}")
+        except duckdb.Error as e:
+            raise exceptions.BadRequest(str(e))
+        self.total_bytes_processed = client.estimate_bytes(sql)
+        self.total_bytes_billed = 0
+
+    def done(self, *args, **kwargs) -> bool:
+        return True
+
+
+class LocalBigQueryClient:
+    """Subconjunto de `bigquery.Client` usado pelo agente, respondido pelo espelho local."""
+
+    def __init__(self, latency: str = LOCAL_BIGQUERY_LATENCY, max_workers: int = BIGQUERY_POOL_SIZE):
+        self.latency = LatencyDistribution(latency)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-bq")
+        self._column_bytes: dict[tuple[str, str | None], dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, job_config: bigquery.QueryJobConfig | None = None, **kwargs):
+        if job_config is not None and job_config.dry_run:
+            return LocalDryRunJob(self, sql)
+        return LocalQueryJob(self, sql, job_config)
+
+    def get_table(self, table_path) -> LocalTable:
+        table_path = str(table_path)
+        view = local_mirror.MIRROR_TABLES.get(table_path)
+        if view is None or not local_mirror.has_table(table_path):
+            raise exceptions.NotFound(f"Not found: Table {table_path} (ausente do espelho em '{LOCAL_MIRROR_PATH}')")
+        cursor = local_mirror.get_connection().cursor()
+        columns = [(name, kind) for name, kind, *_ in cursor.execute(f"DESCRIBE {view}").fetchall()]
+        num_rows = cursor.execute(f"SELECT COUNT(*) FROM {view}").fetchone()[0]
+        synced_at = local_mirror.table_version(table_path)
+        partitioning = LOCAL_PARTITIONING.get(table_path)
+        names = {name for name, _ in columns}
+        project, rest = table_path.split(".", 1)
+        return LocalTable(
+            full_table_id=f"{project}:{rest}",
+            schema=[
+                bigquery.SchemaField(name, _bigquery_type(kind))
+                for name, kind in columns if name not in MIRROR_ONLY_COLUMNS
+            ],
+            etag=synced_at or "",
+            modified=datetime.fromisoformat(synced_at) if synced_at else None,
+            time_partitioning=(
+                bigquery.TimePartitioning(type_=partitioning[1], field=partitioning[0])
+                if partitioning and partitioning[0] in names else None
+            ),
+            clustering_fields=None,
+            num_rows=num_rows,
+        )
+
+    def _sizes(self, table_path: str) -> dict[str, int]:
+        """Bytes descomprimidos de cada coluna da tabela espelhada (pelos metadados do Parquet)."""
+        key = (table_path, local_mirror.table_version(table_path))
+        with self._lock:
+            sizes = self._column_bytes.get(key)
+        if sizes is None:
+            sizes = {}
+            view = local_mirror.MIRROR_TABLES[table_path]
+            for path in (LOCAL_MIRROR_PATH / view).glob("**/*.parquet"):
+                metadata = pq.ParquetFile(path).metadata
+                for i in range(metadata.num_row_groups):
+                    row_group = metadata.row_group(i)
+                    for j in range(row_group.num_columns):
+                        column = row_group.column(j)
+                        sizes[column.path_in_schema] = sizes.get(column.path_in_schema, 0) + column.total_uncompressed_size
+            with self._lock:
+                self._column_bytes[key] = sizes
+        return sizes
+
+    def estimate_bytes(self, sql: str) -> int:
+        """Bytes das colunas referenciadas de cada tabela espelhada citada no SQL."""
+        identifiers = set(re.findall(r"[a-z_][a-z0-9_]*", sql.lower()))
+        select_all = bool(re.search(r"(select|\.)\s*\*", sql, re.IGNORECASE))
+        total = 0
+        for table_path in local_mirror.MIRROR_TABLES:
+            if f"`{table_path.lower()}`" not in sql.lower():
+                continue
+            sizes = self._sizes(table_path)
+            total += sum(size for column, size in sizes.items() if select_all or column.lower() in identifiers)
+        return int(total * LOCAL_BIGQUERY_SCAN_SCALE)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Cliente local compatível com o BigQuery encerrado.")
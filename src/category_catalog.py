@@ -0,0 +1,248 @@
+"""
+Catálogo de categorias para o fallback do Buscador de Categorias.
+
+As combinações distintas de `categoria`, `tipo` e `subtipo`, com a contagem de
+chamados de cada uma, são lidas do BigQuery em uma única varredura da tabela de
+chamados; delas saem os valores de cada coluna (com suas contagens) e a
+hierarquia usada por `category_hierarchy`. Os nomes dos bairros vêm junto,
+para a guarda do cache semântico de perguntas. O catálogo fica em memória e
+em um snapshot em disco. Passado `CATEGORY_CATALOG_REFRESH_SECONDS`, ele
+continua sendo servido enquanto uma thread em segundo plano o recarrega; o
+agendador (`start_refresh_scheduler`) faz essa recarga periodicamente, fora
+do caminho das perguntas.
+
+O contexto entregue ao gerador de SQL pode conter a lista completa ou, com
+`CATEGORY_CATALOG_TOP_N`, apenas os N valores de cada coluna mais relevantes à
+pergunta (índice léxico), completados pelos mais frequentes.
+"""
+import os
+import json
+import time
+import threading
+from . import config as _config
+from .config import (
+    logger, CACHE_DIR, CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH, CATEGORICAL_COLUMNS, CATEGORY_HIERARCHY,
+)
+from .bigquery import get_bq_client
+from .lexical_index import LexicalIndex
+
+CATALOG_SNAPSHOT_PATH = CACHE_DIR / "category_catalog.json"
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_catalog: dict | None = None
+_lexical: dict[str, LexicalIndex] = {}
+_scheduler: threading.Thread | None = None
+
+
+def build_catalog_query() -> str:
+    """Uma varredura de `chamado` com as combinações da hierarquia de categorias e suas contagens."""
+    columns = ", ".join(CATEGORY_HIERARCHY)
+    return (
+        f"SELECT {columns}, COUNT(*) AS n_chamados\n"
+        f"FROM `{CHAMADOS_TABLE_FULL_PATH}`\n"
+        f"WHERE {' OR '.join(f'{column} IS NOT NULL' for column in CATEGORY_HIERARCHY)}\n"
+        f"GROUP BY {columns}"
+    )
+
+
+def _load_from_bigquery() -> dict:
+    started = time.perf_counter()
+    hierarchy = [
+        [*(row[column] for column in CATEGORY_HIERARCHY), row.n_chamados]
+        for row in get_bq_client().query(build_catalog_query()).result()
+    ]
+    counts = {column: {} for column in CATEGORICAL_COLUMNS}
+    for *path, n_chamados in hierarchy:
+        for column, value in zip(CATEGORY_HIERARCHY, path):
+            if value is not None:
+                counts[column][value] = counts[column].get(value, 0) + n_chamados
+    columns = {column: [[value, n] for value, n in sorted(values.items())] for column, values in counts.items()}
+    bairros = sorted(
+        row.nome for row in get_bq_client().query(f"SELECT DISTINCT nome FROM `{BAIRROS_TABLE_FULL_PATH}`").result()
+        if row.nome
+    )
+    logger.info(
+        f"   Catálogo de categorias carregado do BigQuery em {time.perf_counter() - started:.1f}s "
+        f"({', '.join(f'{c}={len(v)}' for c, v in columns.items())}, {len(hierarchy)} combinações, "
+        f"{len(bairros)} bairros)."
+    )
+    return {"loaded_at": time.time(), "columns": columns, "hierarchy": hierarchy, "bairros": bairros}
+
+
+def _load_snapshot() -> dict | None:
+    if not CATALOG_SNAPSHOT_PATH.exists():
+        return None
+    try:
+        with open(CATALOG_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        if set(catalog["columns"]) != set(CATEGORICAL_COLUMNS) or "hierarchy" not in catalog or "bairros" not in catalog:
+            return None
+        return catalog
+    except Exception as e:
+        logger.warning(f"   Snapshot do catálogo de categorias ignorado (ilegível): {e}")
+        return None
+
+
+def _save_snapshot(catalog: dict):
+    """Grava o snapshot de forma atômica (arquivo temporário + rename)."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = CATALOG_SNAPSHOT_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False)
+        os.replace(tmp_path, CATALOG_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning(f"   Não foi possível salvar o snapshot do catálogo de categorias: {e}")
+
+
+def _install(catalog: dict):
+    global _catalog
+    with _lock:
+        _catalog = catalog
+        _lexical.clear()
+
+
+def _reload() -> dict:
+    catalog = _load_from_bigquery()
+    _save_snapshot(catalog)
+    _install(catalog)
+    return catalog
+
+
+def refresh() -> dict:
+    """Recarrega o catálogo do BigQuery (uma recarga por vez) e atualiza os dois níveis."""
+    with _refresh_lock:
+        return _reload()
+
+
+def _is_stale(catalog: dict) -> bool:
+    return time.time() - catalog["loaded_at"] > _config.CATEGORY_CATALOG_REFRESH_SECONDS
+
+
+def _refresh_in_background():
+    if _refresh_lock.locked():
+        return
+
+    def run():
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning(f"   Falha ao atualizar o catálogo de categorias: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _current() -> dict:
+    """Catálogo da memória, do snapshot em disco ou, se não houver nenhum, do BigQuery."""
+    catalog = _catalog
+    if catalog is None:
+        with _refresh_lock:
+            catalog = _catalog or _load_snapshot()
+            if catalog is None:
+                return _reload()
+            _install(catalog)
+    return catalog
+
+
+def loaded() -> dict | None:
+    """Catálogo da memória ou do snapshot em disco, sem consultar o BigQuery (None se ainda não há)."""
+    catalog = _catalog
+    if catalog is None:
+        catalog = _load_snapshot()
+        if catalog is not None:
+            _install(catalog)
+    return catalog
+
+
+def get_catalog() -> dict:
+    """
+    Retorna o catálogo atual (carregando-o na primeira vez). Um catálogo
+    vencido é servido enquanto é recarregado em segundo plano.
+    """
+    catalog = _current()
+    if _is_stale(catalog):
+        _refresh_in_background()
+    return catalog
+
+
+def get_catalog_if_ready() -> dict | None:
+    """
+    Como get_catalog, mas sem esperar o BigQuery: sem catálogo na memória nem
+    snapshot em disco, dispara a carga em segundo plano e retorna None.
+    """
+    catalog = loaded()
+    if catalog is None or _is_stale(catalog):
+        _refresh_in_background()
+    return catalog
+
+
+def _lexical_index(column: str, values: list[list]) -> LexicalIndex:
+    with _lock:
+        if column not in _lexical:
+            _lexical[column] = LexicalIndex([value for value, _ in values])
+        return _lexical[column]
+
+
+def _top_values(question: str, column: str, values: list[list], top_n: int) -> list[str]:
+    """Os N valores mais relevantes à pergunta, completados pelos mais frequentes."""
+    ranked = [
+        values[i][0] for i, coverage, bm25 in _lexical_index(column, values).search(question, top_n)
+        if bm25 > 0
+    ]
+    for value, _ in sorted(values, key=lambda item: item[1], reverse=True):
+        if len(ranked) >= top_n:
+            break
+        if value not in ranked:
+            ranked.append(value)
+    return ranked
+
+
+def match_terms(question: str, threshold: float, per_column: int = 3) -> list[tuple[str, str]]:
+    """(valor, coluna) dos valores citados na pergunta com cobertura léxica de ao menos `threshold`."""
+    matches = []
+    for column, values in get_catalog()["columns"].items():
+        index = _lexical_index(column, values)
+        matches.extend(
+            (values[i][0], column) for i, coverage, _ in index.search(question, per_column)
+            if index.is_confident(i, coverage, threshold)
+        )
+    return matches
+
+
+def format_context(question: str | None = None, top_n: int | None = None) -> str:
+    """
+    Contexto de categorias para o gerador de SQL: todos os valores de cada
+    coluna ou, com `top_n` > 0, só os mais relevantes à pergunta.
+    """
+    top_n = _config.CATEGORY_CATALOG_TOP_N if top_n is None else top_n
+    context_details = []
+    for column, values in get_catalog()["columns"].items():
+        if top_n and question:
+            selected = _top_values(question, column, values, top_n)
+        else:
+            selected = [value for value, _ in values]
+        context_details.append(f"Valores possíveis para a coluna '{column}':\n{selected}\n")
+    return "\n".join(context_details)
+
+
+def start_refresh_scheduler():
+    """Recarrega o catálogo periodicamente em uma thread daemon (uma por processo)."""
+    global _scheduler
+    if _scheduler is not None:
+        return
+
+    def loop():
+        while True:
+            try:
+                wait = _current()["loaded_at"] + _config.CATEGORY_CATALOG_REFRESH_SECONDS - time.time()
+                if wait <= 0:
+                    refresh()
+                    continue
+                time.sleep(wait)
+            except Exception as e:
+                logger.warning(f"   Falha ao atualizar o catálogo de categorias: {e}")
+                time.sleep(min(_config.CATEGORY_CATALOG_REFRESH_SECONDS, 300))
+
+    _scheduler = threading.Thread(target=loop, daemon=True, name="category-catalog-refresh")
+    _scheduler.start()
@@ -0,0 +1,141 @@
+"""
+Hierarquia de categorias (categoria → tipo → subtipo) com a contagem de
+chamados de cada nó.
+
+A árvore é montada a partir das combinações lidas pelo catálogo de categorias
+(`category_catalog`), na mesma varredura do BigQuery, e é reconstruída quando o
+catálogo é recarregado. Para os termos encontrados pelo Buscador de Categorias,
+`format_subtree` devolve apenas o ramo de cada termo (ancestrais, o próprio nó
+e seus filhos mais frequentes) em vez da lista plana de todos os valores, o
+que reduz o prompt e indica ao gerador de SQL a coluna a filtrar.
+"""
+import threading
+from . import config as _config
+from .config import CATEGORY_HIERARCHY
+from . import category_catalog
+
+_lock = threading.Lock()
+_hierarchy: "CategoryHierarchy | None" = None
+
+
+def _new_node(column: str | None, value: str | None) -> dict:
+    return {"column": column, "value": value, "n": 0, "children": {}}
+
+
+class CategoryHierarchy:
+    """Árvore de categorias e índice (coluna, valor) → nós, para localizar os termos encontrados."""
+
+    def __init__(self, rows: list[list], loaded_at: float | None = None):
+        self.loaded_at = loaded_at
+        self.root = _new_node(None, None)
+        self.nodes: dict[tuple[str, str], list[dict]] = {}
+        for *path, n_chamados in rows:
+            node = self.root
+            node["n"] += n_chamados
+            # Níveis nulos são pulados: o nó fica sob o ancestral preenchido mais próximo
+            for column, value in zip(CATEGORY_HIERARCHY, path):
+                if value is None:
+                    continue
+                child = node["children"].get((column, value))
+                if child is None:
+                    child = node["children"][(column, value)] = _new_node(column, value)
+                    self.nodes.setdefault((column, value), []).append(child)
+                child["n"] += n_chamados
+                node = child
+        self.parents = {id(child): node for node in self._walk(self.root) for child in node["children"].values()}
+
+    def _walk(self, node: dict):
+        yield node
+        for child in node["children"].values():
+            yield from self._walk(child)
+
+    def find(self, column: str, value: str) -> list[dict]:
+        return self.nodes.get((column, value), [])
+
+    def _ancestors(self, node: dict) -> list[dict]:
+        path = []
+        while node is not self.root:
+            path.append(node)
+            node = self.parents[id(node)]
+        return path[::-1]
+
+    def format_subtree(self, matches: list[tuple[str, str]], max_children: int) -> str | None:
+        """
+        Ramos da árvore para os termos (valor, coluna) encontrados: os
+        ancestrais de cada termo, o termo e até `max_children` filhos, os mais
+        frequentes. Retorna None quando nenhum termo está na hierarquia.
+        """
+        matched = {id(node) for value, column in matches for node in self.find(column, value)}
+        if not matched:
+            return None
+        visible = set()
+        for value, column in matches:
+            for node in self.find(column, value):
+                visible.update(id(ancestor) for ancestor in self._ancestors(node))
+
+        lines = []
+
+        def render(node: dict, depth: int, expanded: bool):
+            children = sorted(node["children"].values(), key=lambda child: child["n"], reverse=True)
+            shown = [
+                child for i, child in enumerate(children)
+                if expanded and i < max_children or id(child) in visible or id(child) in matched
+            ]
+            shown_ids = {id(child) for child in shown}
+            hidden = [child for child in children if id(child) not in shown_ids] if expanded else []
+            for child in shown:
+                marker = " ← termo encontrado" if id(child) in matched else ""
+                lines.append(
+                    f"{'  ' * depth}- {child['column']} = '{child['value']}' ({child['n']} chamados){marker}"
+                )
+                if id(child) in matched or id(child) in visible:
+                    render(child, depth + 1, expanded=id(child) in matched)
+            if hidden:
+                lines.append(
+                    f"{'  ' * depth}- ... mais {len(hidden)} valores de {hidden[0]['column']} "
+                    f"({sum(child['n'] for child in hidden)} chamados)"
+                )
+
+        render(self.root, 0, expanded=False)
+        return "\n".join(lines)
+
+
+def get_hierarchy(wait: bool = True) -> CategoryHierarchy | None:
+    """
+    Hierarquia do catálogo atual, reconstruída quando o catálogo é recarregado.
+    Com `wait=False` não espera a carga do catálogo: retorna None se ele ainda não está pronto.
+    """
+    global _hierarchy
+    catalog = category_catalog.get_catalog() if wait else category_catalog.get_catalog_if_ready()
+    if catalog is None:
+        return None
+    hierarchy = _hierarchy
+    if hierarchy is None or hierarchy.loaded_at != catalog["loaded_at"]:
+        with _lock:
+            if _hierarchy is None or _hierarchy.loaded_at != catalog["loaded_at"]:
+                _hierarchy = CategoryHierarchy(catalog["hierarchy"], catalog["loaded_at"])
+            hierarchy = _hierarchy
+    return hierarchy
+
+
+def format_context(
+    matches: list[tuple[str, str]], max_children: int | None = None, wait: bool = True
+) -> str | None:
+    """
+    Contexto de categorias para o gerador de SQL a partir dos termos (valor,
+    coluna) encontrados, ou None quando nenhum deles está na hierarquia (ou,
+    com `wait=False`, quando o catálogo ainda não foi carregado).
+    """
+    max_children = _config.CATEGORY_HIERARCHY_MAX_CHILDREN if max_children is None else max_children
+    hierarchy = get_hierarchy(wait)
+    if hierarchy is None:
+        return None
+    subtree = hierarchy.format_subtree(matches, max_children)
+    if subtree is None:
+        return None
+    levels = " → ".join(CATEGORY_HIERARCHY)
+    return (
+        f"Categorias relacionadas à pergunta ({levels}, com o número de chamados de cada uma):\n"
+        f"{subtree}\n"
+        f"Filtre pela coluna do termo encontrado; os níveis acima e abaixo mostram onde ele se encaixa."
+    )
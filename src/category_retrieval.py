@@ -0,0 +1,274 @@
+"""
+Serviço de busca de categorias no índice vetorial.
+
+O índice é aberto uma única vez por processo e compartilhado por todas as
+sessões; abrir o diretório do índice e carregá-lo deixa de ser pago a cada
+pergunta contextual. Há dois backends, escolhidos por `VECTOR_INDEX_BACKEND`:
+o ChromaDB (cliente persistente, coleção e função de embedding) e uma matriz
+NumPy em memory-map (`src/vector_index.py`), suficiente para o tamanho do
+catálogo. Com `HYBRID_RETRIEVAL_ENABLED`, um índice léxico do mesmo catálogo
+(`src/lexical_index.py`) responde sozinho às perguntas que citam a categoria
+quase literalmente, sem calcular embedding; nas demais, os rankings léxico e
+vetorial são combinados por Reciprocal Rank Fusion. O
+serviço pode ser aquecido na inicialização (`CATEGORY_RETRIEVAL_WARMUP`) e
+mede separadamente o tempo de preparação (criação do serviço) e o de busca
+(embedding da pergunta + consulta ao índice). Os embeddings das perguntas
+passam pelo cache de `embedding_cache`.
+"""
+import time
+import threading
+import chromadb
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from . import config as _config
+from . import embedding_cache
+from .config import logger, EMBEDDING_MODEL_NAME, CHROMA_PATH, CHROMA_COLLECTION_NAME, NUMPY_INDEX_PATH
+from .lexical_index import LexicalIndex
+from .vector_index import NumpyVectorIndex, current_version, numpy_index_dir
+
+_lock = threading.Lock()
+_retriever: "CategoryRetriever | NumpyCategoryRetriever | HybridCategoryRetriever | None" = None
+_stats = {
+    "searches": 0, "cold_starts": 0,
+    "setup_seconds": 0.0, "embedding_seconds": 0.0, "search_seconds": 0.0,
+    "lexical_fast_path": 0, "hybrid": 0, "vector_only": 0,
+}
+# Constante do Reciprocal Rank Fusion (valor usual da literatura)
+RRF_K = 60
+
+
+def chroma_collection_name(version: str | None) -> str:
+    """Coleção da versão ativa (a coleção original quando o índice não é versionado)."""
+    return f"{CHROMA_COLLECTION_NAME}_{version}" if version else CHROMA_COLLECTION_NAME
+
+
+class CategoryRetriever:
+    """Cliente, coleção e função de embedding do índice de categorias no ChromaDB."""
+
+    def __init__(self):
+        started = time.perf_counter()
+        self.version = current_version(CHROMA_PATH)
+        self.embedding_fn = OpenAIEmbeddingFunction(
+            api_key=_config.OPENAI_API_KEY,
+            model_name=EMBEDDING_MODEL_NAME,
+            api_base=_config.OPENAI_BASE_URL,
+        )
+        self.client = chromadb.PersistentClient(path=str(CHROMA_PATH))
+        self.collection = self.client.get_collection(
+            name=chroma_collection_name(self.version),
+            embedding_function=self.embedding_fn,
+        )
+        self.setup_seconds = time.perf_counter() - started
+
+    def embed(self, text: str) -> list[float]:
+        return embedding_cache.embed_text(text, EMBEDDING_MODEL_NAME).tolist()
+
+    def search(self, query: str, n_results: int = 5) -> list[tuple[str, dict]]:
+        """Retorna os documentos mais próximos da pergunta e seus metadados."""
+        started = time.perf_counter()
+        embedding = self.embed(query)
+        embedded = time.perf_counter()
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["documents", "metadatas"],
+        )
+        _record(embedding_seconds=embedded - started, search_seconds=time.perf_counter() - embedded)
+        if not results or not results.get("documents") or not results["documents"][0]:
+            return []
+        return list(zip(results["documents"][0], results["metadatas"][0]))
+
+    def warm_up(self):
+        """Força a carga do índice HNSW com uma busca pelo vetor de um item já indexado."""
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        if len(sample["embeddings"]):
+            self.collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def catalog(self) -> list[tuple[str, dict]]:
+        items = self.collection.get(include=["documents", "metadatas"])
+        return list(zip(items["documents"], items["metadatas"]))
+
+
+class NumpyCategoryRetriever:
+    """Índice de categorias como matriz NumPy normalizada, buscado por produto de matrizes."""
+
+    def __init__(self):
+        started = time.perf_counter()
+        self.version = current_version(NUMPY_INDEX_PATH)
+        self.index = NumpyVectorIndex(numpy_index_dir(NUMPY_INDEX_PATH, self.version))
+        if self.index.model != EMBEDDING_MODEL_NAME:
+            raise ValueError(f"índice criado com '{self.index.model}', esperado '{EMBEDDING_MODEL_NAME}'")
+        self.setup_seconds = time.perf_counter() - started
+
+    def search(self, query: str, n_results: int = 5) -> list[tuple[str, dict]]:
+        """Retorna os documentos mais próximos da pergunta e seus metadados."""
+        return self.search_many([query], n_results)[0]
+
+    def search_many(self, queries: list[str], n_results: int = 5) -> list[list[tuple[str, dict]]]:
+        """Busca um lote de perguntas com um único produto de matrizes."""
+        started = time.perf_counter()
+        embeddings = embedding_cache.embed_texts(queries, EMBEDDING_MODEL_NAME)
+        embedded = time.perf_counter()
+        hits = self.index.search(embeddings, n_results)
+        _record(embedding_seconds=embedded - started, search_seconds=time.perf_counter() - embedded)
+        return [[(self.index.documents[i], self.index.metadatas[i]) for i, _ in row] for row in hits]
+
+    def warm_up(self):
+        """Lê a matriz inteira uma vez, trazendo as páginas do memory-map para a memória."""
+        float(self.index.vectors.sum())
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def catalog(self) -> list[tuple[str, dict]]:
+        return list(zip(self.index.documents, self.index.metadatas))
+
+
+RETRIEVER_BACKENDS = {
+    "chroma": CategoryRetriever,
+    "numpy": NumpyCategoryRetriever,
+}
+
+
+def _record(**seconds: float):
+    with _lock:
+        for name, value in seconds.items():
+            _stats[name] += value
+        if "search_seconds" in seconds:
+            _stats["searches"] += 1
+
+
+class HybridCategoryRetriever:
+    """Índice léxico do catálogo na frente de um buscador vetorial."""
+
+    def __init__(self, vector_retriever):
+        started = time.perf_counter()
+        self.vector = vector_retriever
+        self.version = vector_retriever.version
+        self.items = vector_retriever.catalog()
+        self.lexical = LexicalIndex([doc for doc, _ in self.items])
+        self.setup_seconds = vector_retriever.setup_seconds + time.perf_counter() - started
+
+    def search(self, query: str, n_results: int = 5) -> list[tuple[str, dict]]:
+        """
+        Caminho rápido quando alguma categoria está (quase) literalmente na
+        pergunta; caso contrário, busca vetorial combinada ao ranking léxico.
+        """
+        started = time.perf_counter()
+        lexical = self.lexical.search(query, n_results)
+        threshold = _config.LEXICAL_CONFIDENCE_THRESHOLD
+        confident = [i for i, coverage, _ in lexical if self.lexical.is_confident(i, coverage, threshold)]
+        if confident:
+            _record(search_seconds=time.perf_counter() - started)
+            _count("lexical_fast_path")
+            return [self.items[i] for i in confident]
+
+        vector = self.vector.search(query, n_results)
+        _count("hybrid" if lexical else "vector_only")
+        if not lexical:
+            return vector
+        return _fuse([[self.items[i] for i, _, _ in lexical], vector], n_results)
+
+    def warm_up(self):
+        self.vector.warm_up()
+
+    def count(self) -> int:
+        return len(self.items)
+
+
+def _fuse(rankings: list[list[tuple[str, dict]]], n_results: int) -> list[tuple[str, dict]]:
+    """Reciprocal Rank Fusion: soma 1 / (RRF_K + posição) de cada ranking."""
+    scores, items = {}, {}
+    for ranking in rankings:
+        for position, (doc, metadata) in enumerate(ranking):
+            key = (doc, metadata.get("source_column"))
+            scores[key] = scores.get(key, 0.0) + 1 / (RRF_K + position + 1)
+            items.setdefault(key, (doc, metadata))
+    return [items[key] for key in sorted(scores, key=scores.get, reverse=True)[:n_results]]
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def _active_version() -> str | None:
+    path = NUMPY_INDEX_PATH if _config.VECTOR_INDEX_BACKEND == "numpy" else CHROMA_PATH
+    return current_version(path)
+
+
+def get_retriever() -> tuple[CategoryRetriever | NumpyCategoryRetriever | HybridCategoryRetriever, float]:
+    """
+    Retorna o serviço compartilhado, criando-o na primeira chamada, e o tempo
+    de preparação pago por esta chamada (zero quando o serviço já existia).
+    Quando `scripts/vectordb.py` publica uma nova versão do índice, o serviço
+    é recriado sobre ela; as buscas em andamento terminam na versão anterior.
+    Uma falha na criação não é memorizada: a próxima chamada tenta de novo.
+    """
+    global _retriever
+    retriever = _retriever
+    if retriever is not None and retriever.version == _active_version():
+        return retriever, 0.0
+    started = time.perf_counter()
+    with _lock:
+        if _retriever is None or _retriever.version != _active_version():
+            reloading = _retriever is not None
+            retriever = RETRIEVER_BACKENDS[_config.VECTOR_INDEX_BACKEND]()
+            if _config.HYBRID_RETRIEVAL_ENABLED:
+                retriever = HybridCategoryRetriever(retriever)
+            _retriever = retriever
+            _stats["cold_starts"] += 1
+            logger.info(
+                f"Serviço de busca de categorias ({_config.VECTOR_INDEX_BACKEND}) "
+                f"{'recarregado' if reloading else 'criado'} em {_retriever.setup_seconds * 1000:.0f} ms "
+                f"({_retriever.count()} itens, versão {_retriever.version or 'única'})."
+            )
+    setup = time.perf_counter() - started
+    _record(setup_seconds=setup)
+    return _retriever, setup
+
+
+def warm_up_category_retriever():
+    """Cria o serviço e carrega o índice antecipadamente, fora do caminho da primeira pergunta."""
+    try:
+        retriever, _ = get_retriever()
+        retriever.warm_up()
+        logger.info("Serviço de busca de categorias aquecido.")
+    except Exception as e:
+        logger.warning(f"Falha ao aquecer o serviço de busca de categorias: {e}")
+
+
+def reset_retriever():
+    """Descarta o serviço compartilhado (ex.: após reindexar as categorias)."""
+    global _retriever
+    with _lock:
+        _retriever = None
+
+
+def get_stats() -> dict:
+    """
+    Tempo acumulado de preparação e de busca desde o início do processo e
+    quantas buscas o caminho léxico respondeu sozinho.
+    """
+    with _lock:
+        stats = dict(_stats)
+    searches = stats["searches"]
+    routed = stats["lexical_fast_path"] + stats["hybrid"] + stats["vector_only"]
+    return {
+        **stats,
+        "fast_path_rate": stats["lexical_fast_path"] / routed if routed else 0.0,
+        "avg_setup_ms": stats["setup_seconds"] * 1000 / searches if searches else 0.0,
+        "avg_search_ms": (stats["embedding_seconds"] + stats["search_seconds"]) * 1000 / searches if searches else 0.0,
+    }
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"buscas={stats['searches']}, criações={stats['cold_starts']}, "
+        f"preparação média={stats['avg_setup_ms']:.0f} ms, busca média={stats['avg_search_ms']:.0f} ms, "
+        f"caminho léxico={stats['lexical_fast_path']} ({stats['fast_path_rate']:.0%}), "
+        f"híbridas={stats['hybrid']}, só vetorial={stats['vector_only']}"
+    )
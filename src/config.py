@@ -7,6 +7,12 @@ load_dotenv()
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 LOG_PATH = PROJECT_ROOT / "agent.log"
+# Substitutos locais da OpenAI e do BigQuery para testes de carga offline (scripts/openai_stand_in.py e
+# scripts/build_sample_mirror.py): caches, índices e espelho ficam em .cache/stand_in, separados dos reais
+LOCAL_STAND_INS = os.getenv("LOCAL_STAND_INS", "false").lower() in ("true", "1", "yes")
+STAND_IN_DIR = PROJECT_ROOT / ".cache" / "stand_in"
+CACHE_DIR = Path(os.getenv("AGENT_CACHE_DIR", STAND_IN_DIR if LOCAL_STAND_INS else PROJECT_ROOT / ".cache"))
+LOCAL_MIRROR_PATH = Path(os.getenv("LOCAL_MIRROR_PATH", STAND_IN_DIR / "mirror" if LOCAL_STAND_INS else PROJECT_ROOT / "mirror"))
 
 logger = logging.getLogger("DataAgentLogger")
 logger.setLevel(logging.INFO)
@@ -18,21 +24,173 @@ if not logger.handlers:
     logger.addHandler(fh)
     logger.propagate = False
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "stand-in" if LOCAL_STAND_INS else None)
+# Endpoint compatível com a OpenAI (vazio = API oficial)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "http://127.0.0.1:8765/v1" if LOCAL_STAND_INS else "") or None
 BIGQUERY_PROJECT = os.getenv("BIGQUERY_PROJECT")
+# Cliente do BigQuery: "bigquery" (real) ou "local" (compatível, respondido pelo espelho local com DuckDB)
+BIGQUERY_BACKEND = os.getenv("BIGQUERY_BACKEND", "local" if LOCAL_STAND_INS else "bigquery").lower()
+# Latência simulada de cada job do cliente local, em ms ("fixed:200", "uniform:100:400", "lognormal:300:0.5")
+LOCAL_BIGQUERY_LATENCY = os.getenv("LOCAL_BIGQUERY_LATENCY", "lognormal:400:0.5")
+# Multiplicador dos bytes estimados pelo cliente local (amostra pequena simulando a tabela inteira)
+LOCAL_BIGQUERY_SCAN_SCALE = float(os.getenv("LOCAL_BIGQUERY_SCAN_SCALE", "1"))
+# Conexões HTTP simultâneas do cliente compartilhado do BigQuery
+BIGQUERY_POOL_SIZE = int(os.getenv("BIGQUERY_POOL_SIZE", "16"))
+BIGQUERY_WARMUP = os.getenv("BIGQUERY_WARMUP", "true").lower() in ("true", "1", "yes")
+
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gpt-4o-mini")
+# Modelo por nó, sobrescrevendo LLM_MODEL_NAME (ex.: LLM_MODEL_SQL_GENERATOR=gpt-4.1)
+LLM_NODES = [
+    "intent_router", "query_expander", "sql_generator", "response_synthesizer", "conversational_responder",
+    "history_summarizer",
+]
+LLM_NODE_MODELS = {node: os.getenv(f"LLM_MODEL_{node.upper()}") for node in LLM_NODES if os.getenv(f"LLM_MODEL_{node.upper()}")}
+# Pool HTTP compartilhado pelos clientes do LLM: conexões, keep-alive, timeouts e novas tentativas
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Cache de respostas do LLM (chave: modelo, esquema da saída estruturada e prompt exato)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "20000"))
+# Histórico da conversa nos prompts: os turnos mais recentes entram literalmente e os anteriores são
+# resumidos (resumo incremental salvo no checkpoint da conversa, com até N tokens)
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() in ("true", "1", "yes")
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", "4"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+# Política de histórico por nó: turnos recentes, orçamento de tokens (0 = sem limite) e se inclui o resumo
+# (sobrescreva com HISTORY_TURNS_<NÓ> e HISTORY_MAX_TOKENS_<NÓ>)
+HISTORY_POLICIES = {
+    "intent_router": {"turns": 1, "max_tokens": 400, "summary": False},
+    "query_expander": {"turns": 2, "max_tokens": 800, "summary": True},
+    "sql_generator": {"turns": 4, "max_tokens": 2000, "summary": True},
+    "conversational_responder": {"turns": 3, "max_tokens": 1200, "summary": True},
+}
+for _node, _policy in HISTORY_POLICIES.items():
+    _policy["turns"] = int(os.getenv(f"HISTORY_TURNS_{_node.upper()}", _policy["turns"]))
+    _policy["max_tokens"] = int(os.getenv(f"HISTORY_MAX_TOKENS_{_node.upper()}", _policy["max_tokens"]))
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
 
 USE_VECTOR_DB = os.getenv("USE_VECTOR_DB", "true").lower() in ("true", "1", "yes")
+# Índice vetorial de categorias, criado por scripts/vectordb.py: "chroma" ou "numpy" (matriz em memória)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "chroma").lower()
+CHROMA_PATH = STAND_IN_DIR / "chroma_db_index" if LOCAL_STAND_INS else PROJECT_ROOT / "chroma_db_index"
+CHROMA_COLLECTION_NAME = "categories_1746"
+NUMPY_INDEX_PATH = Path(os.getenv("NUMPY_INDEX_PATH", STAND_IN_DIR / "vector_index" if LOCAL_STAND_INS else PROJECT_ROOT / "vector_index"))
+# Busca híbrida: índice léxico (BM25 + trigramas) responde sozinho quando a cobertura da categoria na pergunta
+# atinge o limiar; abaixo dele a busca vetorial também roda e os rankings são combinados
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() in ("true", "1", "yes")
+LEXICAL_CONFIDENCE_THRESHOLD = float(os.getenv("LEXICAL_CONFIDENCE_THRESHOLD", "0.9"))
+# Expansão da pergunta para a busca de categorias: pula o LLM em perguntas auto-suficientes, guarda as
+# expansões por conversa/turno e pode rodar em paralelo ao Buscador de Esquema
+QUERY_EXPANSION_HEURISTIC = os.getenv("QUERY_EXPANSION_HEURISTIC", "true").lower() in ("true", "1", "yes")
+QUERY_EXPANSION_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EXPANSION_CACHE_MAX_ENTRIES", "512"))
+QUERY_EXPANSION_PARALLEL = os.getenv("QUERY_EXPANSION_PARALLEL", "true").lower() in ("true", "1", "yes")
+# Abre o índice de categorias na inicialização, antes da primeira pergunta
+CATEGORY_RETRIEVAL_WARMUP = os.getenv("CATEGORY_RETRIEVAL_WARMUP", "true").lower() in ("true", "1", "yes")
+# Cache de embeddings: vetores persistidos em disco (memory-map) e LRU em memória
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
 
 CHAMADOS_TABLE_FULL_PATH = "datario.adm_central_atendimento_1746.chamado"
 BAIRROS_TABLE_FULL_PATH  = "datario.dados_mestres.bairro"
 
 CATEGORICAL_COLUMNS = ["tipo", "categoria", "subtipo"]
+# Hierarquia das colunas categóricas, da mais geral para a mais específica
+CATEGORY_HIERARCHY = ["categoria", "tipo", "subtipo"]
+
+# Catálogo de categorias do fallback (sem banco vetorial): intervalo de recarga a partir do BigQuery,
+# carga/agendamento na inicialização e quantos valores por coluna enviar (0 = todos)
+CATEGORY_CATALOG_REFRESH_SECONDS = int(os.getenv("CATEGORY_CATALOG_REFRESH_SECONDS", "86400"))
+CATEGORY_CATALOG_PRELOAD = os.getenv("CATEGORY_CATALOG_PRELOAD", "true").lower() in ("true", "1", "yes")
+CATEGORY_CATALOG_TOP_N = int(os.getenv("CATEGORY_CATALOG_TOP_N", "0"))
+# Contexto de categorias como subárvore da hierarquia (categoria → tipo → subtipo) dos termos encontrados,
+# com até N filhos por nó, os mais frequentes
+CATEGORY_HIERARCHY_ENABLED = os.getenv("CATEGORY_HIERARCHY_ENABLED", "true").lower() in ("true", "1", "yes")
+CATEGORY_HIERARCHY_MAX_CHILDREN = int(os.getenv("CATEGORY_HIERARCHY_MAX_CHILDREN", "8"))
+
+# Tabela de agregados diários (contagem de chamados por dia, categoria, tipo, subtipo e bairro)
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "true").lower() in ("true", "1", "yes")
+ROLLUP_TABLE_FULL_PATH = os.getenv("ROLLUP_TABLE_FULL_PATH", f"{BIGQUERY_PROJECT or 'local'}.agente_1746.chamado_diario")
+# Quantos dias recentes são recalculados a cada atualização incremental
+ROLLUP_REFRESH_DAYS = int(os.getenv("ROLLUP_REFRESH_DAYS", "7"))
+# Defasagem máxima (s) entre a atualização de `chamado` e a dos agregados para usá-los
+ROLLUP_MAX_LAG_SECONDS = int(os.getenv("ROLLUP_MAX_LAG_SECONDS", "86400"))
+# Tempo (s) até procurar de novo uma tabela de agregados ausente (evita um get_table por consulta)
+ROLLUP_MISSING_RETRY_SECONDS = int(os.getenv("ROLLUP_MISSING_RETRY_SECONDS", "300"))
+
+# Tempo (s) até o cache de esquema revalidar o etag/modified das tabelas
+SCHEMA_CACHE_TTL_SECONDS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "3600"))
+
+# Seleção de esquema: envia ao gerador de SQL apenas as colunas relevantes
+SCHEMA_SELECTION_ENABLED = os.getenv("SCHEMA_SELECTION_ENABLED", "true").lower() in ("true", "1", "yes")
+SCHEMA_SELECTION_TOP_K = int(os.getenv("SCHEMA_SELECTION_TOP_K", "8"))
+SCHEMA_SELECTION_USE_EMBEDDINGS = os.getenv("SCHEMA_SELECTION_USE_EMBEDDINGS", "false").lower() in ("true", "1", "yes")
+
+# Poda de partições: coluna de data usada nos filtros das perguntas
+PARTITION_DATE_COLUMN = "data_inicio"
+# Declara que a coluna de partição de `chamado`, quando diferente, é DATE_TRUNC(DATE(data_inicio), <granularidade>);
+# só ative depois de conferir essa relação nos dados, senão o filtro acrescentado pode descartar linhas
+PARTITION_FIELD_DERIVED = os.getenv("PARTITION_FIELD_DERIVED", "false").lower() in ("true", "1", "yes")
+# Consultas sem filtro de data: "warn" apenas registra; "require" pede ao gerador que restrinja o período
+PARTITION_FILTER_POLICY = os.getenv("PARTITION_FILTER_POLICY", "warn").lower()
+
+# Orçamento de bytes processados no BigQuery (0 desativa o limite)
+MAX_BYTES_PER_QUERY = int(os.getenv("MAX_BYTES_PER_QUERY", str(10 * 1024**3)))
+MAX_BYTES_PER_THREAD = int(os.getenv("MAX_BYTES_PER_THREAD", str(100 * 1024**3)))
+# Quantas vezes uma consulta acima do orçamento volta ao gerador para ser reescrita
+SQL_REWRITE_ATTEMPTS = int(os.getenv("SQL_REWRITE_ATTEMPTS", "1"))
+
+# Onde o SQL gerado é executado: "bigquery" ou "duckdb" (espelho local em Parquet)
+SQL_EXECUTOR_BACKEND = os.getenv("SQL_EXECUTOR_BACKEND", "bigquery").lower()
+
+# Prazo (s) de cada turno para a execução da consulta (0 desativa); o job é cancelado ao estourá-lo
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "120"))
+# Intervalo inicial e máximo (s) entre as verificações de um job do BigQuery em andamento
+QUERY_POLL_INTERVAL_SECONDS = float(os.getenv("QUERY_POLL_INTERVAL_SECONDS", "0.25"))
+QUERY_POLL_MAX_INTERVAL_SECONDS = float(os.getenv("QUERY_POLL_MAX_INTERVAL_SECONDS", "2"))
+
+# Leitura de resultados em lotes Arrow: máximo de linhas convertidas para o sintetizador
+SQL_RESULT_ROW_CAP = int(os.getenv("SQL_RESULT_ROW_CAP", "1000"))
+USE_BQ_STORAGE_API = os.getenv("USE_BQ_STORAGE_API", "true").lower() in ("true", "1", "yes")
+
+# Cache de resultados de consultas (chave: SQL canônico)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+# Classificador local de intenção à frente do roteador com LLM: "on" decide localmente quando confiante,
+# "shadow" só compara com a decisão do LLM (padrão até a concordância ser medida), "off" desativa.
+# Exemplos: casos de teste e decisões do LLM
+INTENT_CLASSIFIER_MODE = os.getenv("INTENT_CLASSIFIER_MODE", "shadow").lower()
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.8"))
+INTENT_CLASSIFIER_K = int(os.getenv("INTENT_CLASSIFIER_K", "5"))
+INTENT_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("INTENT_CLASSIFIER_MIN_SIMILARITY", "0.6"))
+INTENT_CLASSIFIER_MIN_EXAMPLES = int(os.getenv("INTENT_CLASSIFIER_MIN_EXAMPLES", "20"))
+INTENT_CLASSIFIER_LEARN = os.getenv("INTENT_CLASSIFIER_LEARN", "true").lower() in ("true", "1", "yes")
+INTENT_TRAINING_CASES_PATH = Path(os.getenv("INTENT_TRAINING_CASES_PATH", PROJECT_ROOT / "eval" / "test_cases.json"))
+# Cache semântico de perguntas: turnos sem histórico parecidos com uma pergunta já respondida
+# reaproveitam o SQL validado (limiar de similaridade ajustável com eval/question_cache_tuning.py)
+QUESTION_CACHE_ENABLED = os.getenv("QUESTION_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+QUESTION_CACHE_THRESHOLD = float(os.getenv("QUESTION_CACHE_THRESHOLD", "0.93"))
+QUESTION_CACHE_TTL_SECONDS = int(os.getenv("QUESTION_CACHE_TTL_SECONDS", "604800"))
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "2000"))
 
 FORBIDDEN_SQL_KEYWORDS = [
     "UPDATE", "DELETE", "INSERT", "DROP", "CREATE", 
     "ALTER", "TRUNCATE", "MERGE", "GRANT", "REVOKE"
 ]
 
+# Colunas sempre enviadas ao gerador (chaves de junção e filtro de data)
+SCHEMA_REQUIRED_COLUMNS = {
+    CHAMADOS_TABLE_FULL_PATH: ["id_chamado", "data_inicio", "id_bairro"],
+    BAIRROS_TABLE_FULL_PATH: ["id_bairro", "nome"],
+}
+
 ALLOWED_TABLES = [
     CHAMADOS_TABLE_FULL_PATH,
     BAIRROS_TABLE_FULL_PATH
@@ -0,0 +1,205 @@
+"""
+Cache persistente de embeddings (texto + modelo → vetor).
+
+Os vetores de cada modelo ficam em um arquivo binário de float32, apenas
+acrescentado e lido por memory-map; um índice em SQLite associa o hash do texto
+normalizado (espaços colapsados, sem diferença de maiúsculas) à linha do
+arquivo. Na frente do disco há um nível em memória (LRU). Só os textos ausentes
+dos dois níveis são enviados, em lote, ao endpoint de embeddings.
+
+O cache é compartilhado pelo buscador de categorias, pela seleção de esquema e
+por `scripts/vectordb.py`: perguntas repetidas e categorias inalteradas nunca
+são embutidas duas vezes. A escrita em disco é protegida por `flock`, então o
+script de indexação e o agente podem usar o mesmo diretório ao mesmo tempo.
+"""
+import re
+import fcntl
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from . import config as _config
+from .config import logger, CACHE_DIR, EMBEDDING_MODEL_NAME
+
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+EMBEDDING_INDEX_PATH = EMBEDDING_CACHE_DIR / "index.sqlite"
+EMBEDDING_BATCH_SIZE = 256
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_vectors: dict[str, np.memmap] = {}
+_embedding_fns: dict[str, object] = {}
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "api_calls": 0}
+
+
+def normalize_text(text: str) -> str:
+    """Forma usada na chave: NFC, espaços colapsados e sem diferença de maiúsculas."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip().casefold()
+
+
+def _cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _vectors_path(model: str):
+    return EMBEDDING_CACHE_DIR / f"{re.sub(r'[^\w.-]', '_', model)}.f32"
+
+
+@contextmanager
+def _connect():
+    """Abre o índice em SQLite (uma conexão por operação, segura entre threads)."""
+    EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_INDEX_PATH, timeout=10)
+    try:
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, row INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER)")
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(name: str, amount: int = 1):
+    with _lock:
+        _stats[name] += amount
+
+
+def _remember(key: str, vector: np.ndarray):
+    with _lock:
+        _memory[key] = vector
+        _memory.move_to_end(key)
+        while len(_memory) > _config.EMBEDDING_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _read_rows(model: str, dim: int, rows: list[int]) -> np.ndarray:
+    """Lê linhas do arquivo de vetores, reabrindo o memory-map se ele cresceu."""
+    with _lock:
+        vectors = _vectors.get(model)
+        if vectors is None or vectors.shape[0] <= max(rows):
+            vectors = np.memmap(_vectors_path(model), dtype=np.float32, mode="r").reshape(-1, dim)
+            _vectors[model] = vectors
+    return np.array(vectors[rows])
+
+
+def _embedding_fn(model: str):
+    from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+
+    with _lock:
+        if model not in _embedding_fns:
+            _embedding_fns[model] = OpenAIEmbeddingFunction(
+                api_key=_config.OPENAI_API_KEY, model_name=model, api_base=_config.OPENAI_BASE_URL
+            )
+        return _embedding_fns[model]
+
+
+def _append(model: str, keys: list[str], matrix: np.ndarray, replace: bool = False):
+    """
+    Acrescenta vetores ao arquivo do modelo e registra suas linhas no índice
+    (com `replace`, as chaves já registradas passam a apontar para os novos vetores).
+    """
+    EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(EMBEDDING_CACHE_DIR / ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with _connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO models VALUES (?, ?)", (model, matrix.shape[1]))
+            with open(_vectors_path(model), "ab") as f:
+                first_row = f.tell() // (matrix.shape[1] * 4)
+                f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            conn.executemany(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO embeddings VALUES (?, ?, ?)",
+                [(key, model, first_row + i) for i, key in enumerate(keys)],
+            )
+
+
+def _lookup_disk(model: str, keys: list[str]) -> dict[str, np.ndarray]:
+    with _connect() as conn:
+        dim = conn.execute("SELECT dim FROM models WHERE model = ?", (model,)).fetchone()
+        if dim is None:
+            return {}
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(conn.execute(
+                f"SELECT key, row FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+    if not found:
+        return {}
+    matrix = _read_rows(model, dim[0], list(found.values()))
+    return dict(zip(found.keys(), matrix))
+
+
+def embed_texts(texts: list[str], model: str = EMBEDDING_MODEL_NAME, refresh: bool = False) -> np.ndarray:
+    """
+    Retorna a matriz (float32) de embeddings dos textos, na mesma ordem,
+    consultando a memória, depois o disco e, por fim, o endpoint de embeddings
+    apenas para os textos ainda ausentes. Com `refresh`, todos os textos vão ao
+    endpoint e os novos vetores substituem os que estavam em cache.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    keys = [_cache_key(text, model) for text in texts]
+    vectors: dict[str, np.ndarray] = {}
+    if not refresh:
+        with _lock:
+            for key in keys:
+                if key in _memory:
+                    _memory.move_to_end(key)
+                    vectors[key] = _memory[key]
+        _count("memory_hits", len(vectors))
+
+    pending = list(dict.fromkeys(key for key in keys if key not in vectors))
+    if pending and _config.EMBEDDING_CACHE_ENABLED and not refresh:
+        try:
+            from_disk = _lookup_disk(model, pending)
+        except (sqlite3.Error, OSError, ValueError, IndexError) as e:
+            logger.warning(f"   Cache de embeddings em disco indisponível: {e}")
+            from_disk = {}
+        for key, vector in from_disk.items():
+            vectors[key] = vector
+            _remember(key, vector)
+        _count("disk_hits", len(from_disk))
+
+    missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+    if missing:
+        text_of = dict(zip(keys, texts))
+        embedding_fn = _embedding_fn(model)
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            matrix = np.asarray(embedding_fn([text_of[key] for key in batch]), dtype=np.float32)
+            _count("api_calls")
+            if _config.EMBEDDING_CACHE_ENABLED:
+                try:
+                    _append(model, batch, matrix, replace=refresh)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"   Falha ao gravar embeddings no cache em disco: {e}")
+            for key, vector in zip(batch, matrix):
+                vectors[key] = vector
+                _remember(key, vector)
+        _count("misses", len(missing))
+    return np.stack([vectors[key] for key in keys])
+
+
+def embed_text(text: str, model: str = EMBEDDING_MODEL_NAME) -> np.ndarray:
+    """Embedding de um único texto."""
+    return embed_texts([text], model)[0]
+
+
+def get_stats() -> dict:
+    """Acertos por nível, textos embutidos e chamadas ao endpoint desde o início do processo."""
+    with _lock:
+        stats = dict(_stats)
+    hits = stats["memory_hits"] + stats["disk_hits"]
+    total = hits + stats["misses"]
+    return {**stats, "hit_rate": hits / total if total else 0.0}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"acertos={stats['memory_hits']}+{stats['disk_hits']} (memória+disco), "
+        f"embutidos={stats['misses']} em {stats['api_calls']} chamadas, taxa={stats['hit_rate']:.0%}"
+    )
@@ -0,0 +1,112 @@
+"""
+Histórico da conversa nos prompts, com orçamento de tokens por nó.
+
+Os turnos recentes entram literalmente; os mais antigos são resumidos. O
+resumo fica no estado (`history_summary`, salvo no checkpoint com a
+conversa) e é mantido de forma incremental pelo nó `history_summarizer` ao
+fim do turno: apenas os turnos que acabaram de sair da janela de
+`HISTORY_RECENT_TURNS` são incorporados ao resumo anterior.
+
+Cada nó tem uma política em `HISTORY_POLICIES`: quantos turnos recentes
+recebe, o orçamento de tokens do histórico e se o resumo é incluído (o
+roteador de intenção precisa de bem menos contexto que o gerador de SQL).
+"""
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from . import config as _config
+from .config import logger
+from .llm import get_llm
+from .tokens import count_tokens
+
+HISTORY_HEADER = "Histórico da Conversa Anterior:\n"
+
+
+def split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Agrupa as mensagens em turnos: cada pergunta do usuário com as respostas seguintes."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _format_turn(turn: list[BaseMessage]) -> str:
+    lines = []
+    for message in turn:
+        if isinstance(message, HumanMessage):
+            lines.append(f"Usuário: {message.content}\n")
+        elif isinstance(message, AIMessage):
+            lines.append(f"Assistente: {message.content}\n")
+    return "".join(lines)
+
+
+def _policy(node: str) -> dict:
+    default = {"turns": _config.HISTORY_RECENT_TURNS, "max_tokens": 0, "summary": True}
+    return {**default, **_config.HISTORY_POLICIES.get(node, {})}
+
+
+def format_history(state: dict, node: str) -> str:
+    """
+    Histórico das mensagens anteriores à pergunta atual para o prompt do nó:
+    o resumo dos turnos antigos (se a política o incluir) e os turnos mais
+    recentes, descartando os mais antigos deles até caber no orçamento. O
+    último turno é sempre mantido.
+    """
+    previous = state["messages"][:-1]
+    if not previous:
+        return ""
+    policy = _policy(node)
+    summarized = state.get("summarized_messages", 0) if _config.HISTORY_SUMMARY_ENABLED else 0
+    turns = [_format_turn(turn) for turn in split_turns(previous[summarized:])]
+    turns = turns[-policy["turns"]:] if policy["turns"] > 0 else []
+
+    summary = state.get("history_summary", "") if policy["summary"] and summarized else ""
+    summary_section = f"Resumo da conversa até aqui: {summary}\n" if summary else ""
+    if policy["max_tokens"]:
+        budget = policy["max_tokens"] - count_tokens(HISTORY_HEADER + summary_section)
+        while len(turns) > 1 and count_tokens("".join(turns)) > budget:
+            turns.pop(0)
+    if not turns and not summary_section:
+        return ""
+    return HISTORY_HEADER + summary_section + "".join(turns)
+
+
+def pending_messages(state: dict) -> int:
+    """
+    Índice até onde as mensagens já deveriam estar no resumo: tudo antes dos
+    `HISTORY_RECENT_TURNS` turnos mais recentes (zero se nada a resumir).
+    """
+    if not _config.HISTORY_SUMMARY_ENABLED:
+        return 0
+    turns = split_turns(state["messages"])
+    if len(turns) <= _config.HISTORY_RECENT_TURNS:
+        return 0
+    boundary = sum(len(turn) for turn in turns[:len(turns) - _config.HISTORY_RECENT_TURNS])
+    return boundary if boundary > state.get("summarized_messages", 0) else 0
+
+
+def _build_prompt(summary: str, turns: str) -> str:
+    return f"""
+        Você mantém o resumo de uma conversa entre um usuário e um assistente que consulta dados de chamados do 1746.
+
+        Resumo atual: {summary or "(vazio)"}
+
+        Novos turnos a incorporar:
+        {turns}
+
+        Escreva o resumo atualizado em no máximo {_config.HISTORY_SUMMARY_MAX_TOKENS} tokens. Preserve apenas o que
+        ajuda a entender perguntas futuras: assuntos, categorias, períodos, bairros, filtros e números citados.
+        Retorne APENAS o resumo.
+        """
+
+
+def summarize(state: dict) -> dict:
+    """Incorpora ao resumo os turnos que saíram da janela de turnos recentes."""
+    boundary = pending_messages(state)
+    if not boundary:
+        return {}
+    start = state.get("summarized_messages", 0)
+    turns = "".join(_format_turn(turn) for turn in split_turns(state["messages"][start:boundary]))
+    summary = get_llm("history_summarizer").invoke(_build_prompt(state.get("history_summary", ""), turns)).content.strip()
+    logger.info(f"   Resumo do histórico atualizado ({boundary} mensagens, {count_tokens(summary)} tokens).")
+    return {"history_summary": summary, "summarized_messages": boundary}
@@ -0,0 +1,243 @@
+"""
+Classificador local de intenção, à frente do Roteador de Intenção com LLM.
+
+Decide entre `chat`, `sql_direct` e `sql_contextual` com uma confiança, em
+duas etapas:
+
+1. Regras: saudações e agradecimentos sem termos de dados são `chat`;
+   perguntas sobre dados com um texto entre aspas são `sql_contextual`.
+2. Vizinhos mais próximos sobre os embeddings das perguntas de exemplo: os
+   casos de `eval/test_cases.json` (campo `expected_plan` ou, na falta dele,
+   o plano deduzido do caso) e as decisões do LLM registradas em turnos sem
+   histórico. A confiança é a fração da similaridade dos k vizinhos que vota
+   no plano vencedor.
+
+Quando a confiança fica abaixo de `INTENT_CLASSIFIER_THRESHOLD`, a pergunta
+está longe de todos os exemplos ou retoma o turno anterior, o classificador
+não decide e o LLM é chamado. No modo "shadow" o LLM sempre decide e a
+decisão local só é comparada com a dele, medindo a concordância.
+"""
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from contextlib import contextmanager
+from . import config as _config
+from .config import logger, CACHE_DIR, EMBEDDING_MODEL_NAME, INTENT_TRAINING_CASES_PATH
+from .embedding_cache import embed_texts, normalize_text
+from .query_expansion import is_self_contained
+from .lexical_index import normalize
+from .vector_index import normalize_rows
+
+PLANS = ("chat", "sql_direct", "sql_contextual")
+INTENT_DECISIONS_PATH = CACHE_DIR / "intent_decisions.sqlite"
+
+_CHAT_RE = re.compile(
+    r"^(oi|ola|opa|eai|e ai|bom dia|boa tarde|boa noite|obrigad[oa]|valeu|tchau|ate mais|ate logo|"
+    r"tudo bem|tudo certo|beleza|quem e voce|quem (te )?criou|o que voce faz|como voce funciona)\b"
+)
+_DATA_RE = re.compile(
+    r"\b(chamados?|quant[oa]s?|quantidade|numero|total|media|percentual|porcentagem|bairros?|subprefeituras?|"
+    r"categorias?|tipos?|subtipos?|ranking|frequentes?|abert[oa]s?|registrad[oa]s?|(19|20)\d\d)\b"
+)
+_QUOTED_RE = re.compile(r"['\"“”‘’][^'\"“”‘’]{3,}['\"“”‘’]")
+
+_lock = threading.Lock()
+_classifier = None
+_stats = {
+    "rules": 0, "model": 0, "fallbacks": 0, "local_ms": 0.0, "llm_calls": 0, "llm_ms": 0.0,
+    "shadow_compared": 0, "shadow_agreed": 0,
+}
+
+
+def _key(question: str) -> str:
+    return hashlib.sha256(normalize_text(question).encode("utf-8")).hexdigest()
+
+
+def rule_decision(question: str) -> dict | None:
+    """Decisão por regras, quando alguma se aplica."""
+    normalized = normalize(question).strip()
+    has_data_terms = bool(_DATA_RE.search(normalized))
+    if _CHAT_RE.match(normalized) and not has_data_terms:
+        return {"plan": "chat", "confidence": 0.99, "source": "regras"}
+    if has_data_terms and _QUOTED_RE.search(question):
+        return {"plan": "sql_contextual", "confidence": 0.95, "source": "regras"}
+    return None
+
+
+def case_plan(case: dict) -> str:
+    """Plano esperado de um caso de teste: `expected_plan` ou o deduzido do SQL e da categoria."""
+    if case.get("expected_plan") in PLANS:
+        return case["expected_plan"]
+    if not case.get("expected_sql"):
+        return "chat"
+    return "sql_contextual" if case.get("category") == "filtro_categorico" else "sql_direct"
+
+
+@contextmanager
+def _connect():
+    """Abre o SQLite das decisões registradas (uma conexão por operação, segura entre threads)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INTENT_DECISIONS_PATH, timeout=5)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, question TEXT, plan TEXT, created_at REAL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def load_examples() -> list[dict]:
+    """Decisões registradas do LLM e casos de teste rotulados (estes prevalecem na mesma pergunta)."""
+    examples = {}
+    try:
+        with _connect() as conn:
+            rows = conn.execute("SELECT key, question, plan FROM decisions ORDER BY created_at").fetchall()
+        for key, question, plan in rows:
+            examples[key] = {"question": question, "plan": plan, "origin": "llm"}
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao ler as decisões de intenção registradas: {e}")
+    if INTENT_TRAINING_CASES_PATH.exists():
+        with open(INTENT_TRAINING_CASES_PATH, "r", encoding="utf-8") as f:
+            cases = json.load(f).get("single_turn", [])
+        for case in cases:
+            for question in [case["question"], *case.get("paraphrases", [])]:
+                examples[_key(question)] = {"question": question, "plan": case_plan(case), "origin": "casos"}
+    return list(examples.values())
+
+
+class IntentClassifier:
+    """Vizinhos mais próximos (similaridade de cosseno) sobre os embeddings dos exemplos."""
+
+    def __init__(self, examples: list[dict]):
+        self.examples = examples
+        self.labels = np.array([PLANS.index(example["plan"]) for example in examples], dtype=np.int64)
+        questions = [example["question"] for example in examples]
+        self.matrix = normalize_rows(embed_texts(questions, EMBEDDING_MODEL_NAME)) if questions else None
+        self._lock = threading.Lock()
+
+    def add(self, question: str, plan: str):
+        """Acrescenta um exemplo (os rótulos antes da matriz: `predict` lê a matriz primeiro)."""
+        vector = normalize_rows(embed_texts([question], EMBEDDING_MODEL_NAME))
+        with self._lock:
+            self.examples.append({"question": question, "plan": plan, "origin": "llm"})
+            self.labels = np.append(self.labels, PLANS.index(plan))
+            self.matrix = vector if self.matrix is None else np.vstack([self.matrix, vector])
+
+    def predict(self, question: str, exclude: int | None = None) -> dict | None:
+        """
+        Plano mais votado entre os k vizinhos, com a confiança. None se há
+        poucos exemplos ou se o vizinho mais próximo está abaixo da similaridade
+        mínima. `exclude` ignora um exemplo (avaliação deixando-o de fora).
+        """
+        matrix, labels = self.matrix, self.labels
+        if matrix is None or len(matrix) < _config.INTENT_CLASSIFIER_MIN_EXAMPLES:
+            return None
+        query = normalize_rows(embed_texts([question], EMBEDDING_MODEL_NAME))[0]
+        scores = matrix @ query
+        if exclude is not None:
+            scores[exclude] = -1.0
+        k = min(_config.INTENT_CLASSIFIER_K, len(scores))
+        nearest = np.argpartition(-scores, k - 1)[:k]
+        if scores[nearest].max() < _config.INTENT_CLASSIFIER_MIN_SIMILARITY:
+            return None
+        weights = np.bincount(labels[nearest], weights=np.clip(scores[nearest], 0.0, None), minlength=len(PLANS))
+        if weights.sum() <= 0:
+            return None
+        best = int(weights.argmax())
+        return {"plan": PLANS[best], "confidence": float(weights[best] / weights.sum()), "source": "modelo"}
+
+
+def get_classifier() -> IntentClassifier:
+    """Classificador treinado com os exemplos atuais, criado na primeira chamada."""
+    global _classifier
+    if _classifier is None:
+        with _lock:
+            if _classifier is None:
+                examples = load_examples()
+                _classifier = IntentClassifier(examples)
+                logger.info(f"   Classificador de intenção treinado com {len(examples)} exemplos.")
+    return _classifier
+
+
+def classify(question: str, has_history: bool) -> dict | None:
+    """
+    Decisão local (`plan`, `confidence`, `source`) ou None quando o LLM deve
+    decidir: confiança abaixo do limiar, pergunta fora da distribuição dos
+    exemplos ou pergunta que depende do turno anterior.
+    """
+    decision = rule_decision(question)
+    if decision is None and not (has_history and not is_self_contained(question)):
+        decision = get_classifier().predict(question)
+    if decision is not None and decision["confidence"] < _config.INTENT_CLASSIFIER_THRESHOLD:
+        decision = None
+    return decision
+
+
+def record_local(decision: dict | None, elapsed: float):
+    """Contabiliza uma classificação local (decidida ou enviada ao LLM)."""
+    with _lock:
+        _stats["local_ms"] += elapsed * 1000
+        if decision is None:
+            _stats["fallbacks"] += 1
+        else:
+            _stats["rules" if decision["source"] == "regras" else "model"] += 1
+
+
+def record_llm_decision(question: str, plan: str, has_history: bool, local: dict | None, elapsed: float):
+    """
+    Registra a decisão do LLM como exemplo (só em turnos sem histórico, cujo
+    plano não depende da conversa) e a compara com a decisão local, se houver.
+    """
+    with _lock:
+        _stats["llm_calls"] += 1
+        _stats["llm_ms"] += elapsed * 1000
+        if local is not None:
+            _stats["shadow_compared"] += 1
+            _stats["shadow_agreed"] += local["plan"] == plan
+    if local is not None and local["plan"] != plan:
+        logger.info(f"   Classificador local discordou do LLM: {local['plan']} ({local['source']}) x {plan}.")
+    if has_history or not _config.INTENT_CLASSIFIER_LEARN:
+        return
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?)", (_key(question), question, plan, time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao registrar a decisão de intenção: {e}")
+        return
+    if _classifier is not None:
+        _classifier.add(question, plan)
+
+
+def get_stats() -> dict:
+    """Decisões locais (regras e modelo), chamadas ao LLM, latências médias e concordância no modo shadow."""
+    with _lock:
+        stats = dict(_stats)
+    local = stats["rules"] + stats["model"]
+    classified = local + stats["fallbacks"]
+    return {
+        **stats,
+        "local_rate": local / classified if classified else 0.0,
+        "local_avg_ms": stats["local_ms"] / classified if classified else 0.0,
+        "llm_avg_ms": stats["llm_ms"] / stats["llm_calls"] if stats["llm_calls"] else 0.0,
+        "agreement": stats["shadow_agreed"] / stats["shadow_compared"] if stats["shadow_compared"] else 0.0,
+    }
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    text = (
+        f"locais={stats['rules'] + stats['model']} (regras={stats['rules']}, modelo={stats['model']}), "
+        f"LLM={stats['llm_calls']}, taxa local={stats['local_rate']:.0%}, "
+        f"latência local={stats['local_avg_ms']:.1f} ms, LLM={stats['llm_avg_ms']:.0f} ms"
+    )
+    if stats["shadow_compared"]:
+        text += f", concordância={stats['agreement']:.0%} de {stats['shadow_compared']}"
+    return text
@@ -0,0 +1,61 @@
+"""
+Distribuições de latência dos substitutos locais da OpenAI e do BigQuery.
+
+A distribuição é descrita em texto, com valores em milissegundos:
+
+- "0" ou "fixed:200": latência constante;
+- "uniform:100:400": uniforme entre os dois valores;
+- "normal:300:50": normal com média e desvio padrão (truncada em zero);
+- "lognormal:300:0.5": log-normal com mediana e sigma, com a cauda longa
+  típica das APIs remotas.
+"""
+import math
+import random
+import threading
+import time
+
+
+class LatencyDistribution:
+    """Sorteia latências (em segundos) a partir de uma especificação em texto."""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str, seed: int | None = None):
+        self.spec = spec.strip() or "0"
+        kind, *params = self.spec.split(":")
+        if kind not in self.KINDS:
+            kind, params = "fixed", [kind]
+        try:
+            self.params = [float(value) for value in params]
+        except ValueError:
+            raise ValueError(f"Distribuição de latência inválida: '{spec}'")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}[kind]
+        if len(self.params) != expected:
+            raise ValueError(f"Distribuição '{kind}' espera {expected} parâmetro(s): '{spec}'")
+        self.kind = kind
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Uma latência sorteada, em segundos."""
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.params[0]
+            elif self.kind == "uniform":
+                ms = self._random.uniform(*self.params)
+            elif self.kind == "normal":
+                ms = self._random.gauss(*self.params)
+            else:
+                median, sigma = self.params
+                ms = self._random.lognormvariate(math.log(max(median, 1e-3)), sigma)
+        return max(ms, 0.0) / 1000
+
+    def sleep(self) -> float:
+        """Espera uma latência sorteada e a retorna."""
+        seconds = self.sample()
+        if seconds:
+            time.sleep(seconds)
+        return seconds
+
+    def __repr__(self) -> str:
+        return f"LatencyDistribution('{self.spec}')"
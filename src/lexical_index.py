@@ -0,0 +1,88 @@
+"""
+Índice léxico do catálogo de categorias (BM25 + trigramas).
+
+Textos e perguntas são normalizados sem acentos e sem diferença de
+maiúsculas. O BM25 sobre palavras seleciona os candidatos, e a cobertura de
+trigramas mede quanto do texto da categoria aparece na pergunta (1.0 quando a
+categoria é citada literalmente, perto de 1.0 com pequenas variações de
+grafia). Essa cobertura é a confiança usada pelo caminho rápido do buscador
+híbrido.
+"""
+import re
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Categorias mais curtas que isso não disparam o caminho rápido sozinhas
+MIN_CONFIDENT_LENGTH = 5
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação, com espaços colapsados."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9]+", " ", text)).strip()
+
+
+def trigrams(normalized: str) -> set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LexicalIndex:
+    """BM25 sobre as palavras e trigramas de cada texto do catálogo."""
+
+    def __init__(self, documents: list[str]):
+        self.documents = documents
+        self.normalized = [normalize(doc) for doc in documents]
+        self.trigrams = [trigrams(text) for text in self.normalized]
+        self.lengths = [len(text.split()) for text in self.normalized]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for i, text in enumerate(self.normalized):
+            for term, freq in Counter(text.split()).items():
+                self.postings[term].append((i, freq))
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _bm25(self, terms: list[str]) -> dict[int, float]:
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            for i, freq in self.postings.get(term, []):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_length or 1))
+                scores[i] += self.idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+        return scores
+
+    def coverage(self, i: int, query_normalized: str, query_trigrams: set[str]) -> float:
+        """Fração do texto da categoria presente na pergunta (1.0 se citado literalmente)."""
+        if f" {self.normalized[i]} " in f" {query_normalized} ":
+            return 1.0
+        return len(self.trigrams[i] & query_trigrams) / len(self.trigrams[i]) if self.trigrams[i] else 0.0
+
+    def search(self, query: str, n_results: int = 5, candidates: int = 50) -> list[tuple[int, float, float]]:
+        """
+        Retorna (posição no catálogo, cobertura, BM25) dos melhores textos,
+        ordenados pela cobertura e, em seguida, pelo BM25.
+        """
+        query_normalized = normalize(query)
+        scores = self._bm25(query_normalized.split())
+        if not scores:
+            return []
+        query_trigrams = trigrams(query_normalized)
+        top = sorted(scores, key=scores.get, reverse=True)[:candidates]
+        ranked = sorted(
+            ((i, self.coverage(i, query_normalized, query_trigrams), scores[i]) for i in top),
+            key=lambda item: (item[1], item[2]),
+            reverse=True,
+        )
+        return ranked[:n_results]
+
+    def is_confident(self, i: int, coverage: float, threshold: float) -> bool:
+        return coverage >= threshold and len(self.normalized[i]) >= MIN_CONFIDENT_LENGTH
@@ -1,9 +1,106 @@
+"""
+Registro dos clientes do LLM.
+
+Todos os nós pedem o cliente por `get_llm(node)`. Há um `ChatOpenAI` por
+configuração de modelo (nome e temperatura), criado na primeira chamada e
+reaproveitado pelos nós que usam o mesmo modelo, e todos compartilham um único
+pool HTTP (síncrono e assíncrono), com limites de conexões, keep-alive e
+timeouts configuráveis, e consultam o cache de respostas (`src/llm_cache.py`)
+antes de chamar a API. O modelo de cada nó pode ser trocado em
+`LLM_NODE_MODELS` (`LLM_MODEL_<NÓ>`) sem abrir novos clientes HTTP.
+"""
+import threading
+import httpx
 from langchain_openai import ChatOpenAI
-from .config import OPENAI_API_KEY
+from .config import (
+    logger, OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL_NAME, LLM_NODE_MODELS, LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY_SECONDS, LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+)
+from .llm_cache import LLMResponseCache
+
+_lock = threading.Lock()
+_clients: dict[tuple[str, float], ChatOpenAI] = {}
+_http_client: httpx.Client | None = None
+_http_async_client: httpx.AsyncClient | None = None
+_response_cache = LLMResponseCache()
+
 
-def make_llm():
-    return ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0,
-        api_key=OPENAI_API_KEY,
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
     )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def _http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """Pools HTTP compartilhados por todos os modelos (chamar com `_lock`)."""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+        _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        logger.info(
+            f"Pool HTTP do LLM criado ({LLM_MAX_CONNECTIONS} conexões, "
+            f"keep-alive de {LLM_KEEPALIVE_EXPIRY_SECONDS:g}s)."
+        )
+    return _http_client, _http_async_client
+
+
+def model_for(node: str | None) -> str:
+    """Modelo usado pelo nó: a sobrescrita em `LLM_NODE_MODELS` ou `LLM_MODEL_NAME`."""
+    return LLM_NODE_MODELS.get(node, LLM_MODEL_NAME) if node else LLM_MODEL_NAME
+
+
+def get_llm(node: str | None = None, temperature: float = 0) -> ChatOpenAI:
+    """
+    Retorna o cliente compartilhado do modelo configurado para o nó, criando-o
+    na primeira chamada. Nós com o mesmo modelo recebem a mesma instância.
+    """
+    key = (model_for(node), temperature)
+    llm = _clients.get(key)
+    if llm is None:
+        with _lock:
+            llm = _clients.get(key)
+            if llm is None:
+                http_client, http_async_client = _http_clients()
+                llm = _clients[key] = ChatOpenAI(
+                    model=key[0],
+                    temperature=temperature,
+                    api_key=OPENAI_API_KEY,
+                    base_url=OPENAI_BASE_URL,
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                    cache=_response_cache,
+                )
+                logger.info(f"Cliente do LLM criado para o modelo {key[0]} (temperatura {temperature:g}).")
+    return llm
+
+
+def get_stats() -> dict:
+    """Clientes criados por modelo e o modelo resolvido para cada nó."""
+    with _lock:
+        models = sorted({model for model, _ in _clients})
+    return {"clients": len(_clients), "models": models, "node_models": {node: model_for(node) for node in LLM_NODE_MODELS}}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    overrides = ", ".join(f"{node}={model}" for node, model in stats["node_models"].items()) or "nenhuma"
+    return f"clientes={stats['clients']} ({', '.join(stats['models']) or '-'}), sobrescritas por nó: {overrides}"
+
+
+def reset_llm_clients():
+    """Descarta os clientes e fecha o pool HTTP síncrono (ex.: após troca de chave)."""
+    global _http_client, _http_async_client
+    with _lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _http_async_client = None
@@ -0,0 +1,165 @@
+"""
+Cache de respostas do LLM por correspondência exata do prompt.
+
+Todos os nós chamam o LLM com `temperature=0`, então o mesmo prompt para o
+mesmo modelo produz a mesma resposta. O cache é registrado nos clientes de
+`src/llm.py` (interface `BaseCache` do LangChain): a chave é o hash do prompt
+mais a descrição do modelo feita pelo LangChain, que inclui nome, temperatura e
+o esquema da saída estruturada. Há um nível em memória (LRU) e um nível
+persistente em SQLite, com TTL e limite de entradas.
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+from . import config as _config
+from .config import logger, CACHE_DIR
+
+LLM_CACHE_PATH = CACHE_DIR / "llm_cache.sqlite"
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, dict]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0, "stores": 0}
+
+
+def _cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def _to_json(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+@contextmanager
+def _connect():
+    """Abre o SQLite do nível persistente (uma conexão por operação, segura entre threads)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=5)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, llm_string TEXT, messages TEXT, created_at REAL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(*names: str):
+    with _lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def _remember(key: str, entry: dict):
+    with _lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        while len(_memory) > _config.LLM_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _generations(messages: list[dict]) -> list[ChatGeneration]:
+    return [ChatGeneration(message=message) for message in messages_from_dict(messages)]
+
+
+class LLMResponseCache(BaseCache):
+    """Cache em dois níveis usado pelos clientes de `get_llm` (desligado com `LLM_CACHE_ENABLED=false`)."""
+
+    def lookup(self, prompt: str, llm_string: str) -> list[ChatGeneration] | None:
+        if not _config.LLM_CACHE_ENABLED:
+            return None
+        key = _cache_key(prompt, llm_string)
+        level = "memory_hits"
+        with _lock:
+            entry = _memory.get(key)
+            if entry is not None:
+                _memory.move_to_end(key)
+
+        if entry is None:
+            level = "disk_hits"
+            try:
+                with _connect() as conn:
+                    row = conn.execute(
+                        "SELECT messages, created_at FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"   Cache do LLM em disco indisponível: {e}")
+                row = None
+            if row is not None:
+                entry = {"messages": json.loads(row[0]), "created_at": row[1]}
+
+        if entry is None:
+            _count("misses")
+            return None
+        if time.time() - entry["created_at"] > _config.LLM_CACHE_TTL_SECONDS:
+            _count("stale", "misses")
+            with _lock:
+                _memory.pop(key, None)
+            return None
+
+        if level == "disk_hits":
+            _remember(key, entry)
+        _count(level)
+        logger.info(f"   Cache do LLM: acerto ({level}). {format_stats()}")
+        return _generations(entry["messages"])
+
+    def update(self, prompt: str, llm_string: str, return_val: list) -> None:
+        if not _config.LLM_CACHE_ENABLED or not all(isinstance(g, ChatGeneration) for g in return_val):
+            return
+        key = _cache_key(prompt, llm_string)
+        entry = {"messages": [message_to_dict(g.message) for g in return_val], "created_at": time.time()}
+        _remember(key, entry)
+        try:
+            with _connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, llm_string, json.dumps(entry["messages"], default=_to_json, ensure_ascii=False),
+                     entry["created_at"]),
+                )
+                # Mantém no disco apenas as entradas mais recentes
+                conn.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)",
+                    (_config.LLM_CACHE_MAX_DISK_ENTRIES,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"   Falha ao gravar o cache do LLM em disco: {e}")
+        _count("stores")
+
+    def clear(self, **kwargs) -> None:
+        clear()
+
+
+def get_stats() -> dict:
+    """Métricas de acertos e falhas do cache desde o início do processo."""
+    with _lock:
+        stats = dict(_stats)
+    hits = stats["memory_hits"] + stats["disk_hits"]
+    total = hits + stats["misses"]
+    return {**stats, "hit_rate": hits / total if total else 0.0}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"acertos={stats['memory_hits']}+{stats['disk_hits']} (memória+disco), "
+        f"falhas={stats['misses']} (expiradas={stats['stale']}), taxa={stats['hit_rate']:.0%}"
+    )
+
+
+def clear():
+    """Esvazia os dois níveis do cache."""
+    with _lock:
+        _memory.clear()
+    with _connect() as conn:
+        conn.execute("DELETE FROM responses")
@@ -0,0 +1,235 @@
+"""
+Espelho local e colunar das tabelas do 1746.
+
+As tabelas permitidas são espelhadas em Parquet (a de chamados particionada por
+mês de `data_inicio`, ver `scripts/sync_mirror.py`) e consultadas com DuckDB
+embarcado. O SQL gerado para o BigQuery é traduzido para o dialeto do DuckDB
+antes da execução.
+"""
+import os
+import re
+import json
+import threading
+import duckdb
+from .config import logger, LOCAL_MIRROR_PATH, CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH, ROLLUP_TABLE_FULL_PATH
+
+MANIFEST_PATH = LOCAL_MIRROR_PATH / "manifest.json"
+
+# Caminho completo no BigQuery -> nome da view local
+MIRROR_TABLES = {
+    CHAMADOS_TABLE_FULL_PATH: "chamado",
+    BAIRROS_TABLE_FULL_PATH: "bairro",
+    ROLLUP_TABLE_FULL_PATH: "chamado_diario",
+}
+
+# Literal de string do BigQuery (aspas simples ou duplas, com prefixo r opcional)
+_LITERAL_RE = re.compile(r"(?<!\w)([rR]?)('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+_ESCAPE_RE = re.compile(r"\\(['\"\\])")
+_PLACEHOLDER_RE = re.compile(r"\x00(\d+)\x00")
+_TYPE_MAP = {"INT64": "BIGINT", "FLOAT64": "DOUBLE", "STRING": "VARCHAR", "BOOL": "BOOLEAN", "NUMERIC": "DECIMAL(38, 9)"}
+
+_lock = threading.Lock()
+_connection: duckdb.DuckDBPyConnection | None = None
+
+
+def _duckdb_literal(prefix: str, literal: str) -> str:
+    """
+    Literal do BigQuery como literal do DuckDB: sempre entre aspas simples (no
+    DuckDB, aspas duplas delimitam identificadores), com as barras de escape
+    resolvidas (exceto em literais r'...') e as aspas simples internas dobradas.
+    """
+    body = literal[1:-1]
+    if not prefix:
+        body = _ESCAPE_RE.sub(r"\1", body)
+    return "'" + body.replace("'", "''") + "'"
+
+
+def _mask_literals(sql: str) -> tuple[str, list[str]]:
+    """Troca os literais de string por marcadores, para que as reescritas não os alterem."""
+    literals = []
+
+    def mask(match: re.Match) -> str:
+        literals.append(_duckdb_literal(match.group(1), match.group(2)))
+        return f"\x00{len(literals) - 1}\x00"
+
+    return _LITERAL_RE.sub(mask, sql), literals
+
+
+def _unmask_literals(sql: str, literals: list[str]) -> str:
+    return _PLACEHOLDER_RE.sub(lambda m: literals[int(m.group(1))], sql)
+
+
+def _split_args(body: str) -> list[str]:
+    """Separa os argumentos de uma chamada nas vírgulas de nível zero."""
+    args, depth, current, quote = [], 0, "", None
+    for char in body:
+        if quote:
+            current += char
+            if char == quote:
+                quote = None
+            continue
+        if char in ("'", '"'):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            args.append(current.strip())
+            current = ""
+            continue
+        current += char
+    args.append(current.strip())
+    return args
+
+
+def _rewrite_calls(sql: str, name: str, rewrite) -> str:
+    """
+    Reescreve as chamadas `name(...)` usando `rewrite(args) -> str` (os literais
+    já estão mascarados).
+    As chamadas são processadas da direita para a esquerda, de modo que as
+    internas sejam reescritas antes das externas e as posições à esquerda
+    continuem válidas.
+    """
+    pattern = re.compile(rf"\b{name}\s*\(", re.IGNORECASE)
+    starts = [m.start() for m in pattern.finditer(sql) if not sql[:m.start()].rstrip().endswith(".")]
+    for start in reversed(starts):
+        match = pattern.match(sql, start)
+        depth, end = 1, match.end()
+        while depth and end < len(sql):
+            if sql[end] == "(":
+                depth += 1
+            elif sql[end] == ")":
+                depth -= 1
+            end += 1
+        args = _split_args(sql[match.end():end - 1])
+        sql = sql[:start] + rewrite(args) + sql[end:]
+    return sql
+
+
+def _date(args: list[str]) -> str:
+    if len(args) == 3:
+        return f"MAKE_DATE({', '.join(args)})"
+    return f"CAST({args[0]} AS DATE)"
+
+
+def _date_trunc(args: list[str]) -> str:
+    return f"DATE_TRUNC('{args[1].lower()}', {args[0]})"
+
+
+def _date_diff(args: list[str]) -> str:
+    return f"DATE_DIFF('{args[2].lower()}', {args[1]}, {args[0]})"
+
+
+def _interval_op(operator: str):
+    def rewrite(args: list[str]) -> str:
+        return f"({args[0]} {operator} {args[1]})"
+    return rewrite
+
+
+def translate_bigquery_sql(sql: str) -> str:
+    """
+    Traduz o SQL do BigQuery gerado pelo agente para o dialeto do DuckDB. Os
+    literais de string são mascarados durante as reescritas e devolvidos entre
+    aspas simples.
+    """
+    sql, literals = _mask_literals(sql)
+    for full_path, view in MIRROR_TABLES.items():
+        sql = re.sub(rf"`{re.escape(full_path)}`", view, sql, flags=re.IGNORECASE)
+    sql = re.sub(r"`([^`]+)`", r'"\1"', sql)
+
+    sql = _rewrite_calls(sql, "DATE", _date)
+    sql = _rewrite_calls(sql, "DATE_TRUNC", _date_trunc)
+    sql = _rewrite_calls(sql, "TIMESTAMP_TRUNC", _date_trunc)
+    for name in ("DATE_DIFF", "TIMESTAMP_DIFF", "DATETIME_DIFF"):
+        sql = _rewrite_calls(sql, name, _date_diff)
+    for name in ("DATE_ADD", "TIMESTAMP_ADD", "DATETIME_ADD"):
+        sql = _rewrite_calls(sql, name, _interval_op("+"))
+    for name in ("DATE_SUB", "TIMESTAMP_SUB", "DATETIME_SUB"):
+        sql = _rewrite_calls(sql, name, _interval_op("-"))
+    for name in ("FORMAT_DATE", "FORMAT_TIMESTAMP", "FORMAT_DATETIME"):
+        sql = _rewrite_calls(sql, name, lambda args: f"STRFTIME({args[1]}, {args[0]})")
+    sql = _rewrite_calls(sql, "SAFE_DIVIDE", lambda args: f"(({args[0]}) / NULLIF({args[1]}, 0))")
+    sql = _rewrite_calls(sql, "REGEXP_CONTAINS", lambda args: f"REGEXP_MATCHES({args[0]}, {args[1]})")
+
+    sql = re.sub(r"\bCOUNTIF\s*\(", "COUNT_IF(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bSAFE_CAST\s*\(", "TRY_CAST(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURRENT_(DATE|TIMESTAMP)\s*\(\s*\)", r"CURRENT_\1", sql, flags=re.IGNORECASE)
+    for bq_type, duck_type in _TYPE_MAP.items():
+        sql = re.sub(rf"\bAS\s+{bq_type}\b", f"AS {duck_type}", sql, flags=re.IGNORECASE)
+    return _unmask_literals(sql, literals)
+
+
+def _table_glob(view: str) -> str:
+    return str(LOCAL_MIRROR_PATH / view / "**" / "*.parquet")
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    """
+    Retorna a conexão DuckDB do processo, com uma view por tabela espelhada.
+    Cada consulta deve usar um cursor próprio (`get_connection().cursor()`).
+    """
+    global _connection
+    if _connection is None:
+        with _lock:
+            if _connection is None:
+                connection = duckdb.connect(database=":memory:")
+                for view in MIRROR_TABLES.values():
+                    if not any((LOCAL_MIRROR_PATH / view).glob("**/*.parquet")):
+                        logger.warning(f"Tabela '{view}' ausente do espelho local; sincronize-a antes de consultá-la.")
+                        continue
+                    connection.execute(
+                        f"CREATE VIEW {view} AS SELECT * FROM read_parquet("
+                        f"'{_table_glob(view)}', hive_partitioning = true, union_by_name = true)"
+                    )
+                _connection = connection
+                logger.info(f"Espelho local aberto em '{LOCAL_MIRROR_PATH}'.")
+    return _connection
+
+
+def reset_connection():
+    """Fecha a conexão para que a próxima consulta enxergue um espelho recém-sincronizado."""
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+        _connection = None
+
+
+def has_table(table_path: str) -> bool:
+    """A tabela tem view na conexão atual (isto é, já estava sincronizada ao abri-la)?"""
+    view = MIRROR_TABLES.get(table_path)
+    cursor = get_connection().cursor()
+    return bool(cursor.execute(
+        "SELECT 1 FROM duckdb_views() WHERE NOT internal AND view_name = ?", [view]
+    ).fetchone())
+
+
+def read_manifest() -> dict:
+    """Estado da última sincronização de cada tabela espelhada."""
+    if not MANIFEST_PATH.exists():
+        return {}
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    LOCAL_MIRROR_PATH.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def table_version(table_path: str) -> str | None:
+    """Versão da tabela espelhada (momento da última sincronização)."""
+    return read_manifest().get(MIRROR_TABLES.get(table_path, ""), {}).get("synced_at")
+
+
+def execute_arrow(sql: str, batch_size: int = 10_000):
+    """Executa o SQL (dialeto BigQuery) no espelho e retorna um leitor de lotes Arrow."""
+    translated = translate_bigquery_sql(sql)
+    logger.info(f"   SQL traduzido para o espelho local:\n{translated}")
+    cursor = get_connection().cursor()
+    return cursor.execute(translated).fetch_record_batch(rows_per_batch=batch_size)
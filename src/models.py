@@ -10,11 +10,22 @@ class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
     plan: Literal["sql_direct", "sql_contextual", "chat"]
     sql_query: str
+    generated_sql: str
     schema: str
     category_context: str
+    expanded_query: str
     query_result: List[Dict]
+    query_result_truncated: bool
     answer: str
     error: str
+    cost_feedback: str
+    sql_attempts: int
+    bytes_estimated: int
+    bytes_processed_total: int
+    turn_deadline: float
+    question_cache_entry: Dict
+    history_summary: str
+    summarized_messages: int
 
 class IntentRouter(BaseModel):
     """
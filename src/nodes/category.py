@@ -1,92 +1,64 @@
-import os
-import chromadb
-from dotenv import load_dotenv
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
-from ..config import logger, CHAMADOS_TABLE_FULL_PATH, CATEGORICAL_COLUMNS, USE_VECTOR_DB
+import time
+from ..config import logger
 from .. import config as _config
-from ..bigquery import get_bq_client
-from ..models import AgentState, format_chat_history
-from ..llm import make_llm
+from .. import category_catalog, category_hierarchy, category_retrieval, embedding_cache, query_expansion
+from ..history import format_history
+from ..models import AgentState
 
-load_dotenv()
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-EMBEDDING_MODEL_NAME = "text-embedding-3-small"
-CHROMA_PATH = os.path.join(project_root, "chroma_db_index")
-COLLECTION_NAME = "categories_1746"
-
-def _expand_query_with_context(state: AgentState) -> str:
+def _hierarchy_context(matches: list[tuple[str, str]], wait: bool = True) -> str | None:
     """
-    Expande a pergunta atual com contexto relevante da conversa anterior.
-    Retorna a pergunta original se não houver histórico.
+    Subárvore da hierarquia para os termos encontrados (None se desativada ou
+    indisponível). Com `wait=False` não espera a carga do catálogo de categorias.
     """
-    current_question = state['messages'][-1].content
-    chat_history = format_chat_history(state['messages'][:-1])
-    
-    if not chat_history:
-        logger.info("Sem histórico de conversa. Usando pergunta original.")
-        return current_question
-    
-    # Se houver histórico, expande a query usando LLM
-    llm = make_llm()
-    prompt = f"""
-        {chat_history}
-
-        A pergunta atual do usuário é: "{current_question}"
-
-        Sua tarefa é criar uma versão expandida da pergunta atual que inclua APENAS os termos-chave relevantes mencionados na conversa anterior que são necessários para entender a pergunta.
-
-        IMPORTANTE:
-        - Se a pergunta atual for completa e auto-suficiente, retorne-a exatamente como está.
-        - Se a pergunta atual for contextual (ex: "e os com menos chamados?", "e quais os bairros?"), extraia APENAS os termos-chave da conversa anterior que completam o sentido (ex: tipo de chamado, período, categoria mencionada).
-        - NÃO adicione contexto conversacional, explicações, ou informações irrelevantes.
-        - NÃO adicione informações sobre resultados anteriores ou comparações.
-        - Foque apenas em termos que seriam úteis para buscar categorias em um banco de dados
-
-        Retorne APENAS a pergunta expandida com os termos-chave necessários, sem explicações adicionais.
-        """
-    
+    if not _config.CATEGORY_HIERARCHY_ENABLED or not matches:
+        return None
     try:
-        expanded = llm.invoke(prompt).content.strip()
-        expanded = expanded.strip('"').strip("'")
-        logger.info(f"Query expandida: '{current_question}' -> '{expanded}'")
-        return expanded
+        context = category_hierarchy.format_context(matches, wait=wait)
     except Exception as e:
-        logger.warning(f"Falha ao expandir query: {e}. Usando pergunta original.")
-        return current_question
+        logger.warning(f"   Hierarquia de categorias indisponível: {e}. Usando a lista de termos.")
+        return None
+    if context is not None:
+        logger.info(f"   Contexto hierárquico com {context.count(chr(10)) - 1} nós para {len(matches)} termos.")
+    return context
 
 def _fetch_from_rag(state: AgentState) -> str | None:
     """
     Busca categorias textuais e suas respectivas colunas utilizando um banco vetorial (RAG).
     """
-    logger.info("Tentando buscar categorias via RAG (ChromaDB)...")
-    expanded_query = _expand_query_with_context(state)
+    logger.info(f"Tentando buscar categorias via RAG ({_config.VECTOR_INDEX_BACKEND})...")
+    started = time.perf_counter()
+    # Com QUERY_EXPANSION_PARALLEL a expansão já foi feita pelo Expansor de Consulta
+    expanded_query = state.get("expanded_query") or query_expansion.expand_query(
+        state['messages'], format_history(state, "query_expander")
+    )
+    expansion = time.perf_counter() - started
     try:
-        embedding_fn = OpenAIEmbeddingFunction(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model_name=EMBEDDING_MODEL_NAME,
-        )
-        client = chromadb.PersistentClient(path=CHROMA_PATH)
-        collection = client.get_collection(
-            name=COLLECTION_NAME,
-            embedding_function=embedding_fn,
+        retriever, setup = category_retrieval.get_retriever()
+        search_started = time.perf_counter()
+        matches = retriever.search(expanded_query, n_results=5)
+        search = time.perf_counter() - search_started
+        logger.info(
+            f"   Latência do RAG: expansão={expansion * 1000:.0f} ms, preparação={setup * 1000:.0f} ms, "
+            f"busca={search * 1000:.0f} ms ({category_retrieval.format_stats()})"
         )
+        logger.info(f"   Cache de embeddings: {embedding_cache.format_stats()}")
+        logger.info(f"   Expansão de consultas: {query_expansion.format_stats()}")
 
-        results = collection.query(
-            query_texts=[expanded_query],
-            n_results=5,
-            include=["documents", "metadatas"]
-        )
-
-        if not results or not results.get('documents') or not results['documents'][0]:
+        if not matches:
             logger.warning("Busca RAG não retornou resultados.")
             return None
 
-        context_details = ""
-        docs = results['documents'][0]
-        metadatas = results['metadatas'][0]
+        # Sem o catálogo pronto, a lista de termos basta: a carga não entra na latência da pergunta
+        hierarchy_context = _hierarchy_context(
+            [(doc, metadata.get('source_column')) for doc, metadata in matches], wait=False
+        )
+        if hierarchy_context is not None:
+            logger.info("Contexto obtido com sucesso via RAG.")
+            return hierarchy_context
 
-        for i, doc in enumerate(docs):
-            source_column = metadatas[i].get('source_column', 'desconhecida')
+        context_details = ""
+        for doc, metadata in matches:
+            source_column = metadata.get('source_column', 'desconhecida')
             context_details += f"- Termo encontrado: '{doc}' (obtido da coluna '{source_column}')\n"
         
         logger.info("Contexto obtido com sucesso via RAG.")
@@ -96,25 +68,23 @@ def _fetch_from_rag(state: AgentState) -> str | None:
         logger.warning(f"Falha ao buscar categorias via RAG: {e}. Acionando fallback.")
         return None
 
-def _fetch_from_bigquery() -> str:
+def _fetch_from_bigquery(state: AgentState) -> str:
     """
-    Busca o contexto diretamente do BigQuery (método de fallback).
+    Busca o contexto no catálogo de categorias do BigQuery (método de fallback),
+    mantido em cache e recarregado periodicamente.
     """
-    logger.info("Método de fallback acionado: buscando categorias do BigQuery...")
-    context_details = []
+    logger.info("Método de fallback acionado: buscando categorias do catálogo do BigQuery...")
 
     try:
-        client = get_bq_client()
-        logger.info(f"Conectado ao BigQuery para buscar categorias.")
-        
-        for column in CATEGORICAL_COLUMNS:
-            query = f"SELECT DISTINCT {column} FROM `{CHAMADOS_TABLE_FULL_PATH}` WHERE {column} IS NOT NULL ORDER BY {column}"
-            results = client.query(query).to_dataframe()
-            values = results[column].tolist()
-            context_details.append(f"Valores possíveis para a coluna '{column}':\n{values}\n")
-        
-        formatted_context = "\n".join(context_details)
-        logger.info("   Contexto de categorias obtido com sucesso.")
+        started = time.perf_counter()
+        question = state['messages'][-1].content
+        formatted_context = None
+        if _config.CATEGORY_HIERARCHY_ENABLED:
+            formatted_context = _hierarchy_context(
+                category_catalog.match_terms(question, _config.LEXICAL_CONFIDENCE_THRESHOLD)
+            )
+        formatted_context = formatted_context or category_catalog.format_context(question)
+        logger.info(f"   Contexto de categorias obtido com sucesso ({(time.perf_counter() - started) * 1000:.0f} ms).")
         logger.debug(f"   Contexto de categorias: {formatted_context}")
         
         return formatted_context
@@ -137,9 +107,9 @@ def category_fetcher(state: AgentState) -> dict:
         rag_context = _fetch_from_rag(state)
         if rag_context is not None:
             return {"category_context": rag_context}
-        bq_context = _fetch_from_bigquery()
+        bq_context = _fetch_from_bigquery(state)
         return {"category_context": bq_context}
     else:
         logger.info("   USE_VECTOR_DB=False. Pulando RAG, usando fallback direto.")
-        bq_context = _fetch_from_bigquery()
+        bq_context = _fetch_from_bigquery(state)
         return {"category_context": bq_context}
@@ -1,9 +1,8 @@
 from langchain_core.messages import AIMessage
 from ..config import logger
-from ..llm import make_llm
-from ..models import AgentState, format_chat_history
-
-_llm = make_llm()
+from ..llm import get_llm
+from ..models import AgentState
+from ..history import format_history
 
 def conversational_responder(state: AgentState) -> dict:
     """
@@ -11,7 +10,7 @@ def conversational_responder(state: AgentState) -> dict:
     """
     logger.info(">> Nó: Resposta Conversacional")
     question = state['messages'][-1].content
-    chat_history = format_chat_history(state['messages'][:-1])
+    chat_history = format_history(state, "conversational_responder")
     
     prompt = f"""
     Você é um assistente amigável, divertido e flamenguista. Responda à seguinte pergunta do usuário de forma conversacional. Sempre tente ser um pouco clubista.
@@ -21,7 +20,7 @@ def conversational_responder(state: AgentState) -> dict:
     """
     
     try:
-        answer = _llm.invoke(prompt).content
+        answer = get_llm("conversational_responder").invoke(prompt).content
         logger.info(f"   Resposta Gerada: {answer}")
         return {"messages": [AIMessage(content=answer)], "answer": answer}
     except Exception as e:
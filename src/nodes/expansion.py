@@ -0,0 +1,15 @@
+from ..config import logger
+from ..models import AgentState
+from .. import query_expansion
+from ..history import format_history
+
+def query_expander(state: AgentState) -> dict:
+    """
+    Expande a pergunta com o contexto da conversa para a busca de categorias.
+    Roda em paralelo ao Buscador de Esquema nas perguntas contextuais, tirando
+    a chamada ao LLM do caminho serial até o Buscador de Categorias.
+    """
+    logger.info(">> Nó: Expansor de Consulta")
+    return {"expanded_query": query_expansion.expand_query(
+        state["messages"], format_history(state, "query_expander")
+    )}
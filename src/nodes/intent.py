@@ -1,32 +1,94 @@
+import time
 from ..config import logger
-from ..llm import make_llm
-from ..models import AgentState, IntentRouter, format_chat_history
+from .. import config as _config
+from .. import question_cache, intent_classifier
+from ..llm import get_llm
+from ..models import AgentState, IntentRouter
+from ..history import format_history
 
-_llm = make_llm()
+def _new_turn(plan: str, turn_deadline: float) -> dict:
+    """Um novo turno começa sem o erro ou as pendências de reescrita do turno anterior."""
+    return {
+        "plan": plan,
+        "error": "",
+        "cost_feedback": "",
+        "sql_attempts": 0,
+        "turn_deadline": turn_deadline,
+        "expanded_query": "",
+        "question_cache_entry": {},
+    }
+
+def _classify_locally(question: str, has_history: bool) -> dict | None:
+    """Decisão do classificador local (None se ele não está confiante ou está desativado)."""
+    if _config.INTENT_CLASSIFIER_MODE not in ("on", "shadow"):
+        return None
+    started = time.perf_counter()
+    try:
+        decision = intent_classifier.classify(question, has_history)
+    except Exception as e:
+        logger.warning(f"   Classificador local de intenção indisponível: {e}")
+        decision = None
+    intent_classifier.record_local(decision, time.perf_counter() - started)
+    return decision
+
+def route_with_llm(question: str, chat_history: str = "") -> str:
+    """Plano decidido pelo LLM (saída estruturada `IntentRouter`)."""
+    structured_llm = get_llm("intent_router").with_structured_output(IntentRouter)
+    
+    prompt = f"""
+    {chat_history}
+    Analise a ÚLTIMA pergunta do usuário abaixo e decida o plano de ação.
+
+    ÚLTIMA Pergunta: "{question}"
+    """
+    return structured_llm.invoke(prompt).plan
 
 def intent_router(state: AgentState) -> dict:
     """
     Decide o plano de ação com base na última pergunta do usuário e no histórico.
     """
     logger.info(">> Nó: Roteador de Intenção")
+    turn_deadline = time.time() + _config.TURN_DEADLINE_SECONDS if _config.TURN_DEADLINE_SECONDS > 0 else 0.0
     
     # A pergunta atual é a última da lista de mensagens
     question = state['messages'][-1].content
-    chat_history = format_chat_history(state['messages'][:-1])
+    chat_history = format_history(state, "intent_router")
 
-    structured_llm = _llm.with_structured_output(IntentRouter)
-    
-    prompt = f"""
-    {chat_history}
-    Analise a ÚLTIMA pergunta do usuário abaixo e decida o plano de ação.
+    # Turno sem histórico parecido com uma pergunta já respondida: reaproveita o SQL validado
+    if len(state['messages']) == 1:
+        try:
+            cached = question_cache.lookup(question)
+        except Exception as e:
+            logger.warning(f"   Cache semântico de perguntas indisponível: {e}")
+            cached = None
+        if cached is not None:
+            logger.info(f"   Decisão: {cached['plan']} (cache semântico, SQL reaproveitado)")
+            return {
+                **_new_turn(cached["plan"], turn_deadline),
+                "sql_query": cached["sql"],
+                "generated_sql": cached["sql"],
+                "question_cache_entry": cached,
+            }
+
+    has_history = len(state['messages']) > 1
+    local = _classify_locally(question, has_history)
+    if local is not None and _config.INTENT_CLASSIFIER_MODE == "on":
+        logger.info(
+            f"   Decisão: {local['plan']} (classificador local, {local['source']}, "
+            f"confiança {local['confidence']:.2f}). {intent_classifier.format_stats()}"
+        )
+        return _new_turn(local["plan"], turn_deadline)
 
-    ÚLTIMA Pergunta: "{question}"
-    """
-    
     try:
-        routing_decision = structured_llm.invoke(prompt)
-        logger.info(f"   Decisão: {routing_decision.plan}")
-        return {"plan": routing_decision.plan}
+        started = time.perf_counter()
+        plan = route_with_llm(question, chat_history)
+        elapsed = time.perf_counter() - started
+        logger.info(f"   Decisão: {plan}")
+        try:
+            intent_classifier.record_llm_decision(question, plan, has_history, local, elapsed)
+        except Exception as e:
+            logger.warning(f"   Decisão de intenção não registrada: {e}")
+        return _new_turn(plan, turn_deadline)
     except Exception as e:
         logger.info(f"   Erro no roteador: {e}")
         return {"error": "Falha ao decidir o plano de ação."}
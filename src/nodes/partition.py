@@ -0,0 +1,46 @@
+from ..config import logger
+from .. import config as _config
+from ..models import AgentState
+from .. import partition_pruning
+from .sqlcost import request_rewrite_or_reject
+
+def partition_analyzer(state: AgentState) -> dict:
+    """
+    Verifica se a consulta restringe `data_inicio` de forma que o BigQuery
+    possa podar partições, reescrevendo filtros não sargáveis em intervalos
+    equivalentes. Consultas sem filtro de data são registradas e, com
+    PARTITION_FILTER_POLICY=require, devolvidas ao gerador.
+    """
+    logger.info(">> Nó: Analisador de Partições")
+    sql_query = state["sql_query"]
+    question = state["messages"][-1].content
+
+    try:
+        analysis = partition_pruning.analyze(sql_query, question)
+    except Exception as e:
+        logger.warning(f"   Falha na análise de partições: {e}. Mantendo a consulta.")
+        return {"cost_feedback": ""}
+
+    logger.info(
+        f"   Situação: {analysis['status']}; reescritas: {analysis['rewrites'] or 'nenhuma'}; "
+        f"filtro de partição: {'sim' if analysis['partition_filter_added'] else 'não'}. "
+        f"({partition_pruning.format_stats()})"
+    )
+    if analysis["sql"] != sql_query:
+        logger.info(f"   Consulta reescrita para poda de partições:\n{analysis['sql']}")
+
+    if analysis["status"] == "full_scan":
+        logger.warning("   A consulta não filtra data_inicio e lerá todo o histórico.")
+        if _config.PARTITION_FILTER_POLICY == "require":
+            return request_rewrite_or_reject(
+                state,
+                feedback=(
+                    "A consulta anterior não filtra `data_inicio` e leria todo o histórico de chamados. "
+                    "Reescreva-a restringindo o período com um filtro em `data_inicio` compatível com a pergunta.\n"
+                    f"Consulta anterior:\n{sql_query}"
+                ),
+                error="A consulta leria todo o histórico de chamados. Informe um período na pergunta.",
+            )
+
+    # O pedido de reescrita anterior (se houver) já foi atendido pelo gerador
+    return {"sql_query": analysis["sql"], "cost_feedback": ""}
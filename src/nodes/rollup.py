@@ -0,0 +1,21 @@
+from ..config import logger
+from ..models import AgentState
+from .. import rollups
+
+def rollup_rewriter(state: AgentState) -> dict:
+    """
+    Redireciona consultas de contagem elegíveis para a tabela de agregados
+    diários, evitando varrer a tabela bruta de chamados. Consultas não
+    elegíveis (ou com agregados desatualizados) seguem inalteradas.
+    """
+    logger.info(">> Nó: Reescritor para Agregados")
+    sql_query = state["sql_query"]
+
+    rewritten = rollups.try_rewrite(sql_query)
+    stats = rollups.get_stats()
+    if rewritten is None:
+        logger.info(f"   Consulta mantida na tabela original (reescritas: {stats['rewrite_rate']:.0%}).")
+        return {}
+
+    logger.info(f"   Consulta reescrita para os agregados (reescritas: {stats['rewrite_rate']:.0%}):\n{rewritten}")
+    return {"sql_query": rewritten}
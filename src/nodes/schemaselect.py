@@ -0,0 +1,40 @@
+from langchain_core.messages import HumanMessage
+from ..config import logger, CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH
+from .. import config as _config
+from ..models import AgentState
+from ..schema_selection import select_schema
+
+def schema_selector(state: AgentState) -> dict:
+    """
+    Reduz o esquema completo às colunas relevantes para a pergunta
+    (mais chaves de junção e colunas obrigatórias), diminuindo o prompt
+    do gerador de SQL. Em caso de falha, mantém o esquema completo.
+    """
+    logger.info(">> Nó: Seletor de Esquema")
+
+    if not _config.SCHEMA_SELECTION_ENABLED:
+        logger.info("   SCHEMA_SELECTION_ENABLED=False. Mantendo esquema completo.")
+        return {}
+
+    question = state['messages'][-1].content
+    # Perguntas de acompanhamento ("e por bairro?") herdam termos das anteriores
+    previous_questions = [m.content for m in state['messages'][:-1] if isinstance(m, HumanMessage)]
+    context = " ".join(previous_questions[-2:])
+
+    try:
+        pruned_schema, report = select_schema(
+            question,
+            [CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH],
+            plan=state.get("plan"),
+            context=context,
+        )
+        logger.info(
+            f"   Esquema reduzido: {report['selected_columns']}/{report['total_columns']} colunas, "
+            f"{report['pruned_tokens']} tokens (completo: {report['full_tokens']}, "
+            f"-{report['reduction']:.0%})."
+        )
+        logger.debug(f"   Esquema selecionado:\n{pruned_schema}")
+        return {"schema": pruned_schema}
+    except Exception as e:
+        logger.warning(f"   Falha na seleção de esquema: {e}. Mantendo esquema completo.")
+        return {}
@@ -0,0 +1,88 @@
+from google.cloud import bigquery
+from ..config import logger
+from .. import config as _config
+from ..bigquery import get_bq_client
+from ..models import AgentState
+from .. import result_cache
+
+def _format_bytes(num_bytes: int) -> str:
+    """Formata uma quantidade de bytes em GB para logs e mensagens."""
+    return f"{num_bytes / 1024**3:.2f} GB"
+
+def remaining_byte_budget(state: AgentState) -> int:
+    """
+    Retorna quantos bytes a próxima consulta ainda pode processar, considerando
+    o limite por consulta e o saldo do orçamento da thread (0 = sem limite).
+    """
+    limits = []
+    if _config.MAX_BYTES_PER_QUERY > 0:
+        limits.append(_config.MAX_BYTES_PER_QUERY)
+    if _config.MAX_BYTES_PER_THREAD > 0:
+        limits.append(max(_config.MAX_BYTES_PER_THREAD - state.get("bytes_processed_total", 0), 0))
+    return min(limits) if limits else 0
+
+def request_rewrite_or_reject(state: AgentState, feedback: str, error: str) -> dict:
+    """Devolve a consulta ao gerador para reescrita ou a rejeita se as tentativas acabaram."""
+    attempts = state.get("sql_attempts", 0)
+    if attempts < _config.SQL_REWRITE_ATTEMPTS:
+        logger.warning(f"   Solicitando reescrita da consulta (tentativa {attempts + 1}/{_config.SQL_REWRITE_ATTEMPTS}).")
+        return {"cost_feedback": feedback, "sql_attempts": attempts + 1}
+    logger.warning(f"   {error}")
+    return {"error": error, "cost_feedback": "", "sql_attempts": 0}
+
+def sql_cost_guard(state: AgentState) -> dict:
+    """
+    Estima via dry-run quantos bytes a consulta processará e aplica o orçamento
+    por consulta e por thread. Consultas acima do orçamento voltam ao gerador
+    para serem reescritas ou são rejeitadas.
+    """
+    logger.info(">> Nó: Guardião de Custo (Dry-Run)")
+    sql_query = state["sql_query"]
+
+    if _config.SQL_EXECUTOR_BACKEND != "bigquery":
+        logger.info(f"   Backend '{_config.SQL_EXECUTOR_BACKEND}' não usa o BigQuery; dry-run dispensado.")
+        return {"bytes_estimated": 0, "cost_feedback": "", "sql_attempts": 0}
+
+    if result_cache.lookup(sql_query, record_stats=False) is not None:
+        logger.info("   Resultado já está em cache; dry-run dispensado.")
+        return {"bytes_estimated": 0, "cost_feedback": "", "sql_attempts": 0}
+
+    try:
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        dry_run_job = get_bq_client().query(sql_query, job_config=job_config)
+        estimated = dry_run_job.total_bytes_processed or 0
+    except Exception as e:
+        logger.error(f"   Dry-run falhou: {e}")
+        return request_rewrite_or_reject(
+            state,
+            feedback=(
+                f"A consulta anterior foi rejeitada pelo BigQuery com o erro: {e}\n"
+                f"Corrija-a.\nConsulta anterior:\n{sql_query}"
+            ),
+            error=f"Erro ao validar a consulta no BigQuery (dry-run): {e}",
+        )
+
+    budget = remaining_byte_budget(state)
+    logger.info(f"   Estimativa: {_format_bytes(estimated)} (orçamento disponível: {_format_bytes(budget) if budget else 'ilimitado'}).")
+
+    if _config.MAX_BYTES_PER_THREAD > 0 and budget == 0:
+        error = "O orçamento de dados processados desta conversa foi esgotado."
+        logger.warning(f"   {error}")
+        return {"error": error, "cost_feedback": "", "sql_attempts": 0}
+
+    if budget and estimated > budget:
+        return request_rewrite_or_reject(
+            state,
+            feedback=(
+                f"A consulta anterior processaria cerca de {_format_bytes(estimated)}, acima do limite de "
+                f"{_format_bytes(budget)}. Reescreva-a para ler menos dados: restrinja o período com filtros "
+                f"em `data_inicio`, selecione apenas as colunas necessárias e evite varrer a tabela inteira.\n"
+                f"Consulta anterior:\n{sql_query}"
+            ),
+            error=(
+                f"A consulta processaria cerca de {_format_bytes(estimated)}, acima do limite de "
+                f"{_format_bytes(budget)}. Tente restringir o período da pergunta."
+            ),
+        )
+
+    return {"bytes_estimated": estimated, "cost_feedback": "", "sql_attempts": 0}
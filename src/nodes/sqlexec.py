@@ -1,25 +1,198 @@
+import asyncio
+import pyarrow as pa
+from google.cloud import bigquery
 from ..config import logger
-from ..bigquery import get_bq_client
+from .. import config as _config
+from ..bigquery import get_bqstorage_client
 from ..models import AgentState
+from .. import result_cache
+from .. import query_jobs
+from .. import question_cache
+from .sqlcost import remaining_byte_budget
+
+def _collect_rows(batches, row_cap: int, total_rows: int | None = None) -> tuple[list[dict], int, bool]:
+    """
+    Consome lotes Arrow até atingir o limite de linhas (lendo uma linha a mais
+    para detectar truncamento). Apenas as linhas mantidas são convertidas para
+    objetos Python.
+    """
+    kept = []
+    read = 0
+    for batch in batches:
+        kept.append(batch)
+        read += batch.num_rows
+        if row_cap and read > row_cap:
+            break
+
+    total_rows = total_rows if total_rows is not None else read
+    if not kept:
+        return [], total_rows, False
+    table = pa.Table.from_batches(kept)
+    if row_cap:
+        table = table.slice(0, row_cap)
+    return table.to_pylist(), total_rows, table.num_rows < max(total_rows, read)
+
+def _bigquery_job_config(state: AgentState) -> bigquery.QueryJobConfig:
+    """Configuração do job com `maximum_bytes_billed` conforme o orçamento restante."""
+    job_config = bigquery.QueryJobConfig()
+    budget = remaining_byte_budget(state)
+    if budget:
+        job_config.maximum_bytes_billed = budget
+    return job_config
+
+def _read_bigquery_result(query_job, row_cap: int) -> dict:
+    """Lê o resultado de um job concluído em lotes Arrow (via Storage Read API quando habilitada)."""
+    rows = query_job.result()
+    bqstorage_client = get_bqstorage_client() if _config.USE_BQ_STORAGE_API else None
+    query_result, total_rows, truncated = _collect_rows(
+        rows.to_arrow_iterable(bqstorage_client=bqstorage_client), row_cap, rows.total_rows
+    )
+    bytes_processed = query_job.total_bytes_billed or query_job.total_bytes_processed or 0
+    logger.info(f"   {bytes_processed} bytes faturados.")
+    return {
+        "rows": query_result,
+        "total_rows": total_rows,
+        "truncated": truncated,
+        "bytes_processed": bytes_processed,
+    }
+
+def _run_on_bigquery(sql_query: str, state: AgentState, row_cap: int) -> dict:
+    """
+    Submete o job ao BigQuery e o acompanha por polling até concluir ou
+    estourar o prazo do turno (quando é cancelado).
+    """
+    deadline = state.get("turn_deadline")
+    query_job = query_jobs.submit(sql_query, _bigquery_job_config(state), deadline)
+    query_jobs.wait(query_job, deadline)
+    return _read_bigquery_result(query_job, row_cap)
+
+async def _run_on_bigquery_async(sql_query: str, state: AgentState, row_cap: int) -> dict:
+    """Como `_run_on_bigquery`, sem ocupar uma thread enquanto o job está em andamento."""
+    deadline = state.get("turn_deadline")
+    query_job = await asyncio.to_thread(query_jobs.submit, sql_query, _bigquery_job_config(state), deadline)
+    await query_jobs.wait_async(query_job, deadline)
+    return await asyncio.to_thread(_read_bigquery_result, query_job, row_cap)
+
+def _run_on_local_mirror(sql_query: str, state: AgentState, row_cap: int) -> dict:
+    """Executa no espelho local (Parquet + DuckDB), sem custo de BigQuery."""
+    from ..local_mirror import execute_arrow
+
+    query_result, total_rows, truncated = _collect_rows(execute_arrow(sql_query), row_cap)
+    return {"rows": query_result, "total_rows": total_rows, "truncated": truncated, "bytes_processed": 0}
+
+# Backends de execução selecionáveis por SQL_EXECUTOR_BACKEND
+EXECUTOR_BACKENDS = {
+    "bigquery": _run_on_bigquery,
+    "duckdb": _run_on_local_mirror,
+}
+# Versões assíncronas; backends sem uma rodam em uma thread
+ASYNC_EXECUTOR_BACKENDS = {
+    "bigquery": _run_on_bigquery_async,
+}
+
+def _remember_question(state: AgentState, sql_query: str, query_result: list[dict]):
+    """
+    Guarda a pergunta de um turno sem histórico no cache semântico (ou confere o
+    resultado de um acerto). Guarda o SQL validado antes das reescritas, que
+    são refeitas (e reavaliadas) quando ele é reaproveitado.
+    """
+    try:
+        entry = state.get("question_cache_entry")
+        if entry:
+            question_cache.record_result(entry, query_result)
+        elif len(state["messages"]) == 1:
+            question_cache.store(
+                state["messages"][-1].content, state["plan"], state.get("generated_sql") or sql_query, query_result
+            )
+    except Exception as e:
+        logger.warning(f"   Pergunta não guardada no cache semântico: {e}")
+
+def _cached_result(state: AgentState, sql_query: str, row_cap: int) -> dict | None:
+    cached_result = result_cache.lookup(sql_query)
+    if cached_result is None:
+        return None
+    logger.info(f"   Resultado servido do cache. {len(cached_result)} linhas.")
+    _remember_question(state, sql_query, cached_result)
+    return {
+        "query_result": cached_result,
+        "query_result_truncated": bool(row_cap) and len(cached_result) >= row_cap,
+    }
+
+def _finish(state: AgentState, sql_query: str, backend: str, outcome: dict) -> dict:
+    query_result = outcome["rows"]
+    logger.info(f"   Consulta executada com sucesso ({backend}). {len(query_result)} de {outcome['total_rows']} linhas lidas.")
+    logger.debug(f"Resultado da consulta (amostra): {query_result[:5]}") # Loga as 5 primeiras linhas
+    result_cache.store(sql_query, query_result)
+    _remember_question(state, sql_query, query_result)
+    logger.info(f"   Cache de resultados: {result_cache.format_stats()}")
+    return {
+        "query_result": query_result,
+        "query_result_truncated": outcome["truncated"],
+        "bytes_processed_total": state.get("bytes_processed_total", 0) + outcome["bytes_processed"],
+    }
+
+def _failure(state: AgentState, backend: str, e: Exception) -> dict:
+    entry = state.get("question_cache_entry")
+    if entry and not isinstance(e, query_jobs.QueryDeadlineExceeded):
+        question_cache.invalidate(entry["key"])
+    if isinstance(e, query_jobs.QueryDeadlineExceeded):
+        logger.warning(f"   Consulta cancelada por prazo: {e}")
+        return {"error": f"A consulta não terminou dentro do prazo de {_config.TURN_DEADLINE_SECONDS:g}s e foi cancelada."}
+    logger.error(f"   Erro na execução da consulta: {e}")
+    return {"error": f"Erro ao executar a consulta ({backend}): {e}"}
 
 def sql_executor(state: AgentState) -> dict:
     """
-    Executa a consulta no BigQuery e retorna o resultado.
+    Executa a consulta no backend configurado (BigQuery ou espelho local) e
+    retorna o resultado. Consultas equivalentes já executadas são servidas pelo
+    cache de resultados. O resultado é lido em lotes Arrow e limitado a
+    `SQL_RESULT_ROW_CAP` linhas. Jobs do BigQuery respeitam o prazo do turno.
     """
     logger.info(">> Nó: Executor de SQL")
     sql_query = state["sql_query"]
+    row_cap = _config.SQL_RESULT_ROW_CAP
+
+    cached = _cached_result(state, sql_query, row_cap)
+    if cached is not None:
+        return cached
+
+    backend = _config.SQL_EXECUTOR_BACKEND
+    run = EXECUTOR_BACKENDS.get(backend)
+    if run is None:
+        logger.error(f"   Backend de execução desconhecido: '{backend}'.")
+        return {"error": f"Backend de execução desconhecido: '{backend}'."}
+
+    try:
+        return _finish(state, sql_query, backend, run(sql_query, state, row_cap))
+    except Exception as e:
+        return _failure(state, backend, e)
+
+async def sql_executor_async(state: AgentState) -> dict:
+    """
+    Versão assíncrona do executor, usada quando o grafo roda com `ainvoke`
+    (interface web). Se a tarefa for cancelada (fim da sessão ou nova
+    mensagem), o job em andamento é cancelado no BigQuery.
+    """
+    logger.info(">> Nó: Executor de SQL (assíncrono)")
+    sql_query = state["sql_query"]
+    row_cap = _config.SQL_RESULT_ROW_CAP
+
+    cached = await asyncio.to_thread(_cached_result, state, sql_query, row_cap)
+    if cached is not None:
+        return cached
+
+    backend = _config.SQL_EXECUTOR_BACKEND
+    run = EXECUTOR_BACKENDS.get(backend)
+    if run is None:
+        logger.error(f"   Backend de execução desconhecido: '{backend}'.")
+        return {"error": f"Backend de execução desconhecido: '{backend}'."}
 
     try:
-        client = get_bq_client()
-        logger.info("   Conectado ao BigQuery.")
-        query_job = client.query(sql_query)
-        
-        results = query_job.to_dataframe()
-        query_result = results.to_dict('records')
-        
-        logger.info(f"   Consulta executada com sucesso. {len(query_result)} linhas retornadas.")
-        logger.debug(f"Resultado da consulta (amostra): {query_result[:5]}") # Loga as 5 primeiras linhas
-        return {"query_result": query_result}
+        run_async = ASYNC_EXECUTOR_BACKENDS.get(backend)
+        if run_async is not None:
+            outcome = await run_async(sql_query, state, row_cap)
+        else:
+            outcome = await asyncio.to_thread(run, sql_query, state, row_cap)
+        return await asyncio.to_thread(_finish, state, sql_query, backend, outcome)
     except Exception as e:
-        logger.error(f"   Erro na execução da consulta: {e}")
-        return {"error": f"Erro ao executar a consulta no BigQuery: {e}"}
\ No newline at end of file
+        return _failure(state, backend, e)
@@ -1,16 +1,15 @@
 from ..config import logger
-from ..llm import make_llm
-from ..models import AgentState, format_chat_history
+from ..llm import get_llm
+from ..models import AgentState
+from ..history import format_history
 
-_llm = make_llm()
-
-def sql_generator(state: AgentState) -> dict:
+def build_sql_prompt(state: AgentState) -> str:
     """
-    Gera uma consulta SQL válida e eficiente para o BigQuery com base na pergunta e no schema.
+    Monta o prompt do gerador de SQL a partir da pergunta, do histórico,
+    do esquema e do contexto de categorias presentes no estado.
     """
-    logger.info(">> Nó: Gerador de SQL")
     question = state['messages'][-1].content
-    chat_history = format_chat_history(state['messages'][:-1])
+    chat_history = format_history(state, "sql_generator")
     schema = state["schema"]
     category_context = state.get("category_context", "")
     context_section = ""
@@ -20,6 +19,13 @@ def sql_generator(state: AgentState) -> dict:
         Use a lista de valores abaixo para encontrar o termo e a coluna corretos para a pergunta do usuário.
         {category_context}
         """
+    feedback_section = ""
+    cost_feedback = state.get("cost_feedback", "")
+    if cost_feedback:
+        feedback_section = f"""
+        ATENÇÃO - CORREÇÃO NECESSÁRIA:
+        {cost_feedback}
+        """
 
     prompt = f"""
     Sua tarefa é ser um especialista em SQL do Google BigQuery. Seu objetivo principal é gerar uma única consulta SQL que seja **correta e funcional**.
@@ -28,6 +34,7 @@ def sql_generator(state: AgentState) -> dict:
     ESQUEMA DO BANCO DE DADOS:
     {schema}
     {context_section}
+    {feedback_section}
 
     REGRAS ESSENCIAIS:
     1.  **Nomes de Tabela:** SEMPRE use o nome completo da tabela (ex: `projeto.dataset.tabela`) nas cláusulas `FROM` e `JOIN`.
@@ -49,17 +56,26 @@ def sql_generator(state: AgentState) -> dict:
 
     SQL GERADO:
     """
-    
+    return prompt
+
+def sql_generator(state: AgentState) -> dict:
+    """
+    Gera uma consulta SQL válida e eficiente para o BigQuery com base na pergunta e no schema.
+    """
+    logger.info(">> Nó: Gerador de SQL")
+    prompt = build_sql_prompt(state)
+
     logger.info("--- INÍCIO DO PROMPT PARA O GERADOR DE SQL ---")
     logger.info(prompt)
     logger.info("--- FIM DO PROMPT PARA O GERADOR DE SQL ---")
 
     try:
-        sql_query = _llm.invoke(prompt).content
+        sql_query = get_llm("sql_generator").invoke(prompt).content
         cleaned_sql_query = sql_query.strip().replace("```sql", "").replace("```", "").strip()
         logger.info(f"   SQL Gerado: \n{cleaned_sql_query}")
         
-        return {"sql_query": cleaned_sql_query}
+        # Um SQL novo substitui o reaproveitado do cache semântico, se havia um
+        return {"sql_query": cleaned_sql_query, "generated_sql": cleaned_sql_query, "question_cache_entry": {}}
     
     except Exception as e:
         logger.error(f"   Erro na geração de SQL: {e}")
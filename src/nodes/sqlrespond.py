@@ -1,10 +1,8 @@
 from langchain_core.messages import AIMessage
 from ..config import logger
-from ..llm import make_llm
+from ..llm import get_llm
 from ..models import AgentState
 
-_llm = make_llm()
-
 def response_synthesizer(state: AgentState) -> dict:
     """
     Gera uma resposta em linguagem natural com base nos resultados da consulta.
@@ -12,6 +10,9 @@ def response_synthesizer(state: AgentState) -> dict:
     logger.info(">> Nó: Sintetizador de Resposta")
     question = state['messages'][-1].content
     query_result = state["query_result"]
+    truncation_note = ""
+    if state.get("query_result_truncated"):
+        truncation_note = f"ATENÇÃO: os dados abaixo são apenas as primeiras {len(query_result)} linhas do resultado; deixe isso claro na resposta."
 
     # Se não houver resultado, informe o usuário.
     if not query_result:
@@ -21,6 +22,7 @@ def response_synthesizer(state: AgentState) -> dict:
     Você é um Analista de Dados Factual. Sua única tarefa é traduzir os DADOS BRUTOS fornecidos em uma resposta em linguagem natural e amigável.
 
     --- DADOS BRUTOS PARA ANÁLISE ---
+    {truncation_note}
     <DADOS>
     {query_result}
     </DADOS>
@@ -37,7 +39,7 @@ def response_synthesizer(state: AgentState) -> dict:
     4.  Responda em português de forma clara e direta.
         """
         try:
-            answer = _llm.invoke(prompt).content
+            answer = get_llm("response_synthesizer").invoke(prompt).content
         except Exception as e:
             logger.error(f"Erro na síntese da resposta: {e}", exc_info=True)
             return {"error": "Falha ao gerar a resposta final."}
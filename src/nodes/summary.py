@@ -0,0 +1,16 @@
+from ..config import logger
+from ..models import AgentState
+from .. import history
+
+def history_summarizer(state: AgentState) -> dict:
+    """
+    Ao fim do turno, incorpora ao resumo da conversa os turnos que saíram da
+    janela de turnos recentes. Uma falha mantém o resumo anterior: os turnos
+    pendentes são resumidos no próximo turno.
+    """
+    logger.info(">> Nó: Resumidor do Histórico")
+    try:
+        return history.summarize(state)
+    except Exception as e:
+        logger.warning(f"   Falha ao resumir o histórico: {e}")
+        return {}
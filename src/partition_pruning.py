@@ -0,0 +1,348 @@
+"""
+Análise e reescrita de filtros de data para poda de partições.
+
+A tabela de chamados é particionada por data; o BigQuery só deixa de ler
+partições quando o filtro compara a coluna diretamente com constantes. Este
+módulo:
+
+1. reescreve filtros não "sargáveis" sobre `data_inicio` (`DATE(data_inicio) = ...`,
+   `EXTRACT(YEAR FROM data_inicio) = ...`, `FORMAT_DATE('%Y-%m', data_inicio) = ...`)
+   em intervalos equivalentes sobre a própria coluna;
+2. quando a coluna de partição é outra, derivada de `data_inicio` (ex.:
+   `data_particao`, com `PARTITION_FIELD_DERIVED` ativo), acrescenta o filtro
+   correspondente sobre ela;
+3. classifica cada consulta (intervalo de datas, filtro não sargável, varredura
+   completa) e registra o resultado em `partition_pruning.jsonl` para análise.
+"""
+import re
+import json
+import time
+import threading
+from datetime import date, timedelta
+from . import config as _config
+from .config import logger, CACHE_DIR, CHAMADOS_TABLE_FULL_PATH, PARTITION_DATE_COLUMN
+from .schema_cache import get_table_entry
+from .sql_text import CONSTANT_BOUND, DAY_BOUNDARY, date_literal, day_literal, mask_sql, unmask_sql, split_top_level
+
+PARTITION_STATS_PATH = CACHE_DIR / "partition_pruning.jsonl"
+
+_COLUMN = rf"(?P<col>(?<![\w.])(?:\w+\.)?{PARTITION_DATE_COLUMN})\b"
+_OPERATORS = r"(?P<op>>=|<=|<>|!=|=|<|>)"
+_CLAUSE_END_RE = re.compile(r"\(|\)|;|\b(?:group\s+by|order\s+by|limit|having|qualify|window)\b", re.IGNORECASE)
+
+_lock = threading.Lock()
+_stats = {"bounded": 0, "non_sargable": 0, "full_scan": 0, "not_analyzed": 0, "rewritten": 0, "partition_filter_added": 0}
+
+
+def _shift(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+class _Rewriter:
+    """Reescritas de um filtro sobre a coluna de data, com os literais da consulta."""
+
+    def __init__(self, literals: list[str], column_type: str):
+        self.literals = literals
+        self.column_type = column_type
+        self.applied: list[str] = []
+
+    def literal(self, day: str) -> str:
+        """Novo literal de data, mascarado como os demais."""
+        self.literals.append(f"'{day}'")
+        return f"__lit{len(self.literals) - 1}__"
+
+    def day(self, bound: str, days: int = 0) -> str | None:
+        """Limite `bound` (um dia) deslocado em `days` dias, como expressão comparável à coluna."""
+        bound = bound.strip()
+        literal = date_literal(bound, self.literals)
+        if literal is not None:
+            return self.literal(_shift(literal, days))
+        if not re.fullmatch(DAY_BOUNDARY, bound, re.IGNORECASE):
+            return None
+        expression = f"DATE_ADD({bound}, INTERVAL {days} DAY)" if days else bound
+        return f"{self.column_type}({expression})" if self.column_type in ("DATETIME", "TIMESTAMP") else expression
+
+    def range(self, column: str, start: str | None, end: str | None, name: str) -> str:
+        """Intervalo semiaberto [start, end) sobre a coluna."""
+        self.applied.append(name)
+        conditions = []
+        if start is not None:
+            conditions.append(f"{column} >= {start}")
+        if end is not None:
+            conditions.append(f"{column} < {end}")
+        return conditions[0] if len(conditions) == 1 else f"({' AND '.join(conditions)})"
+
+    def date_comparison(self, match) -> str:
+        column, operator, bound = match.group("col"), match.group("op"), match.group("bound")
+        if operator in ("<>", "!="):
+            return match.group(0)
+        start, end = {
+            "=": (self.day(bound), self.day(bound, 1)),
+            ">=": (self.day(bound), None),
+            ">": (self.day(bound, 1), None),
+            "<": (None, self.day(bound)),
+            "<=": (None, self.day(bound, 1)),
+        }[operator]
+        if (start is None and operator in ("=", ">=", ">")) or (end is None and operator in ("=", "<", "<=")):
+            return match.group(0)
+        return self.range(column, start, end, "date_comparison")
+
+    def date_between(self, match) -> str:
+        start, end = self.day(match.group("low")), self.day(match.group("high"), 1)
+        if start is None or end is None:
+            return match.group(0)
+        return self.range(match.group("col"), start, end, "date_between")
+
+    def year_comparison(self, match) -> str:
+        column, operator, year = match.group("col"), match.group("op"), int(match.group("year"))
+        if operator in ("<>", "!="):
+            return match.group(0)
+        start, end = {
+            "=": (year, year + 1), ">=": (year, None), ">": (year + 1, None), "<": (None, year), "<=": (None, year + 1),
+        }[operator]
+        return self.range(
+            column,
+            self.literal(f"{start}-01-01") if start is not None else None,
+            self.literal(f"{end}-01-01") if end is not None else None,
+            "extract_year",
+        )
+
+    def year_between(self, match) -> str:
+        low, high = int(match.group("low")), int(match.group("high"))
+        return self.range(match.group("col"), self.literal(f"{low}-01-01"), self.literal(f"{high + 1}-01-01"), "extract_year")
+
+    def formatted_period(self, match) -> str:
+        pattern = self.literals[int(match.group("fmt"))][1:-1]
+        value = self.literals[int(match.group("value"))][1:-1]
+        if pattern == "%Y" and re.fullmatch(r"\d{4}", value):
+            start, end = f"{value}-01-01", f"{int(value) + 1}-01-01"
+        elif pattern == "%Y-%m" and re.fullmatch(r"\d{4}-\d{2}", value):
+            year, month = map(int, value.split("-"))
+            start, end = f"{value}-01", f"{year + month // 12}-{month % 12 + 1:02d}-01"
+        else:
+            return match.group(0)
+        return self.range(match.group("col"), self.literal(start), self.literal(end), "format_period")
+
+
+def _rewrite_predicates(masked: str, rewriter: _Rewriter) -> str:
+    """Transforma filtros com funções sobre a coluna de data em intervalos sobre a coluna."""
+    flags = re.IGNORECASE
+    masked = re.sub(rf"\bcast\s*\(\s*{_COLUMN}\s+as\s+date\s*\)", r"DATE(\g<col>)", masked, flags=flags)
+    masked = re.sub(
+        rf"\bdate\s*\(\s*{_COLUMN}\s*\)\s+between\s+(?P<low>{CONSTANT_BOUND})\s+and\s+(?P<high>{CONSTANT_BOUND})",
+        rewriter.date_between, masked, flags=flags,
+    )
+    masked = re.sub(
+        rf"\bdate\s*\(\s*{_COLUMN}\s*\)\s*{_OPERATORS}\s*(?P<bound>{CONSTANT_BOUND})",
+        rewriter.date_comparison, masked, flags=flags,
+    )
+    masked = re.sub(
+        rf"\bextract\s*\(\s*year\s+from\s+{_COLUMN}\s*\)\s+between\s+(?P<low>\d{{4}})\s+and\s+(?P<high>\d{{4}})\b",
+        rewriter.year_between, masked, flags=flags,
+    )
+    masked = re.sub(
+        rf"\bextract\s*\(\s*year\s+from\s+{_COLUMN}\s*\)\s*{_OPERATORS}\s*(?P<year>\d{{4}})\b",
+        rewriter.year_comparison, masked, flags=flags,
+    )
+    masked = re.sub(
+        rf"\bformat_(?:date|datetime|timestamp)\s*\(\s*__lit(?P<fmt>\d+)__\s*,\s*{_COLUMN}\s*\)\s*=\s*__lit(?P<value>\d+)__",
+        rewriter.formatted_period, masked, flags=flags,
+    )
+    return masked
+
+
+def _where_span(masked: str) -> tuple[int, int] | None:
+    """Início e fim do conteúdo do WHERE de nível zero, ou None se não houver."""
+    match = None
+    depth = 0
+    for token in re.finditer(r"\(|\)|\bwhere\b", masked, re.IGNORECASE):
+        if token.group(0) == "(":
+            depth += 1
+        elif token.group(0) == ")":
+            depth -= 1
+        elif depth == 0:
+            match = token
+            break
+    if match is None:
+        return None
+    depth = 0
+    for token in _CLAUSE_END_RE.finditer(masked, match.end()):
+        if token.group(0) == "(":
+            depth += 1
+        elif token.group(0) == ")":
+            depth -= 1
+        elif depth == 0:
+            return match.end(), token.start()
+    return match.end(), len(masked)
+
+
+def _wrapped(term: str) -> bool:
+    """O termo inteiro está entre um único par de parênteses?"""
+    if not (term.startswith("(") and term.endswith(")")):
+        return False
+    depth = 0
+    for position, char in enumerate(term):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if depth == 0 and position < len(term) - 1:
+            return False
+    return True
+
+
+def _conjuncts(where: str) -> list[str]:
+    """Termos do AND de nível zero, abrindo parênteses que não contenham OR."""
+    terms = []
+    for term in split_top_level(where, "and"):
+        if _wrapped(term) and len(split_top_level(term[1:-1], "or")) == 1:
+            terms.extend(_conjuncts(term[1:-1]))
+        else:
+            terms.append(term)
+    return terms
+
+
+def _bounds(terms: list[str]) -> tuple[list[tuple], list[tuple]]:
+    """
+    Limites inferiores e superiores da coluna de data nos termos sargáveis,
+    como tuplas (coluna, expressão, estrito).
+    """
+    lower, upper = [], []
+    for term in terms:
+        match = re.fullmatch(rf"{_COLUMN}\s*{_OPERATORS}\s*(?P<bound>{CONSTANT_BOUND})", term, re.IGNORECASE)
+        reverse = re.fullmatch(rf"(?P<bound>{CONSTANT_BOUND})\s*{_OPERATORS}\s*{_COLUMN}", term, re.IGNORECASE)
+        between = re.fullmatch(
+            rf"{_COLUMN}\s+between\s+(?P<low>{CONSTANT_BOUND})\s+and\s+(?P<high>{CONSTANT_BOUND})", term, re.IGNORECASE
+        )
+        if between:
+            lower.append((between.group("col"), between.group("low"), False))
+            upper.append((between.group("col"), between.group("high"), False))
+            continue
+        if reverse:
+            operator = {">=": "<=", ">": "<", "<=": ">=", "<": ">"}.get(reverse.group("op"), reverse.group("op"))
+            match, column, bound = reverse, reverse.group("col"), reverse.group("bound")
+        elif match:
+            operator, column, bound = match.group("op"), match.group("col"), match.group("bound")
+        else:
+            continue
+        if operator in (">=", ">", "="):
+            lower.append((column, bound, False))
+        if operator in ("<", "<=", "="):
+            upper.append((column, bound, operator == "<"))
+    return lower, upper
+
+
+def _partition_filters(lower: list[tuple], upper: list[tuple], literals: list[str], field: str, granularity: str) -> list[str]:
+    """
+    Filtros sobre a coluna de partição derivada, supondo
+    `field = DATE_TRUNC(DATE(data_inicio), granularity)`.
+    """
+    granularity = granularity if granularity in ("DAY", "MONTH", "YEAR") else "DAY"
+    filters = []
+    for column, bound, _ in lower:
+        qualifier = column[:column.rfind(".") + 1]
+        day = date_literal(bound, literals)
+        if day is not None:
+            start = date.fromisoformat(day)
+            start = {"DAY": start, "MONTH": start.replace(day=1), "YEAR": start.replace(month=1, day=1)}[granularity]
+            filters.append(f"{qualifier}{field} >= '{start.isoformat()}'")
+        else:
+            filters.append(f"{qualifier}{field} >= DATE_TRUNC(DATE({bound.strip()}), {granularity})")
+    for column, bound, strict in upper:
+        qualifier = column[:column.rfind(".") + 1]
+        # `data_inicio < meia-noite de d` implica DATE(data_inicio) < d
+        midnight = day_literal(bound, literals) is not None or re.fullmatch(DAY_BOUNDARY, bound.strip(), re.IGNORECASE)
+        operator = "<" if strict and midnight else "<="
+        day = date_literal(bound, literals)
+        if day is not None:
+            filters.append(f"{qualifier}{field} {operator} '{day}'")
+        else:
+            filters.append(f"{qualifier}{field} {operator} DATE({bound.strip()})")
+    return filters
+
+
+def _record(entry: dict):
+    """Acrescenta o resultado da análise ao arquivo de estatísticas."""
+    with _lock:
+        _stats[entry["status"]] += 1
+        if entry["rewrites"]:
+            _stats["rewritten"] += 1
+        if entry["partition_filter_added"]:
+            _stats["partition_filter_added"] += 1
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(PARTITION_STATS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"   Não foi possível registrar as estatísticas de poda: {e}")
+
+
+def analyze(sql: str, question: str = "") -> dict:
+    """
+    Analisa (e, quando possível, reescreve) os filtros de data da consulta.
+    Retorna um dicionário com `sql` (possivelmente reescrito), `status`
+    (`bounded`, `non_sargable`, `full_scan` ou `not_analyzed`), as reescritas
+    aplicadas e se um filtro de partição foi acrescentado.
+    """
+    result = {"sql": sql, "status": "not_analyzed", "rewrites": [], "partition_filter_added": False}
+    table = re.compile(rf"`{re.escape(CHAMADOS_TABLE_FULL_PATH)}`", re.IGNORECASE)
+    if not table.search(sql):
+        return result
+
+    entry = get_table_entry(CHAMADOS_TABLE_FULL_PATH)
+    column_type = next((c["type"] for c in entry["columns"] if c["name"] == PARTITION_DATE_COLUMN), "DATETIME")
+    masked, literals = mask_sql(sql)
+    rewriter = _Rewriter(literals, column_type)
+    masked = _rewrite_predicates(masked, rewriter)
+    result["rewrites"] = rewriter.applied
+
+    single_select = len(re.findall(r"\bselect\b", masked, re.IGNORECASE)) == 1
+    span = _where_span(masked) if single_select else None
+    if single_select:
+        where = masked[span[0]:span[1]] if span else ""
+        # Com um OR de nível zero, um limite de um dos lados não vale para a consulta toda
+        disjunctive = len(split_top_level(where, "or")) > 1 if where else False
+        lower, upper = _bounds(_conjuncts(where)) if where and not disjunctive else ([], [])
+        if lower or upper:
+            result["status"] = "bounded"
+        elif re.search(rf"\b{PARTITION_DATE_COLUMN}\b", where, re.IGNORECASE):
+            result["status"] = "non_sargable"
+        else:
+            result["status"] = "full_scan"
+
+        partitioning = entry.get("partitioning") or {}
+        field = partitioning.get("field")
+        field_type = next((c["type"] for c in entry["columns"] if c["name"] == field), None)
+        derived = (
+            _config.PARTITION_FIELD_DERIVED and field and field != PARTITION_DATE_COLUMN and field_type == "DATE"
+            and not re.search(rf"\b{field}\b", masked, re.IGNORECASE)
+        )
+        if derived and (lower or upper):
+            filters = _partition_filters(lower, upper, literals, field, partitioning.get("type") or "DAY")
+            where = masked[span[0]:span[1]].rstrip()
+            masked = f"{masked[:span[0]]}{where} AND {' AND '.join(filters)} {masked[span[1]:].lstrip()}".rstrip()
+            result["partition_filter_added"] = True
+
+    result["sql"] = unmask_sql(masked, literals) if (result["rewrites"] or result["partition_filter_added"]) else sql
+    _record({
+        "timestamp": time.time(),
+        "question": question,
+        "status": result["status"],
+        "rewrites": result["rewrites"],
+        "partition_filter_added": result["partition_filter_added"],
+        "original_sql": sql,
+        "sql": result["sql"],
+    })
+    return result
+
+
+def get_stats() -> dict:
+    """Contagem de consultas por situação de poda desde o início do processo."""
+    with _lock:
+        return dict(_stats)
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"com intervalo={stats['bounded']}, não sargáveis={stats['non_sargable']}, "
+        f"varredura completa={stats['full_scan']}, reescritas={stats['rewritten']}, "
+        f"filtros de partição={stats['partition_filter_added']}"
+    )
@@ -0,0 +1,131 @@
+"""
+Expansão da pergunta com o contexto da conversa para a busca de categorias.
+
+A chamada ao LLM só é feita quando ajuda: sem histórico, ou quando uma
+heurística local indica que a pergunta é auto-suficiente (longa o bastante e
+sem marcas de continuação como "e os...", "desses", "o mesmo"), a pergunta
+original é usada. Expansões já calculadas ficam em um cache LRU cuja chave é o
+histórico mais a pergunta, ou seja, uma entrada por conversa e turno.
+"""
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from langchain_core.messages import BaseMessage
+from . import config as _config
+from .config import logger
+from .llm import get_llm
+from .models import format_chat_history
+
+# Marcas de que a pergunta depende do turno anterior (texto sem acentos, minúsculo)
+_CONTEXTUAL_RE = re.compile(
+    r"^(e|mas|entao|agora|tambem)\b"
+    r"|\b(isso|isto|esse|essa|esses|essas|este|esta|estes|estas|desse|dessa|desses|dessas|deste|desta|"
+    r"nesse|nessa|nesses|nessas|naquele|naquela|aquele|aquela|aqueles|aquelas|dele|dela|deles|delas|"
+    r"mesmo|mesma|mesmos|mesmas|anterior|anteriores|acima|ultimo|ultima|tambem|idem)\b"
+)
+# Perguntas com menos palavras que isso raramente se sustentam sozinhas
+MIN_SELF_CONTAINED_WORDS = 5
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_stats = {"no_history": 0, "self_contained": 0, "cache_hits": 0, "llm_calls": 0, "failures": 0}
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower().strip()
+
+
+def is_self_contained(question: str) -> bool:
+    """Heurística local: a pergunta é longa o bastante e não retoma o turno anterior?"""
+    normalized = _normalize(question)
+    if re.search(r"['\"].+['\"]", question):
+        return not _CONTEXTUAL_RE.match(normalized)
+    return len(normalized.split()) >= MIN_SELF_CONTAINED_WORDS and not _CONTEXTUAL_RE.search(normalized)
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def _build_prompt(chat_history: str, current_question: str) -> str:
+    return f"""
+        {chat_history}
+
+        A pergunta atual do usuário é: "{current_question}"
+
+        Sua tarefa é criar uma versão expandida da pergunta atual que inclua APENAS os termos-chave relevantes mencionados na conversa anterior que são necessários para entender a pergunta.
+
+        IMPORTANTE:
+        - Se a pergunta atual for completa e auto-suficiente, retorne-a exatamente como está.
+        - Se a pergunta atual for contextual (ex: "e os com menos chamados?", "e quais os bairros?"), extraia APENAS os termos-chave da conversa anterior que completam o sentido (ex: tipo de chamado, período, categoria mencionada).
+        - NÃO adicione contexto conversacional, explicações, ou informações irrelevantes.
+        - NÃO adicione informações sobre resultados anteriores ou comparações.
+        - Foque apenas em termos que seriam úteis para buscar categorias em um banco de dados
+
+        Retorne APENAS a pergunta expandida com os termos-chave necessários, sem explicações adicionais.
+        """
+
+
+def expand_query(messages: list[BaseMessage], chat_history: str | None = None) -> str:
+    """
+    Expande a pergunta atual (última mensagem) com os termos-chave do
+    histórico, evitando o LLM quando possível. Em caso de falha, retorna a
+    pergunta original. Sem `chat_history`, usa todas as mensagens anteriores.
+    """
+    current_question = messages[-1].content
+    if chat_history is None:
+        chat_history = format_chat_history(messages[:-1])
+
+    if not chat_history:
+        _count("no_history")
+        logger.info("Sem histórico de conversa. Usando pergunta original.")
+        return current_question
+    if _config.QUERY_EXPANSION_HEURISTIC and is_self_contained(current_question):
+        _count("self_contained")
+        logger.info("Pergunta auto-suficiente. Usando pergunta original sem expandir.")
+        return current_question
+
+    key = hashlib.sha256(f"{chat_history}\0{current_question}".encode("utf-8")).hexdigest()
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached is not None:
+        _count("cache_hits")
+        logger.info(f"Query expandida (cache): '{current_question}' -> '{cached}'")
+        return cached
+
+    try:
+        _count("llm_calls")
+        expanded = get_llm("query_expander").invoke(_build_prompt(chat_history, current_question)).content.strip()
+        expanded = expanded.strip('"').strip("'")
+    except Exception as e:
+        _count("failures")
+        logger.warning(f"Falha ao expandir query: {e}. Usando pergunta original.")
+        return current_question
+
+    with _lock:
+        _cache[key] = expanded
+        while len(_cache) > _config.QUERY_EXPANSION_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    logger.info(f"Query expandida: '{current_question}' -> '{expanded}'")
+    return expanded
+
+
+def get_stats() -> dict:
+    """Quantas expansões foram evitadas (sem histórico, auto-suficientes, cache) e quantas usaram o LLM."""
+    with _lock:
+        stats = dict(_stats)
+    total = sum(stats.values()) - stats["failures"]
+    return {**stats, "skip_rate": (total - stats["llm_calls"]) / total if total else 0.0}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"sem histórico={stats['no_history']}, auto-suficientes={stats['self_contained']}, "
+        f"cache={stats['cache_hits']}, LLM={stats['llm_calls']}, evitadas={stats['skip_rate']:.0%}"
+    )
@@ -0,0 +1,86 @@
+"""
+Execução cooperativa de jobs do BigQuery.
+
+`client.query(...)` apenas submete o job; aqui o job é acompanhado por polling
+com intervalo crescente, respeitando o prazo do turno (`turn_deadline`). Ao
+estourar o prazo, ou quando a tarefa assíncrona que espera o job é cancelada
+(usuário saiu do chat ou enviou outra mensagem), o job é cancelado no BigQuery,
+liberando a thread e a capacidade de slots.
+"""
+import time
+import asyncio
+from google.cloud import bigquery
+from . import config as _config
+from .config import logger
+from .bigquery import get_bq_client
+
+
+class QueryDeadlineExceeded(Exception):
+    """O job não terminou dentro do prazo do turno e foi cancelado."""
+
+
+def remaining_seconds(deadline: float | None) -> float | None:
+    """Segundos até o prazo (None = sem prazo)."""
+    return None if not deadline else deadline - time.time()
+
+
+def submit(sql_query: str, job_config: bigquery.QueryJobConfig, deadline: float | None = None):
+    """
+    Submete o job sem esperar o resultado. Com prazo definido, o BigQuery também
+    recebe `job_timeout_ms` para encerrar o job do lado do servidor.
+    """
+    remaining = remaining_seconds(deadline)
+    if remaining is not None:
+        if remaining <= 0:
+            raise QueryDeadlineExceeded("prazo do turno esgotado antes da execução")
+        job_config.job_timeout_ms = max(int(remaining * 1000), 1000)
+    job = get_bq_client().query(sql_query, job_config=job_config)
+    logger.info(f"   Job {job.job_id} submetido ao BigQuery.")
+    return job
+
+
+def cancel(job):
+    """Cancela o job no BigQuery (melhor esforço)."""
+    try:
+        job.cancel()
+        logger.warning(f"   Job {job.job_id} cancelado no BigQuery.")
+    except Exception as e:
+        logger.warning(f"   Não foi possível cancelar o job {job.job_id}: {e}")
+
+
+def _next_interval(interval: float) -> float:
+    return min(interval * 1.5, _config.QUERY_POLL_MAX_INTERVAL_SECONDS)
+
+
+def wait(job, deadline: float | None = None):
+    """Aguarda o job por polling, cancelando-o se o prazo do turno acabar."""
+    interval = _config.QUERY_POLL_INTERVAL_SECONDS
+    while not job.done():
+        remaining = remaining_seconds(deadline)
+        if remaining is not None and remaining <= 0:
+            cancel(job)
+            raise QueryDeadlineExceeded(f"job {job.job_id} excedeu o prazo do turno")
+        time.sleep(interval if remaining is None else min(interval, remaining))
+        interval = _next_interval(interval)
+    return job
+
+
+async def wait_async(job, deadline: float | None = None):
+    """
+    Versão assíncrona de `wait`: o polling não ocupa uma thread entre as
+    verificações, e o cancelamento da tarefa cancela também o job.
+    """
+    interval = _config.QUERY_POLL_INTERVAL_SECONDS
+    try:
+        while not await asyncio.to_thread(job.done):
+            remaining = remaining_seconds(deadline)
+            if remaining is not None and remaining <= 0:
+                await asyncio.to_thread(cancel, job)
+                raise QueryDeadlineExceeded(f"job {job.job_id} excedeu o prazo do turno")
+            await asyncio.sleep(interval if remaining is None else min(interval, remaining))
+            interval = _next_interval(interval)
+    except asyncio.CancelledError:
+        logger.warning(f"   Turno interrompido; cancelando o job {job.job_id}.")
+        await asyncio.shield(asyncio.to_thread(cancel, job))
+        raise
+    return job
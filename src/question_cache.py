@@ -0,0 +1,261 @@
+"""
+Cache semântico de perguntas: reaproveita o SQL já validado para paráfrases.
+
+Cada pergunta de um turno sem histórico cuja consulta foi executada com sucesso
+é guardada com o plano, o SQL validado (antes das reescritas para agregados e
+poda de partições) e uma impressão digital do resultado. Uma nova pergunta sem
+histórico cuja similaridade de cosseno com uma pergunta guardada passa de
+`QUESTION_CACHE_THRESHOLD` vai do Roteador de Intenção direto ao Reescritor
+para Agregados, pulando o esquema e a geração; as reescritas e o guardião de
+custo ainda se aplicam, e o executor pode servir o resultado do cache de
+resultados.
+
+Os números, os textos entre aspas, os meses, os comparativos ("mais",
+"menos") e os nomes de bairros e categorias do catálogo citados nas duas
+perguntas precisam coincidir ("chamados em 2023" e "chamados em 2024", ou
+"em janeiro" e "em fevereiro", têm embeddings quase iguais). As
+entradas ficam em SQLite e os vetores vêm do cache de embeddings; em memória,
+uma matriz normalizada responde à busca com um produto de matrizes.
+"""
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from contextlib import contextmanager
+from . import config as _config
+from . import category_catalog
+from .config import logger, CACHE_DIR, EMBEDDING_MODEL_NAME
+from .embedding_cache import embed_texts, normalize_text
+from .lexical_index import normalize
+from .vector_index import normalize_rows
+
+QUESTION_CACHE_PATH = CACHE_DIR / "question_cache.sqlite"
+
+_LITERAL_RE = re.compile(r"\d+(?:[.,]\d+)*|'[^']+'|\"[^\"]+\"")
+MONTHS = {
+    "janeiro", "fevereiro", "marco", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+}
+COMPARATIVES = {
+    "mais", "menos", "maior", "maiores", "menor", "menores", "melhor", "melhores", "pior", "piores",
+    "acima", "abaixo", "antes", "depois", "crescente", "decrescente",
+}
+# Palavras dos nomes do catálogo comuns demais para distinguir perguntas
+_COMMON_WORDS = {"sobre", "para", "como", "pela", "pelo", "entre", "outros", "outras", "geral"}
+
+_lock = threading.Lock()
+_entries: list[dict] | None = None
+_matrix: np.ndarray | None = None
+_vocabulary: tuple[float, frozenset[str]] | None = None
+_stats = {"hits": 0, "misses": 0, "rejected": 0, "stores": 0, "invalidated": 0, "result_changed": 0}
+
+
+def _key(question: str) -> str:
+    return hashlib.sha256(normalize_text(question).encode("utf-8")).hexdigest()
+
+
+def literals(question: str) -> list[str]:
+    """Números e textos entre aspas da pergunta, que precisam coincidir para reaproveitar o SQL."""
+    return sorted(normalize_text(token).strip("'\"") for token in _LITERAL_RE.findall(question))
+
+
+def _known_terms() -> frozenset[str]:
+    """Palavras dos bairros e das categorias, tipos e subtipos do catálogo já carregado (sem consultar o BigQuery)."""
+    global _vocabulary
+    catalog = category_catalog.loaded()
+    if catalog is None:
+        return frozenset()
+    vocabulary = _vocabulary
+    if vocabulary is None or vocabulary[0] != catalog["loaded_at"]:
+        names = [value for values in catalog["columns"].values() for value, _ in values] + catalog.get("bairros", [])
+        words = {
+            word for name in names for word in normalize(name).split()
+            if len(word) >= 4 and word not in _COMMON_WORDS
+        }
+        vocabulary = _vocabulary = (catalog["loaded_at"], frozenset(words))
+    return vocabulary[1]
+
+
+def reuse_terms(question: str) -> list[str]:
+    """
+    Termos que precisam coincidir para reaproveitar o SQL: números, textos entre
+    aspas, meses, comparativos e palavras de bairros e categorias conhecidos.
+    """
+    words = set(normalize(question).split())
+    return literals(question) + sorted(words & (MONTHS | COMPARATIVES | _known_terms()))
+
+
+def result_fingerprint(rows: list[dict]) -> str:
+    return hashlib.sha256(json.dumps(rows, default=str, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+@contextmanager
+def _connect():
+    """Abre o SQLite do cache (uma conexão por operação, segura entre threads)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(QUESTION_CACHE_PATH, timeout=5)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                "key TEXT PRIMARY KEY, question TEXT, plan TEXT, sql TEXT, fingerprint TEXT, created_at REAL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def _load() -> tuple[list[dict], np.ndarray]:
+    """Entradas válidas (dentro do TTL) e a matriz normalizada dos embeddings das perguntas."""
+    global _entries, _matrix
+    with _lock:
+        if _entries is None:
+            oldest = time.time() - _config.QUESTION_CACHE_TTL_SECONDS
+            with _connect() as conn:
+                rows = conn.execute(
+                    "SELECT key, question, plan, sql, fingerprint, created_at FROM questions "
+                    "WHERE created_at >= ? ORDER BY created_at", (oldest,)
+                ).fetchall()
+            entries = [
+                dict(zip(("key", "question", "plan", "sql", "fingerprint", "created_at"), row)) for row in rows
+            ]
+            questions = [entry["question"] for entry in entries]
+            _matrix = normalize_rows(embed_texts(questions, EMBEDDING_MODEL_NAME)) if questions else None
+            _entries = entries
+            logger.info(f"   Cache semântico de perguntas carregado ({len(entries)} perguntas).")
+        # Lidos juntos, sob a trava, para que as linhas correspondam aos vetores
+        return _entries, _matrix
+
+
+def lookup(question: str) -> dict | None:
+    """
+    Entrada da pergunta guardada mais parecida (com a similaridade em
+    `similarity`), ou None se nenhuma passa do limiar ou se os termos de
+    `reuse_terms` não coincidem.
+    """
+    if not _config.QUESTION_CACHE_ENABLED:
+        return None
+    entries, matrix = _load()
+    if not entries:
+        _count("misses")
+        return None
+    query = normalize_rows(embed_texts([question], EMBEDDING_MODEL_NAME))[0]
+    scores = matrix @ query
+    best = int(np.argmax(scores))
+    similarity = float(scores[best])
+    entry = entries[best]
+    if similarity < _config.QUESTION_CACHE_THRESHOLD:
+        _count("misses")
+        return None
+    if time.time() - entry["created_at"] > _config.QUESTION_CACHE_TTL_SECONDS:
+        _count("misses")
+        return None
+    if reuse_terms(question) != reuse_terms(entry["question"]):
+        _count("rejected")
+        logger.info(f"   Cache semântico: '{entry['question']}' ({similarity:.3f}) descartada, termos diferentes.")
+        return None
+    _count("hits")
+    logger.info(f"   Cache semântico: acerto com '{entry['question']}' ({similarity:.3f}). {format_stats()}")
+    return {**entry, "similarity": similarity}
+
+
+def store(question: str, plan: str, sql: str, rows: list[dict]):
+    """Guarda (ou substitui) a pergunta com o plano, o SQL executado e a impressão digital do resultado."""
+    global _entries, _matrix
+    if not _config.QUESTION_CACHE_ENABLED:
+        return
+    _load()
+    entry = {
+        "key": _key(question), "question": question, "plan": plan, "sql": sql,
+        "fingerprint": result_fingerprint(rows), "created_at": time.time(),
+    }
+    vector = normalize_rows(embed_texts([question], EMBEDDING_MODEL_NAME))
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+                tuple(entry[name] for name in ("key", "question", "plan", "sql", "fingerprint", "created_at")),
+            )
+            conn.execute(
+                "DELETE FROM questions WHERE key NOT IN "
+                "(SELECT key FROM questions ORDER BY created_at DESC LIMIT ?)",
+                (_config.QUESTION_CACHE_MAX_ENTRIES,),
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao gravar o cache semântico de perguntas: {e}")
+        return
+    with _lock:
+        # Parte do estado atual (não do lido antes da gravação), para não perder um store concorrente
+        if _entries is not None:
+            keep = [i for i, old in enumerate(_entries) if old["key"] != entry["key"]]
+            keep = keep[-(_config.QUESTION_CACHE_MAX_ENTRIES - 1):] if _config.QUESTION_CACHE_MAX_ENTRIES > 1 else []
+            _entries = [_entries[i] for i in keep] + [entry]
+            _matrix = np.vstack([_matrix[keep], vector]) if keep else vector
+    _count("stores")
+
+
+def record_result(entry: dict, rows: list[dict]):
+    """Compara o resultado de um acerto com o guardado e atualiza a impressão digital."""
+    fingerprint = result_fingerprint(rows)
+    if fingerprint == entry["fingerprint"]:
+        return
+    _count("result_changed")
+    logger.info(f"   Cache semântico: o resultado de '{entry['question']}' mudou desde que foi guardado.")
+    try:
+        with _connect() as conn:
+            conn.execute("UPDATE questions SET fingerprint = ? WHERE key = ?", (fingerprint, entry["key"]))
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao atualizar o cache semântico de perguntas: {e}")
+    with _lock:
+        for cached in _entries or []:
+            if cached["key"] == entry["key"]:
+                cached["fingerprint"] = fingerprint
+
+
+def invalidate(key: str):
+    """Remove uma entrada cujo SQL falhou ao ser reaproveitado."""
+    global _entries, _matrix
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM questions WHERE key = ?", (key,))
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao remover a entrada do cache semântico de perguntas: {e}")
+    with _lock:
+        if _entries is not None:
+            keep = [i for i, entry in enumerate(_entries) if entry["key"] != key]
+            _entries = [_entries[i] for i in keep]
+            _matrix = _matrix[keep] if keep else None
+    _count("invalidated")
+
+
+def get_stats() -> dict:
+    """Acertos, falhas e descartes (termos diferentes) desde o início do processo."""
+    with _lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"] + stats["rejected"]
+    return {**stats, "hit_rate": stats["hits"] / total if total else 0.0}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"acertos={stats['hits']}, falhas={stats['misses']}, descartes={stats['rejected']}, "
+        f"taxa={stats['hit_rate']:.0%}"
+    )
+
+
+def clear():
+    """Esvazia o cache."""
+    global _entries, _matrix
+    with _connect() as conn:
+        conn.execute("DELETE FROM questions")
+    with _lock:
+        _entries, _matrix = None, None
@@ -0,0 +1,249 @@
+"""
+Cache de resultados de consultas SQL.
+
+A chave é o hash de uma forma canônica do SQL (sem comentários, espaços e
+maiúsculas/minúsculas irrelevantes e com aliases de tabela renomeados), de modo
+que variações triviais da mesma consulta compartilhem a entrada. Há um nível em
+memória (LRU) e um nível persistente em SQLite. Uma entrada expira pelo TTL ou
+quando alguma tabela consultada foi modificada depois de armazenada.
+"""
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
+from . import config as _config
+from .config import logger, CACHE_DIR, ALLOWED_TABLES
+from .schema_cache import get_table_entry
+
+RESULT_CACHE_PATH = CACHE_DIR / "result_cache.sqlite"
+
+_TOKEN_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|--[^\n]*|/\*.*?\*/|\s+|[^\s'\"`]", re.S)
+_ALIAS_RE = re.compile(r"\b(from|join) (`[^`]+`)(?: as)? ([a-z_][a-z0-9_]*)\b")
+_ALIAS_AS_RE = re.compile(r"\b(from|join) (`[^`]+`) as ([a-z_][a-z0-9_]*)\b")
+_PUNCTUATION = set("(),=<>+-*/;")
+_NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "full", "cross", "on", "using", "group",
+    "order", "limit", "having", "union", "window", "qualify", "as",
+}
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, dict]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0, "stores": 0}
+
+
+def _is_literal(token: str) -> bool:
+    return token.startswith(("'", '"'))
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Normaliza o SQL para uso como chave: remove comentários e o `;` final,
+    colapsa espaços, converte para minúsculas tudo que não é literal de texto
+    e renomeia aliases de tabela para t0, t1, ... na ordem em que aparecem.
+    """
+    tokens = []
+    pending_space = False
+    for token in _TOKEN_RE.findall(sql):
+        if token.isspace() or token.startswith(("--", "/*")):
+            pending_space = True
+            continue
+        if not _is_literal(token):
+            token = token.lower()
+        if pending_space and tokens and tokens[-1] not in _PUNCTUATION and token not in _PUNCTUATION:
+            tokens.append(" ")
+        tokens.append(token)
+        pending_space = False
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+
+    # Aliases são procurados e substituídos apenas fora dos literais de texto
+    skeleton = "".join("''" if _is_literal(t) else t for t in tokens)
+    aliases = {}
+    for _, _, alias in _ALIAS_RE.findall(skeleton):
+        if alias not in _NOT_ALIASES and alias not in aliases:
+            aliases[alias] = f"t{len(aliases)}"
+    if aliases:
+        pattern = re.compile(r"(?<![\w.`])(" + "|".join(map(re.escape, aliases)) + r")\b")
+        parts = re.split(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")", "".join(tokens))
+        return "".join(
+            part if index % 2 else pattern.sub(lambda m: aliases[m.group(1)], _ALIAS_AS_RE.sub(r"\1 \2 \3", part))
+            for index, part in enumerate(parts)
+        )
+    return "".join(tokens)
+
+
+def _cache_key(sql: str) -> str:
+    # O backend entra na chave: o espelho local pode estar defasado em relação ao BigQuery
+    backend = _config.SQL_EXECUTOR_BACKEND
+    if backend == "bigquery" and _config.BIGQUERY_BACKEND == "local":
+        backend = "bigquery-local"
+    key_source = f"{backend}\0{canonicalize_sql(sql)}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+def _tables_in(sql: str) -> list[str]:
+    tables = ALLOWED_TABLES + [_config.ROLLUP_TABLE_FULL_PATH.lower()]
+    return sorted({t for t in re.findall(r"`([^`]+)`", sql.lower()) if t in tables})
+
+
+def _tables_modified(tables: list[str]) -> dict[str, str | None]:
+    """
+    Versão atual de cada tabela: o `modified` do BigQuery (via cache de esquema)
+    ou, no espelho local, o momento da última sincronização.
+    """
+    if _config.SQL_EXECUTOR_BACKEND == "duckdb":
+        from .local_mirror import table_version
+        return {table: table_version(table) for table in tables}
+    return {table: get_table_entry(table)["modified"] for table in tables}
+
+
+def _to_json(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+@contextmanager
+def _connect():
+    """Abre o SQLite do nível persistente (uma conexão por operação, segura entre threads)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(RESULT_CACHE_PATH, timeout=5)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, sql TEXT, rows TEXT, tables_modified TEXT, created_at REAL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(*names: str):
+    with _lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def _is_fresh(entry: dict) -> bool:
+    if time.time() - entry["created_at"] > _config.RESULT_CACHE_TTL_SECONDS:
+        return False
+    tables = list(entry["tables_modified"])
+    return _tables_modified(tables) == entry["tables_modified"]
+
+
+def _remember(key: str, entry: dict):
+    with _lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        while len(_memory) > _config.RESULT_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def lookup(sql: str, record_stats: bool = True) -> list[dict] | None:
+    """
+    Retorna as linhas em cache para a consulta, ou None se ausente, expirada ou
+    se não foi possível verificar a versão das tabelas.
+    """
+    if not _config.RESULT_CACHE_ENABLED:
+        return None
+    key = _cache_key(sql)
+    level = "memory_hits"
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+
+    if entry is None:
+        level = "disk_hits"
+        try:
+            with _connect() as conn:
+                row = conn.execute(
+                    "SELECT rows, tables_modified, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"   Cache de resultados em disco indisponível: {e}")
+            row = None
+        if row is not None:
+            entry = {"rows": json.loads(row[0]), "tables_modified": json.loads(row[1]), "created_at": row[2]}
+
+    if entry is None:
+        if record_stats:
+            _count("misses")
+        return None
+
+    try:
+        fresh = _is_fresh(entry)
+    except Exception as e:
+        # Sem a versão das tabelas (rede, credenciais) não há como validar a entrada: conta como falha
+        logger.warning(f"   Cache de resultados: versão das tabelas indisponível, ignorando a entrada: {e}")
+        fresh = False
+    if not fresh:
+        if record_stats:
+            _count("stale", "misses")
+        with _lock:
+            _memory.pop(key, None)
+        return None
+
+    if level == "disk_hits":
+        _remember(key, entry)
+    if record_stats:
+        _count(level)
+        logger.info(f"   Cache de resultados: acerto ({level}). {format_stats()}")
+    return entry["rows"]
+
+
+def store(sql: str, rows: list[dict]):
+    """Armazena as linhas de uma consulta nos dois níveis do cache."""
+    if not _config.RESULT_CACHE_ENABLED:
+        return
+    key = _cache_key(sql)
+    try:
+        tables_modified = _tables_modified(_tables_in(sql))
+    except Exception as e:
+        logger.warning(f"   Resultado não armazenado em cache (versão das tabelas indisponível): {e}")
+        return
+    entry = {"rows": rows, "tables_modified": tables_modified, "created_at": time.time()}
+    _remember(key, entry)
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, canonicalize_sql(sql), json.dumps(rows, default=_to_json, ensure_ascii=False),
+                 json.dumps(tables_modified), entry["created_at"]),
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"   Falha ao gravar o cache de resultados em disco: {e}")
+    _count("stores")
+
+
+def get_stats() -> dict:
+    """Métricas de acertos e falhas do cache desde o início do processo."""
+    hits = _stats["memory_hits"] + _stats["disk_hits"]
+    total = hits + _stats["misses"]
+    return {**_stats, "hit_rate": hits / total if total else 0.0}
+
+
+def format_stats() -> str:
+    stats = get_stats()
+    return (
+        f"acertos={stats['memory_hits']}+{stats['disk_hits']} (memória+disco), "
+        f"falhas={stats['misses']} (expiradas={stats['stale']}), taxa={stats['hit_rate']:.0%}"
+    )
+
+
+def clear():
+    """Esvazia os dois níveis do cache."""
+    with _lock:
+        _memory.clear()
+    with _connect() as conn:
+        conn.execute("DELETE FROM results")
@@ -0,0 +1,222 @@
+"""
+Tabela de agregados diários de chamados e reescrita de consultas para usá-la.
+
+A tabela de agregados (`ROLLUP_TABLE_FULL_PATH`) guarda a contagem de chamados
+por dia de `data_inicio`, categoria, tipo, subtipo e bairro, e é mantida por
+`scripts/build_rollups.py`. Consultas de contagem cujas colunas de `chamado`
+se limitam a essas dimensões são reescritas para somar `n_chamados` na tabela
+de agregados, em vez de varrer a tabela bruta. A reescrita é conservadora:
+qualquer construção que ela não saiba tornar equivalente mantém a consulta
+original.
+"""
+import re
+import time
+import threading
+from datetime import datetime, timedelta
+from . import config as _config
+from .config import logger, CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH
+from .schema_cache import get_table_entry
+from .sql_text import CONSTANT_BOUND, DATE_PARTS, DAY_BOUNDARY, day_literal, mask_sql, unmask_sql
+
+ROLLUP_DIMENSIONS = ["categoria", "tipo", "subtipo", "id_bairro"]
+ROLLUP_DATE_COLUMN = "data"
+ROLLUP_COUNT_COLUMN = "n_chamados"
+
+# Construções que a reescrita não trata: subconsultas, janelas, outros agregados etc.
+_UNSUPPORTED_RE = re.compile(
+    r"\b(with|union|intersect|except|over|qualify|pivot|unpivot|unnest|tablesample|right|full|cross|"
+    r"countif|sum|avg|min|max|array_agg|string_agg|any_value|approx_\w+|stddev\w*|var_\w+|variance|"
+    r"logical_and|logical_or|corr|covar_\w+|hll_count\.\w+)\b",
+    re.IGNORECASE,
+)
+_NOT_ALIASES = {
+    "where", "join", "inner", "left", "on", "using", "group", "order", "limit", "having", "as",
+}
+
+_lock = threading.Lock()
+_stats = {"rewritten": 0, "ineligible": 0, "unavailable": 0}
+# Até quando a tabela de agregados é considerada ausente sem consultá-la de novo
+_missing_until = 0.0
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def build_rollup_select(since: str | None = None) -> str:
+    """SELECT (dialeto BigQuery) que calcula os agregados, opcionalmente a partir de uma data."""
+    dimensions = ", ".join(ROLLUP_DIMENSIONS)
+    where = f"WHERE DATE(data_inicio) >= '{since}'\n" if since else ""
+    return (
+        f"SELECT DATE(data_inicio) AS {ROLLUP_DATE_COLUMN}, {dimensions}, COUNT(*) AS {ROLLUP_COUNT_COLUMN}\n"
+        f"FROM `{CHAMADOS_TABLE_FULL_PATH}`\n"
+        f"{where}"
+        f"GROUP BY {ROLLUP_DATE_COLUMN}, {dimensions}"
+    )
+
+
+def _table_versions() -> tuple[str | None, str | None]:
+    """Momento da última atualização da tabela de chamados e da de agregados."""
+    if _config.SQL_EXECUTOR_BACKEND == "duckdb":
+        from .local_mirror import has_table, table_version
+        if not has_table(_config.ROLLUP_TABLE_FULL_PATH):
+            return table_version(CHAMADOS_TABLE_FULL_PATH), None
+        return table_version(CHAMADOS_TABLE_FULL_PATH), table_version(_config.ROLLUP_TABLE_FULL_PATH)
+    return (
+        get_table_entry(CHAMADOS_TABLE_FULL_PATH)["modified"],
+        get_table_entry(_config.ROLLUP_TABLE_FULL_PATH)["modified"],
+    )
+
+
+def rollup_available() -> bool:
+    """
+    Os agregados existem e foram atualizados depois da tabela de chamados
+    (tolerando `ROLLUP_MAX_LAG_SECONDS` de defasagem)?
+    """
+    global _missing_until
+    if time.time() < _missing_until:
+        return False
+    try:
+        source_version, rollup_version = _table_versions()
+    except Exception as e:
+        logger.info(
+            f"   Tabela de agregados indisponível (nova tentativa em {_config.ROLLUP_MISSING_RETRY_SECONDS}s): {e}"
+        )
+        rollup_version = None
+    if rollup_version is None:
+        with _lock:
+            _missing_until = time.time() + _config.ROLLUP_MISSING_RETRY_SECONDS
+        return False
+    if source_version is None:
+        return True
+    lag = datetime.fromisoformat(source_version) - datetime.fromisoformat(rollup_version)
+    return lag <= timedelta(seconds=_config.ROLLUP_MAX_LAG_SECONDS)
+
+
+def _alias_of(masked: str, marker: str) -> str | None:
+    match = re.search(rf"{marker}(?:\s+as)?\s+(\w+)", masked, re.IGNORECASE)
+    if match and match.group(1).lower() not in _NOT_ALIASES:
+        return match.group(1).lower()
+    return None
+
+
+def rewrite_for_rollup(sql: str, source_columns: list[str], joined_columns: list[str]) -> str | None:
+    """
+    Reescreve a consulta para a tabela de agregados, ou retorna None se ela
+    não for elegível. `source_columns` são as colunas de `chamado` e
+    `joined_columns` as de `bairro` (única junção aceita).
+    """
+    masked, literals = mask_sql(sql)
+    chamado = re.compile(rf"`{re.escape(CHAMADOS_TABLE_FULL_PATH)}`", re.IGNORECASE)
+    if len(chamado.findall(masked)) != 1 or len(re.findall(r"\bselect\b", masked, re.IGNORECASE)) != 1:
+        return None
+    if _UNSUPPORTED_RE.search(masked) or not re.search(rf"\bfrom\s+{chamado.pattern}", masked, re.IGNORECASE):
+        return None
+
+    masked = chamado.sub("__rollup__", masked)
+    masked = re.sub(rf"`{re.escape(BAIRROS_TABLE_FULL_PATH)}`", "__bairro__", masked, flags=re.IGNORECASE)
+    if "`" in masked:
+        return None
+    alias = _alias_of(masked, "__rollup__")
+    joined_alias = _alias_of(masked, "__bairro__")
+    qualifier = rf"(?:(?:{alias}|__rollup__)\.)?" if alias else r"(?:__rollup__\.)?"
+
+    # Contagens de chamados viram soma das contagens diárias
+    def sum_counts(match) -> str:
+        reference = match.group("ref") or ""
+        return f"COALESCE(SUM({reference[:reference.rfind('.') + 1]}{ROLLUP_COUNT_COLUMN}), 0)"
+
+    masked = re.sub(
+        rf"\bcount\s*\(\s*(?:\*|1|(?:distinct\s+)?(?P<ref>(?<![\w.]){qualifier}id_chamado\b))\s*\)",
+        sum_counts, masked, flags=re.IGNORECASE,
+    )
+
+    # data_inicio só é aceita em formas que dependem apenas do dia
+    data_inicio = rf"(?P<prefix>(?<![\w.]){qualifier})data_inicio\b"
+    masked = re.sub(
+        rf"\bdate\s*\(\s*{data_inicio}\s*\)",
+        rf"\g<prefix>{ROLLUP_DATE_COLUMN}", masked, flags=re.IGNORECASE,
+    )
+    masked = re.sub(
+        rf"\bextract\s*\(\s*(?P<part>{DATE_PARTS})\s+from\s+{data_inicio}\s*\)",
+        rf"EXTRACT(\g<part> FROM \g<prefix>{ROLLUP_DATE_COLUMN})", masked, flags=re.IGNORECASE,
+    )
+    masked = re.sub(
+        rf"\b(?:date|datetime|timestamp)_trunc\s*\(\s*{data_inicio}\s*,\s*(?P<part>{DATE_PARTS})\s*\)",
+        rf"DATE_TRUNC(\g<prefix>{ROLLUP_DATE_COLUMN}, \g<part>)", masked, flags=re.IGNORECASE,
+    )
+
+    # `data_inicio >= meia-noite` e `data_inicio < meia-noite` equivalem à comparação do dia
+    def compare(match) -> str:
+        bound = match.group("bound").strip()
+        if not re.fullmatch(DAY_BOUNDARY, bound, re.IGNORECASE):
+            day = day_literal(bound, literals)
+            if day is None:
+                return match.group(0)
+            bound = f"'{day}'"
+        operator = match.group("op")
+        if match.group(0).lower().rstrip().endswith("data_inicio"):
+            operator = {"<=": ">=", ">": "<"}[operator]
+        return f"{match.group('prefix')}{ROLLUP_DATE_COLUMN} {operator} {bound}"
+
+    bound = rf"(?P<bound>{CONSTANT_BOUND})"
+    masked = re.sub(rf"{data_inicio}\s*(?P<op>>=|<)(?!=)\s*{bound}", compare, masked, flags=re.IGNORECASE)
+    masked = re.sub(rf"{bound}\s*(?P<op><=|>)(?!=)\s*{data_inicio}", compare, masked, flags=re.IGNORECASE)
+
+    if re.search(r"\b(data_inicio|id_chamado)\b|\*", masked, re.IGNORECASE):
+        return None
+
+    # Outras contagens contariam linhas (dia, dimensões) dos agregados, não chamados;
+    # só COUNT(DISTINCT <dimensão>) tem o mesmo valor nas duas tabelas
+    distinct = rf"\bcount\s*\(\s*distinct\s+(?<![\w.]){qualifier}(?:{'|'.join(ROLLUP_DIMENSIONS)}|{ROLLUP_DATE_COLUMN})\s*\)"
+    if re.search(r"\bcount\s*\(", re.sub(distinct, "", masked, flags=re.IGNORECASE), re.IGNORECASE):
+        return None
+
+    allowed = set(ROLLUP_DIMENSIONS) | {ROLLUP_DATE_COLUMN, ROLLUP_COUNT_COLUMN}
+    source_only = {c.lower() for c in source_columns} - {c.lower() for c in joined_columns}
+    for table, name in re.findall(r"(?<![\w.])(\w+)\.(\w+)", masked):
+        table, name = table.lower(), name.lower()
+        if table in (alias, "__rollup__"):
+            if name not in allowed:
+                return None
+        elif table not in (joined_alias, "__bairro__"):
+            return None
+    for name in re.findall(r"(?<![\w.])(\w+)\b(?!\s*\.)", masked):
+        if name.lower() in source_only and name.lower() not in allowed:
+            return None
+
+    masked = masked.replace("__rollup__", f"`{_config.ROLLUP_TABLE_FULL_PATH}`")
+    masked = masked.replace("__bairro__", f"`{BAIRROS_TABLE_FULL_PATH}`")
+    return unmask_sql(masked, literals)
+
+
+def try_rewrite(sql: str) -> str | None:
+    """
+    Reescreve a consulta para os agregados quando eles estão habilitados,
+    atualizados e a consulta é elegível; caso contrário retorna None.
+    """
+    if not _config.ROLLUPS_ENABLED:
+        return None
+    try:
+        source_columns = [c["name"] for c in get_table_entry(CHAMADOS_TABLE_FULL_PATH)["columns"]]
+        joined_columns = [c["name"] for c in get_table_entry(BAIRROS_TABLE_FULL_PATH)["columns"]]
+    except Exception as e:
+        logger.warning(f"   Esquema indisponível para avaliar os agregados: {e}")
+        return None
+
+    rewritten = rewrite_for_rollup(sql, source_columns, joined_columns)
+    if rewritten is None:
+        _count("ineligible")
+        return None
+    if not rollup_available():
+        _count("unavailable")
+        return None
+    _count("rewritten")
+    return rewritten
+
+
+def get_stats() -> dict:
+    """Quantas consultas foram reescritas, inelegíveis ou sem agregados atualizados."""
+    total = sum(_stats.values())
+    return {**_stats, "rewrite_rate": _stats["rewritten"] / total if total else 0.0}
@@ -0,0 +1,136 @@
+"""
+Cache de esquemas das tabelas do BigQuery.
+
+O esquema formatado de cada tabela (chave: caminho completo da tabela) é mantido
+em memória, compartilhado entre threads e sessões, e espelhado em um snapshot em
+disco para que reinicializações não precisem buscar os metadados novamente.
+Passado o TTL, a entrada é revalidada comparando o etag/`modified` da tabela e só
+é reconstruída quando a tabela de fato mudou.
+"""
+import os
+import json
+import time
+import threading
+from .config import logger, CACHE_DIR, SCHEMA_CACHE_TTL_SECONDS
+from .bigquery import get_bq_client
+
+SCHEMA_SNAPSHOT_PATH = CACHE_DIR / "schema_cache.json"
+
+_lock = threading.Lock()
+_entries: dict[str, dict] = {}
+_fetch_locks: dict[str, threading.Lock] = {}
+_snapshot_loaded = False
+
+
+def _load_snapshot():
+    """Carrega o snapshot em disco uma única vez por processo."""
+    global _snapshot_loaded
+    if _snapshot_loaded:
+        return
+    _snapshot_loaded = True
+    if not SCHEMA_SNAPSHOT_PATH.exists():
+        return
+    try:
+        with open(SCHEMA_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            _entries.update(json.load(f))
+        logger.info(f"   Snapshot de esquema carregado ({len(_entries)} tabelas).")
+    except Exception as e:
+        logger.warning(f"   Snapshot de esquema ignorado (ilegível): {e}")
+
+
+def _save_snapshot():
+    """Grava o snapshot de forma atômica (arquivo temporário + rename)."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = SCHEMA_SNAPSHOT_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, SCHEMA_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning(f"   Não foi possível salvar o snapshot de esquema: {e}")
+
+
+def _build_entry(table) -> dict:
+    """Converte os metadados de uma tabela em uma entrada do cache."""
+    table_id = table.full_table_id.replace(":", ".")
+    columns = [
+        {"name": column.name, "type": column.field_type, "description": column.description or ""}
+        for column in table.schema
+    ]
+    partitioning = None
+    if table.time_partitioning is not None:
+        partitioning = {"field": table.time_partitioning.field, "type": table.time_partitioning.type_}
+    lines = [f"Tabela: `{table_id}`"]
+    lines += [f"- {column['name']} ({column['type']})" for column in columns]
+    return {
+        "table_id": table_id,
+        "etag": table.etag,
+        "modified": table.modified.isoformat() if table.modified else None,
+        "columns": columns,
+        "partitioning": partitioning,
+        "clustering": table.clustering_fields or [],
+        "formatted": "\n".join(lines),
+        "checked_at": time.time(),
+    }
+
+
+def _fresh(entry: dict | None) -> bool:
+    return bool(entry) and time.time() - entry["checked_at"] < SCHEMA_CACHE_TTL_SECONDS
+
+
+def _fetch_lock(table_path: str) -> threading.Lock:
+    """Trava da busca de uma tabela: threads que pedem a mesma tabela esperam uma única busca."""
+    with _lock:
+        return _fetch_locks.setdefault(table_path, threading.Lock())
+
+
+def get_table_entry(table_path: str) -> dict:
+    """
+    Retorna a entrada de cache de uma tabela, buscando ou revalidando os
+    metadados no BigQuery apenas quando ausente ou com o TTL expirado. A busca
+    remota acontece fora da trava do cache, então uma tabela lenta não atrasa
+    as consultas às demais.
+    """
+    with _lock:
+        _load_snapshot()
+        entry = _entries.get(table_path)
+        if _fresh(entry):
+            return entry
+
+    with _fetch_lock(table_path):
+        # Outra thread pode ter buscado a tabela enquanto esta esperava
+        with _lock:
+            entry = _entries.get(table_path)
+            if _fresh(entry):
+                return entry
+
+        table = get_bq_client().get_table(table_path)
+        with _lock:
+            # Entradas de snapshots antigos (sem metadados de particionamento) são reconstruídas
+            if entry and "partitioning" in entry and entry["etag"] == table.etag and entry["modified"] == (
+                table.modified.isoformat() if table.modified else None
+            ):
+                logger.info(f"   Esquema de '{table_path}' inalterado; renovando TTL.")
+                entry["checked_at"] = time.time()
+            else:
+                logger.info(f"   Esquema de '{table_path}' (re)carregado do BigQuery.")
+                entry = _build_entry(table)
+            _entries[table_path] = entry
+            _save_snapshot()
+        return entry
+
+
+def get_formatted_schema(table_paths: list[str]) -> str:
+    """Monta a string de esquema usada nos prompts a partir das entradas em cache."""
+    return "\n".join(get_table_entry(path)["formatted"] + "\n" for path in table_paths)
+
+
+def invalidate(table_path: str | None = None):
+    """Remove uma tabela (ou todas) do cache em memória e do snapshot."""
+    with _lock:
+        _load_snapshot()
+        if table_path is None:
+            _entries.clear()
+        else:
+            _entries.pop(table_path, None)
+        _save_snapshot()
@@ -0,0 +1,197 @@
+"""
+Seleção de esquema orientada à pergunta.
+
+Ranqueia as colunas das tabelas permitidas pela relevância à pergunta do usuário
+(índice de sinônimos em português, sobreposição com nome/descrição da coluna e,
+opcionalmente, similaridade de embeddings do cache de embeddings) e monta um esquema
+reduzido com as colunas mais relevantes mais as colunas obrigatórias.
+"""
+import re
+import unicodedata
+import numpy as np
+from . import config as _config
+from .config import logger, CATEGORICAL_COLUMNS, SCHEMA_REQUIRED_COLUMNS, EMBEDDING_MODEL_NAME
+from .embedding_cache import embed_texts
+from .schema_cache import get_table_entry
+from .tokens import count_tokens
+
+
+# Termos em português (sem acento, no singular) -> colunas "tabela.coluna"
+COLUMN_SYNONYMS = {
+    "bairro": ["chamado.id_bairro", "bairro.id_bairro", "bairro.nome"],
+    "regiao": ["bairro.nome_regiao_planejamento", "bairro.nome_regiao_administrativa"],
+    "zona": ["bairro.nome_regiao_planejamento"],
+    "subprefeitura": ["bairro.subprefeitura"],
+    "area": ["bairro.area"],
+    "prazo": ["chamado.data_alvo_finalizacao", "chamado.tempo_prazo", "chamado.prazo_unidade",
+              "chamado.prazo_tipo", "chamado.dentro_prazo"],
+    "atraso": ["chamado.dentro_prazo", "chamado.data_alvo_finalizacao", "chamado.data_fim"],
+    "atrasado": ["chamado.dentro_prazo", "chamado.data_alvo_finalizacao", "chamado.data_fim"],
+    "data": ["chamado.data_inicio"],
+    "dia": ["chamado.data_inicio"],
+    "mes": ["chamado.data_inicio"],
+    "ano": ["chamado.data_inicio"],
+    "periodo": ["chamado.data_inicio"],
+    "aberto": ["chamado.data_inicio"],
+    "fechado": ["chamado.data_fim", "chamado.status"],
+    "encerrado": ["chamado.data_fim", "chamado.status"],
+    "finalizado": ["chamado.data_fim", "chamado.status"],
+    "concluido": ["chamado.data_fim", "chamado.status"],
+    "tempo": ["chamado.data_inicio", "chamado.data_fim"],
+    "status": ["chamado.status", "chamado.situacao"],
+    "situacao": ["chamado.situacao", "chamado.tipo_situacao", "chamado.status"],
+    "tipo": ["chamado.tipo"],
+    "subtipo": ["chamado.subtipo"],
+    "categoria": ["chamado.categoria"],
+    "orgao": ["chamado.nome_unidade_organizacional"],
+    "unidade": ["chamado.nome_unidade_organizacional"],
+    "secretaria": ["chamado.nome_unidade_organizacional"],
+    "responsavel": ["chamado.nome_unidade_organizacional"],
+    "reclamacao": ["chamado.reclamacoes"],
+    "origem": ["chamado.id_origem_ocorrencia"],
+    "canal": ["chamado.id_origem_ocorrencia"],
+    "endereco": ["chamado.id_logradouro", "chamado.numero_logradouro"],
+    "logradouro": ["chamado.id_logradouro", "chamado.numero_logradouro"],
+    "rua": ["chamado.id_logradouro", "chamado.numero_logradouro"],
+    "coordenada": ["chamado.latitude", "chamado.longitude"],
+    "localizacao": ["chamado.latitude", "chamado.longitude"],
+    "descricao": ["chamado.descricao"],
+}
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "do", "da", "dos", "das", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "que", "qual", "quais", "quanto", "quantos", "quantas", "com", "por", "para",
+    "foi", "foram", "ser", "mais", "menos", "the", "id", "chamado", "numero",
+}
+
+SYNONYM_WEIGHT = 3.0
+LEXICAL_WEIGHT = 1.0
+EMBEDDING_WEIGHT = 2.0
+CONTEXT_WEIGHT = 0.5
+
+
+def _normalize(text: str) -> str:
+    """Remove acentos e converte para minúsculas."""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _tokenize(text: str) -> set[str]:
+    """Tokeniza, remove stopwords e reduz plurais simples ('bairros' -> 'bairro')."""
+    tokens = set()
+    for token in re.findall(r"[a-z0-9]+", _normalize(text)):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if re.fullmatch(r"(19|20)\d\d", token):
+            tokens.add("ano")
+        if token.endswith("oes"):
+            token = token[:-3] + "ao"
+        elif token.endswith("s") and len(token) > 3:
+            token = token[:-1]
+        tokens.add(token)
+    return tokens
+
+
+def _short_name(table_path: str) -> str:
+    return table_path.split(".")[-1]
+
+
+def _column_text(column: dict) -> str:
+    return f"{column['name'].replace('_', ' ')}: {column['description']}"
+
+
+def _lexical_scores(tokens: set[str], table_path: str, columns: list[dict]) -> dict[str, float]:
+    """Pontua colunas por sinônimos e por sobreposição com nome e descrição."""
+    table = _short_name(table_path)
+    scores = {}
+    for column in columns:
+        key = f"{table}.{column['name']}"
+        score = sum(SYNONYM_WEIGHT for token in tokens if key in COLUMN_SYNONYMS.get(token, []))
+        score += LEXICAL_WEIGHT * min(len(tokens & _tokenize(_column_text(column))), 3)
+        scores[column["name"]] = score
+    return scores
+
+
+def _embedding_scores(question: str, tables: dict[str, list[dict]]) -> dict[tuple[str, str], float]:
+    """
+    Similaridade de cosseno entre a pergunta e cada coluna. Os embeddings das
+    descrições de colunas e da pergunta vêm do cache de embeddings.
+    """
+    pairs = [(path, column) for path, columns in tables.items() for column in columns]
+    matrix = embed_texts([_column_text(column) for _, column in pairs] + [question], EMBEDDING_MODEL_NAME)
+    matrix, query = matrix[:-1], matrix[-1]
+    sims = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-9)
+    return {(path, column["name"]): float(sim) for (path, column), sim in zip(pairs, sims)}
+
+
+def _format(table_id: str, columns: list[dict]) -> str:
+    lines = [f"Tabela: `{table_id}`"]
+    lines += [f"- {column['name']} ({column['type']})" for column in columns]
+    return "\n".join(lines)
+
+
+def select_schema(question: str, table_paths: list[str], plan: str | None = None,
+                  context: str = "") -> tuple[str, dict]:
+    """
+    Monta o esquema reduzido para a pergunta.
+
+    Retorna a string de esquema (mesmo formato do esquema completo) e um relatório
+    com o número de colunas e a contagem de tokens antes e depois da poda.
+    """
+    entries = {path: get_table_entry(path) for path in table_paths}
+    tables = {path: entry["columns"] for path, entry in entries.items()}
+    tokens = _tokenize(question)
+    context_tokens = _tokenize(context) - tokens
+
+    scores: dict[tuple[str, str], float] = {}
+    for path, columns in tables.items():
+        for name, score in _lexical_scores(tokens, path, columns).items():
+            scores[(path, name)] = score
+        for name, score in _lexical_scores(context_tokens, path, columns).items():
+            scores[(path, name)] += CONTEXT_WEIGHT * score
+
+    if _config.SCHEMA_SELECTION_USE_EMBEDDINGS:
+        try:
+            for key, sim in _embedding_scores(question, tables).items():
+                scores[key] += EMBEDDING_WEIGHT * sim
+        except Exception as e:
+            logger.warning(f"   Embeddings de colunas indisponíveis: {e}. Usando apenas o ranking léxico.")
+
+    required = {
+        (path, name)
+        for path in table_paths
+        for name in SCHEMA_REQUIRED_COLUMNS.get(path, [])
+    }
+    if plan == "sql_contextual":
+        required |= {(table_paths[0], name) for name in CATEGORICAL_COLUMNS}
+
+    ranked = sorted(
+        (key for key, score in scores.items() if score > 0 and key not in required),
+        key=lambda key: scores[key],
+        reverse=True,
+    )
+    selected = required | set(ranked[:_config.SCHEMA_SELECTION_TOP_K])
+
+    blocks = []
+    selected_count = 0
+    for index, path in enumerate(table_paths):
+        # A tabela principal sempre entra; as demais apenas se alguma coluna
+        # própria (além das obrigatórias) for relevante para a pergunta.
+        if index > 0 and not any(key[0] == path and scores.get(key, 0) > 0 for key in selected):
+            continue
+        columns = [column for column in tables[path] if (path, column["name"]) in selected]
+        selected_count += len(columns)
+        blocks.append(_format(entries[path]["table_id"], columns))
+
+    pruned_schema = "\n".join(block + "\n" for block in blocks)
+    full_schema = "\n".join(entry["formatted"] + "\n" for entry in entries.values())
+    full_tokens = count_tokens(full_schema)
+    pruned_tokens = count_tokens(pruned_schema)
+    report = {
+        "total_columns": sum(len(columns) for columns in tables.values()),
+        "selected_columns": selected_count,
+        "full_tokens": full_tokens,
+        "pruned_tokens": pruned_tokens,
+        "reduction": 1 - pruned_tokens / full_tokens if full_tokens else 0.0,
+    }
+    return pruned_schema, report
@@ -0,0 +1,84 @@
+"""
+Utilitários de texto para analisar e reescrever o SQL gerado.
+
+As reescritas trabalham sobre uma versão "mascarada" da consulta, com os
+literais de texto substituídos por marcadores `__litN__` e os comentários
+removidos, para que padrões não casem com o conteúdo de strings.
+"""
+import re
+
+LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_DAY_LITERAL_RE = re.compile(r"^['\"](\d{4}-\d{2}-\d{2})(?:[ T]00:00:00(?:\.0+)?)?['\"]$")
+_DATE_LITERAL_RE = re.compile(r"^['\"](\d{4}-\d{2}-\d{2})(?:[ T][\d:.]+)?['\"]$")
+
+# Partes de data aceitas em EXTRACT/DATE_TRUNC
+DATE_PARTS = r"(year|isoyear|quarter|month|week(?:\s*\(\s*\w+\s*\))?|isoweek|day|dayofweek|dayofyear)"
+# Expressões constantes que valem sempre meia-noite de um dia
+DAY_BOUNDARY = (
+    r"(?:current_date\s*\(\s*\)"
+    r"|date_(?:sub|add)\s*\(\s*current_date\s*\(\s*\)\s*,\s*interval\s+\d+\s+(?:day|week|month|quarter|year)\s*\)"
+    r"|date_trunc\s*\(\s*current_date\s*\(\s*\)\s*,\s*" + DATE_PARTS + r"\s*\)"
+    r"|date\s*\(\s*\d+\s*,\s*\d+\s*,\s*\d+\s*\))"
+)
+# Literal (opcionalmente tipado) mascarado ou expressão de dia constante
+CONSTANT_BOUND = rf"(?:(?:date|datetime|timestamp)\s+)?__lit\d+__|{DAY_BOUNDARY}"
+
+
+def mask_sql(sql: str) -> tuple[str, list[str]]:
+    """Substitui literais de texto por marcadores e remove comentários."""
+    literals = []
+
+    def keep(match):
+        literals.append(match.group(0))
+        return f"__lit{len(literals) - 1}__"
+
+    masked = LITERAL_RE.sub(keep, sql)
+    return _COMMENT_RE.sub(" ", masked), literals
+
+
+def unmask_sql(sql: str, literals: list[str]) -> str:
+    return re.sub(r"__lit(\d+)__", lambda m: literals[int(m.group(1))], sql)
+
+
+def _literal_of(token: str, literals: list[str]) -> str | None:
+    match = re.fullmatch(r"(?:(?:date|datetime|timestamp)\s+)?__lit(\d+)__", token.strip(), re.IGNORECASE)
+    return literals[int(match.group(1))] if match else None
+
+
+def day_literal(token: str, literals: list[str]) -> str | None:
+    """Data 'AAAA-MM-DD' de um marcador de literal que represente meia-noite de um dia."""
+    literal = _literal_of(token, literals)
+    match = _DAY_LITERAL_RE.match(literal) if literal else None
+    return match.group(1) if match else None
+
+
+def date_literal(token: str, literals: list[str]) -> str | None:
+    """Parte de data 'AAAA-MM-DD' de um marcador de literal de data ou data/hora."""
+    literal = _literal_of(token, literals)
+    match = _DATE_LITERAL_RE.match(literal) if literal else None
+    return match.group(1) if match else None
+
+
+def split_top_level(text: str, separator: str) -> list[str]:
+    """
+    Divide `text` nas ocorrências da palavra-chave `separator` (ex.: AND) fora
+    de parênteses. O AND de um `BETWEEN x AND y` não divide.
+    """
+    parts, depth, start, pending_between = [], 0, 0, False
+    for match in re.finditer(rf"\(|\)|\bbetween\b|\b{separator}\b", text, re.IGNORECASE):
+        token = match.group(0).lower()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token == "between":
+            pending_between = True
+        elif depth == 0 and token == separator.lower():
+            if pending_between and separator.lower() == "and":
+                pending_between = False
+                continue
+            parts.append(text[start:match.start()])
+            start = match.end()
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
@@ -0,0 +1,60 @@
+"""
+Execução do grafo em streaming para a interface.
+
+`stream_turn` executa um turno com `astream` e produz eventos de progresso
+(um por nó iniciado, com um rótulo legível) e os tokens das respostas do
+Sintetizador de Resposta e do Chat à medida que o LLM os gera. Ao final,
+produz o estado do turno, do qual a interface lê a resposta ou o erro.
+"""
+from typing import AsyncIterator
+from langchain_core.messages import AIMessage, AIMessageChunk
+from . import config as _config
+
+# Nós cuja saída do LLM é a resposta ao usuário
+STREAMED_NODES = {"response_synthesizer", "conversational_responder"}
+
+NODE_PROGRESS = {
+    "intent_router": "Entendendo a pergunta",
+    "schema_fetcher": "Carregando o esquema das tabelas",
+    "schema_selector": "Selecionando as colunas relevantes",
+    "query_expander": "Completando a pergunta com a conversa",
+    "category_fetcher": "Buscando categorias",
+    "sql_generator": "Gerando SQL",
+    "sql_validator": "Validando o SQL",
+    "rollup_rewriter": "Verificando os agregados diários",
+    "partition_analyzer": "Analisando os filtros de data",
+    "sql_cost_guard": "Estimando o custo da consulta",
+    "response_synthesizer": "Escrevendo a resposta",
+    "conversational_responder": "Escrevendo a resposta",
+    "history_summarizer": "Resumindo a conversa",
+}
+
+
+def progress_label(node: str) -> str:
+    if node == "sql_executor":
+        return "Consultando o espelho local" if _config.SQL_EXECUTOR_BACKEND == "duckdb" else "Consultando o BigQuery"
+    return NODE_PROGRESS.get(node, node)
+
+
+async def stream_turn(app, inputs: dict, config: dict) -> AsyncIterator[tuple[str, object]]:
+    """
+    Executa um turno e produz `("progress", rótulo)` quando um nó começa,
+    `("token", texto)` para cada trecho da resposta e, por fim,
+    `("final", estado)`.
+    """
+    streamed = set()
+    async for mode, chunk in app.astream(inputs, config=config, stream_mode=["tasks", "messages"]):
+        if mode == "tasks":
+            if "input" in chunk:
+                yield "progress", progress_label(chunk["name"])
+            continue
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        if node not in STREAMED_NODES or not isinstance(message, AIMessage) or not message.content:
+            continue
+        # Mensagens completas repetem o texto já transmitido (a do nó ou a de um acerto do cache do LLM)
+        if isinstance(message, AIMessageChunk) or node not in streamed:
+            streamed.add(node)
+            yield "token", message.content
+    snapshot = await app.aget_state(config)
+    yield "final", snapshot.values
@@ -0,0 +1,18 @@
+from functools import lru_cache
+from .config import logger, LLM_MODEL_NAME
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(LLM_MODEL_NAME)
+    except Exception as e:
+        logger.warning(f"Tokenizador indisponível ({e}). Usando estimativa de ~4 caracteres por token.")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Conta (ou estima, sem o tiktoken) os tokens de um texto para o modelo padrão."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
@@ -0,0 +1,111 @@
+"""
+Índice vetorial em memória com NumPy para o catálogo de categorias.
+
+O catálogo tem poucos milhares de textos curtos; uma matriz float32 com linhas
+normalizadas responde à busca por similaridade de cosseno com um único produto
+de matrizes, sem o cliente persistente do ChromaDB. A matriz fica em
+`vectors.npy` (aberta por memory-map) e os documentos e metadados em
+`metadata.json`, no diretório `NUMPY_INDEX_PATH`. A gravação é atômica: os dois
+arquivos são escritos em um diretório temporário que substitui o anterior.
+
+Índices gerados incrementalmente por `scripts/vectordb.py` são versionados: o
+arquivo `CURRENT` no diretório do índice (ou do ChromaDB) aponta a versão
+ativa, e trocá-lo (`os.replace`) publica uma nova versão de forma atômica,
+inclusive com o agente em execução.
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+
+
+def category_id(column: str, value: str) -> str:
+    """ID estável de um valor de categoria: hash da coluna e do texto."""
+    return "cat_" + hashlib.sha256(f"{column}\0{value}".encode("utf-8")).hexdigest()[:20]
+
+
+def current_version(path: Path) -> str | None:
+    """Versão ativa do índice em `path` (None para índices não versionados)."""
+    try:
+        return (Path(path) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(path: Path, version: str):
+    """Publica a versão ativa trocando o arquivo `CURRENT` de forma atômica."""
+    path = Path(path)
+    tmp_path = path / f"{CURRENT_FILE}.tmp"
+    tmp_path.write_text(version, encoding="utf-8")
+    os.replace(tmp_path, path / CURRENT_FILE)
+
+
+def numpy_index_dir(path: Path, version: str | None) -> Path:
+    return Path(path) / version if version else Path(path)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def save_index(path: Path, embeddings: np.ndarray, documents: list[str], metadatas: list[dict], model: str,
+               ids: list[str] | None = None):
+    """Grava a matriz normalizada e os metadados, trocando o diretório de forma atômica."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    np.save(tmp_path / VECTORS_FILE, normalize_rows(embeddings))
+    with open(tmp_path / METADATA_FILE, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "ids": ids, "documents": documents, "metadatas": metadatas}, f, ensure_ascii=False)
+
+    old_path = path.with_name(path.name + ".old")
+    shutil.rmtree(old_path, ignore_errors=True)
+    if path.exists():
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class NumpyVectorIndex:
+    """Matriz normalizada (memory-map) e metadados de um índice salvo por `save_index`."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path / METADATA_FILE, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.model = metadata["model"]
+        self.ids: list[str] | None = metadata.get("ids")
+        self.documents: list[str] = metadata["documents"]
+        self.metadatas: list[dict] = metadata["metadatas"]
+        self.vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+        if self.vectors.shape[0] != len(self.documents):
+            raise ValueError(f"índice inconsistente: {self.vectors.shape[0]} vetores e {len(self.documents)} documentos")
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, queries: np.ndarray, n_results: int = 5) -> list[list[tuple[int, float]]]:
+        """
+        Top-k por similaridade de cosseno para um lote de consultas: um produto
+        de matrizes e uma seleção parcial (`argpartition`) por linha.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        scores = queries @ self.vectors.T
+        k = min(n_results, scores.shape[1])
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row[candidates])]
+            results.append([(int(i), float(row[i])) for i in ordered])
+        return results
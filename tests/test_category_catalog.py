@@ -0,0 +1,16 @@
+from src import category_catalog, category_hierarchy
+
+
+def test_rag_path_does_not_wait_for_bigquery(monkeypatch):
+    started = []
+
+    def scan():
+        raise AssertionError("varredura síncrona do BigQuery")
+
+    monkeypatch.setattr(category_catalog, "_catalog", None)
+    monkeypatch.setattr(category_catalog, "_load_snapshot", lambda: None)
+    monkeypatch.setattr(category_catalog, "_load_from_bigquery", scan)
+    monkeypatch.setattr(category_catalog, "_refresh_in_background", lambda: started.append(1))
+
+    assert category_hierarchy.format_context([("Iluminação Pública", "categoria")], wait=False) is None
+    assert started == [1]
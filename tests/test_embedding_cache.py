@@ -0,0 +1,29 @@
+import numpy as np
+from src import embedding_cache
+
+
+def test_refresh_bypasses_and_replaces_cached_vectors(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_embeddings(texts):
+        calls.append(list(texts))
+        return [[float(len(calls)), 0.0] for _ in texts]
+
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_INDEX_PATH", tmp_path / "index.sqlite")
+    monkeypatch.setattr(embedding_cache, "_embedding_fn", lambda model: fake_embeddings)
+    monkeypatch.setattr(embedding_cache, "_memory", embedding_cache.OrderedDict())
+    monkeypatch.setattr(embedding_cache, "_vectors", {})
+    monkeypatch.setattr(embedding_cache._config, "EMBEDDING_CACHE_ENABLED", True)
+
+    first = embedding_cache.embed_texts(["Iluminação Pública"], "modelo")
+    assert np.array_equal(embedding_cache.embed_texts(["Iluminação Pública"], "modelo"), first)
+    assert len(calls) == 1
+
+    refreshed = embedding_cache.embed_texts(["Iluminação Pública"], "modelo", refresh=True)
+    assert len(calls) == 2 and refreshed[0][0] == 2.0
+
+    # O vetor recalculado substitui o anterior na memória e no disco
+    embedding_cache._memory.clear()
+    assert np.array_equal(embedding_cache.embed_texts(["Iluminação Pública"], "modelo"), refreshed)
+    assert len(calls) == 2
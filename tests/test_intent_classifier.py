@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from src import intent_classifier
+from src.intent_classifier import IntentClassifier, case_plan, rule_decision
+
+VECTORS = {
+    "quantos chamados de buraco em 2024": [1.0, 0.0, 0.0],
+    "total de chamados por bairro": [0.95, 0.3, 0.0],
+    "oi, tudo bem?": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.mark.parametrize("question, plan", [
+    ("Oi, tudo bem?", "chat"),
+    ("Obrigado!", "chat"),
+    ("Quantos chamados de 'Reparo de Buraco' em 2024?", "sql_contextual"),
+    ("Bom dia, quantos chamados foram abertos em 2023?", None),
+    ("Quais os bairros com mais chamados?", None),
+])
+def test_rule_decision(question, plan):
+    decision = rule_decision(question)
+    assert (decision and decision["plan"]) == plan
+
+
+@pytest.mark.parametrize("case, plan", [
+    ({"expected_plan": "chat", "expected_sql": "SELECT 1"}, "chat"),
+    ({"expected_sql": None}, "chat"),
+    ({"expected_sql": "SELECT 1", "category": "filtro_categorico"}, "sql_contextual"),
+    ({"expected_sql": "SELECT 1", "category": "contagem_simples"}, "sql_direct"),
+])
+def test_case_plan(case, plan):
+    assert case_plan(case) == plan
+
+
+def test_excluded_example_does_not_match_itself(monkeypatch):
+    monkeypatch.setattr(
+        intent_classifier, "embed_texts",
+        lambda texts, model: np.array([VECTORS[text] for text in texts], dtype=np.float32),
+    )
+    monkeypatch.setattr(intent_classifier._config, "INTENT_CLASSIFIER_MIN_EXAMPLES", 1)
+    monkeypatch.setattr(intent_classifier._config, "INTENT_CLASSIFIER_K", 1)
+    monkeypatch.setattr(intent_classifier._config, "INTENT_CLASSIFIER_MIN_SIMILARITY", 0.5)
+    classifier = IntentClassifier([
+        {"question": "quantos chamados de buraco em 2024", "plan": "sql_contextual"},
+        {"question": "total de chamados por bairro", "plan": "sql_direct"},
+        {"question": "oi, tudo bem?", "plan": "chat"},
+    ])
+
+    assert classifier.predict("quantos chamados de buraco em 2024")["plan"] == "sql_contextual"
+    assert classifier.predict("quantos chamados de buraco em 2024", exclude=0)["plan"] == "sql_direct"
@@ -0,0 +1,57 @@
+import duckdb
+import pytest
+from src.local_mirror import translate_bigquery_sql
+from src.config import CHAMADOS_TABLE_FULL_PATH
+
+CHAMADO = f"`{CHAMADOS_TABLE_FULL_PATH}`"
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE DATE(data_inicio) = '2024-01-01'",
+        "SELECT COUNT(*) FROM chamado WHERE CAST(data_inicio AS DATE) = '2024-01-01'",
+    ),
+    (
+        f"SELECT DATE_TRUNC(data_inicio, MONTH) AS mes FROM {CHAMADO}",
+        "SELECT DATE_TRUNC('month', data_inicio) AS mes FROM chamado",
+    ),
+    (
+        f"SELECT DATE_DIFF(data_fim, data_inicio, DAY) FROM {CHAMADO}",
+        "SELECT DATE_DIFF('day', data_inicio, data_fim) FROM chamado",
+    ),
+    (
+        f"SELECT FORMAT_DATE('%Y-%m', DATE(data_inicio)) FROM {CHAMADO}",
+        "SELECT STRFTIME(CAST(data_inicio AS DATE), '%Y-%m') FROM chamado",
+    ),
+    (
+        f"SELECT COUNTIF(status = 'Fechado'), SAFE_CAST(id_bairro AS INT64) FROM {CHAMADO}",
+        "SELECT COUNT_IF(status = 'Fechado'), TRY_CAST(id_bairro AS BIGINT) FROM chamado",
+    ),
+    # Aspas duplas delimitam strings no BigQuery e identificadores no DuckDB
+    (
+        f'SELECT COUNT(*) FROM {CHAMADO} WHERE tipo = "Buraco"',
+        "SELECT COUNT(*) FROM chamado WHERE tipo = 'Buraco'",
+    ),
+    (
+        f'SELECT COUNT(*) FROM {CHAMADO} WHERE subtipo = "Caixa d\'água" OR tipo = \'Poda d\\\'árvore\'',
+        "SELECT COUNT(*) FROM chamado WHERE subtipo = 'Caixa d''água' OR tipo = 'Poda d''árvore'",
+    ),
+    # Conteúdo dos literais não é reescrito
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE tipo = 'DATE(x) AS STRING' AND descricao = \"`a`\"",
+        "SELECT COUNT(*) FROM chamado WHERE tipo = 'DATE(x) AS STRING' AND descricao = '`a`'",
+    ),
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE REGEXP_CONTAINS(tipo, r'^\\d+$')",
+        "SELECT COUNT(*) FROM chamado WHERE REGEXP_MATCHES(tipo, '^\\d+$')",
+    ),
+])
+def test_translate_bigquery_sql(sql, expected):
+    assert translate_bigquery_sql(sql) == expected
+
+
+def test_double_quoted_literal_runs_on_duckdb():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE chamado AS SELECT 'Buraco' AS tipo UNION ALL SELECT 'Poda' AS tipo")
+    sql = translate_bigquery_sql(f'SELECT COUNT(*) FROM {CHAMADO} WHERE tipo = "Buraco"')
+    assert conn.execute(sql).fetchone()[0] == 1
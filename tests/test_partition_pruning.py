@@ -0,0 +1,70 @@
+import pytest
+from src import partition_pruning
+from src.config import CHAMADOS_TABLE_FULL_PATH
+
+CHAMADO = f"`{CHAMADOS_TABLE_FULL_PATH}`"
+ENTRY = {
+    "columns": [
+        {"name": "id_chamado", "type": "STRING"},
+        {"name": "data_inicio", "type": "DATETIME"},
+        {"name": "tipo", "type": "STRING"},
+        {"name": "data_particao", "type": "DATE"},
+    ],
+    "partitioning": {"field": "data_particao", "type": "MONTH"},
+}
+
+
+@pytest.fixture(autouse=True)
+def table_entry(monkeypatch, tmp_path):
+    monkeypatch.setattr(partition_pruning, "get_table_entry", lambda path: ENTRY)
+    monkeypatch.setattr(partition_pruning, "PARTITION_STATS_PATH", tmp_path / "partition_pruning.jsonl")
+    monkeypatch.setattr(partition_pruning._config, "PARTITION_FIELD_DERIVED", True)
+
+
+@pytest.mark.parametrize("sql, expected, status", [
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE DATE(data_inicio) = '2024-03-10'",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE (data_inicio >= '2024-03-10' AND data_inicio < '2024-03-11') "
+        "AND data_particao >= '2024-03-01' AND data_particao < '2024-03-11'",
+        "bounded",
+    ),
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE EXTRACT(YEAR FROM data_inicio) = 2023 GROUP BY tipo",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE (data_inicio >= '2023-01-01' AND data_inicio < '2024-01-01') "
+        "AND data_particao >= '2023-01-01' AND data_particao < '2024-01-01' GROUP BY tipo",
+        "bounded",
+    ),
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE FORMAT_DATE('%Y-%m', data_inicio) = '2024-12'",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE (data_inicio >= '2024-12-01' AND data_inicio < '2025-01-01') "
+        "AND data_particao >= '2024-12-01' AND data_particao < '2025-01-01'",
+        "bounded",
+    ),
+    (
+        # Um limite de um só lado do OR não restringe a consulta toda
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE data_inicio >= '2024-01-01' AND tipo = 'A' OR tipo = 'B'",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE data_inicio >= '2024-01-01' AND tipo = 'A' OR tipo = 'B'",
+        "non_sargable",
+    ),
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE (data_inicio >= '2024-01-01' OR tipo = 'B')",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE (data_inicio >= '2024-01-01' OR tipo = 'B')",
+        "non_sargable",
+    ),
+    (
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE tipo = 'A'",
+        f"SELECT COUNT(*) FROM {CHAMADO} WHERE tipo = 'A'",
+        "full_scan",
+    ),
+])
+def test_analyze(sql, expected, status):
+    result = partition_pruning.analyze(sql)
+    assert result["sql"] == expected
+    assert result["status"] == status
+
+
+def test_derived_partition_filter_is_opt_in(monkeypatch):
+    monkeypatch.setattr(partition_pruning._config, "PARTITION_FIELD_DERIVED", False)
+    result = partition_pruning.analyze(f"SELECT COUNT(*) FROM {CHAMADO} WHERE data_inicio >= '2024-01-01'")
+    assert result["sql"] == f"SELECT COUNT(*) FROM {CHAMADO} WHERE data_inicio >= '2024-01-01'"
+    assert not result["partition_filter_added"]
@@ -0,0 +1,64 @@
+import pytest
+from src import question_cache
+
+CATALOG = {
+    "loaded_at": 1.0,
+    "columns": {
+        "categoria": [["Serviço", 10]],
+        "tipo": [["Iluminação Pública", 5], ["Poluição Sonora", 3]],
+        "subtipo": [["Reparo de lâmpada apagada", 4], ["Perturbação do sossego", 3]],
+    },
+    "hierarchy": [],
+    "bairros": ["Copacabana", "Barra da Tijuca", "Campo Grande"],
+}
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    monkeypatch.setattr(question_cache.category_catalog, "loaded", lambda: CATALOG)
+    monkeypatch.setattr(question_cache, "_vocabulary", None)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Quantos chamados foram abertos em 2023?", "Número de chamados abertos em 2023"),
+    ("Chamados de iluminação pública em Copacabana", "Quantos chamados de iluminação pública houve em Copacabana?"),
+    ("Bairros com mais chamados em janeiro de 2024", "Quais bairros tiveram mais chamados em janeiro de 2024?"),
+])
+def test_paraphrases_share_reuse_terms(first, second):
+    assert question_cache.reuse_terms(first) == question_cache.reuse_terms(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Quantos chamados foram abertos em 2023?", "Quantos chamados foram abertos em 2024?"),
+    ("Chamados abertos em janeiro de 2024", "Chamados abertos em fevereiro de 2024"),
+    ("Bairros com mais chamados em 2024", "Bairros com menos chamados em 2024"),
+    ("Chamados de iluminação pública em Copacabana", "Chamados de iluminação pública em Campo Grande"),
+    ("Chamados de iluminação pública em 2023", "Chamados de poluição sonora em 2023"),
+    ("Chamados de 'Reparo de lâmpada apagada'", "Chamados de 'Perturbação do sossego'"),
+])
+def test_different_questions_differ_in_reuse_terms(first, second):
+    assert question_cache.reuse_terms(first) != question_cache.reuse_terms(second)
+
+
+def test_concurrent_stores_keep_rows_and_vectors_aligned(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+
+    def embed(texts, model):
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+    monkeypatch.setattr(question_cache, "QUESTION_CACHE_PATH", tmp_path / "question_cache.sqlite")
+    monkeypatch.setattr(question_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(question_cache, "embed_texts", embed)
+    monkeypatch.setattr(question_cache._config, "QUESTION_CACHE_ENABLED", True)
+    monkeypatch.setattr(question_cache, "_entries", None)
+    monkeypatch.setattr(question_cache, "_matrix", None)
+
+    questions = [f"pergunta {'x' * i}" for i in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda q: question_cache.store(q, "sql_direct", "SELECT 1", []), questions))
+
+    entries, matrix = question_cache._load()
+    assert len(entries) == len(questions) == matrix.shape[0]
+    expected = question_cache.normalize_rows(embed([entry["question"] for entry in entries], None))
+    assert np.allclose(matrix, expected)
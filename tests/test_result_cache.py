@@ -0,0 +1,44 @@
+import pytest
+from src import result_cache
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (
+        "SELECT  COUNT(*)\nFROM `a.b.c` AS x WHERE x.tipo = 'Abc' -- comentário\n;",
+        "select count(*)from `a.b.c` t0 where t0.tipo='Abc'",
+    ),
+    (
+        "select count(*) from `a.b.c` y where y.tipo = 'Abc'",
+        "select count(*)from `a.b.c` t0 where t0.tipo='Abc'",
+    ),
+    (
+        "SELECT nome FROM `a.b.c` c JOIN `d.e.f` b ON c.id = b.id WHERE b.nome = 'C.ID'",
+        "select nome from `a.b.c` t0 join `d.e.f` t1 on t0.id=t1.id where t1.nome='C.ID'",
+    ),
+    (
+        "SELECT /* x */ tipo FROM `A.B.C` WHERE tipo = 'Abc'",
+        "select tipo from `a.b.c` where tipo='Abc'",
+    ),
+])
+def test_canonicalize_sql(sql, expected):
+    assert result_cache.canonicalize_sql(sql) == expected
+
+
+def test_literal_case_changes_the_key():
+    assert result_cache.canonicalize_sql("SELECT 1 WHERE a = 'X'") != result_cache.canonicalize_sql("SELECT 1 WHERE a = 'x'")
+
+
+def test_lookup_treats_unverifiable_entries_as_misses(monkeypatch, tmp_path):
+    sql = "SELECT COUNT(*) AS n FROM `datario.adm_central_atendimento_1746.chamado`"
+    monkeypatch.setattr(result_cache._config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_PATH", tmp_path / "result_cache.sqlite")
+    monkeypatch.setattr(result_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(result_cache, "_tables_modified", lambda tables: {table: "v1" for table in tables})
+    result_cache.store(sql, [{"n": 1}])
+    assert result_cache.lookup(sql) == [{"n": 1}]
+
+    def unavailable(tables):
+        raise ConnectionError("rede indisponível")
+
+    monkeypatch.setattr(result_cache, "_tables_modified", unavailable)
+    assert result_cache.lookup(sql) is None
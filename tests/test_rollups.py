@@ -0,0 +1,64 @@
+import pytest
+from src import rollups
+from src.config import CHAMADOS_TABLE_FULL_PATH, BAIRROS_TABLE_FULL_PATH, ROLLUP_TABLE_FULL_PATH
+
+CHAMADO = f"`{CHAMADOS_TABLE_FULL_PATH}`"
+BAIRRO = f"`{BAIRROS_TABLE_FULL_PATH}`"
+ROLLUP = f"`{ROLLUP_TABLE_FULL_PATH}`"
+SOURCE_COLUMNS = ["id_chamado", "data_inicio", "data_fim", "categoria", "tipo", "subtipo", "id_bairro", "status", "data_particao"]
+JOINED_COLUMNS = ["id_bairro", "nome", "subprefeitura"]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (
+        f"SELECT tipo, COUNT(*) AS n FROM {CHAMADO} GROUP BY tipo",
+        f"SELECT tipo, COALESCE(SUM(n_chamados), 0) AS n FROM {ROLLUP} GROUP BY tipo",
+    ),
+    (
+        f"SELECT COUNT(DISTINCT c.id_chamado) AS n FROM {CHAMADO} c WHERE EXTRACT(YEAR FROM c.data_inicio) = 2023",
+        f"SELECT COALESCE(SUM(c.n_chamados), 0) AS n FROM {ROLLUP} c WHERE EXTRACT(YEAR FROM c.data) = 2023",
+    ),
+    (
+        f"SELECT COUNT(1) AS n FROM {CHAMADO} WHERE data_inicio >= '2024-01-01' AND data_inicio < '2024-02-01'",
+        f"SELECT COALESCE(SUM(n_chamados), 0) AS n FROM {ROLLUP} WHERE data >= '2024-01-01' AND data < '2024-02-01'",
+    ),
+    (
+        f"SELECT COUNT(DISTINCT subtipo) AS n FROM {CHAMADO}",
+        f"SELECT COUNT(DISTINCT subtipo) AS n FROM {ROLLUP}",
+    ),
+    (
+        f"SELECT b.nome, COUNT(*) AS n FROM {CHAMADO} c JOIN {BAIRRO} b ON c.id_bairro = b.id_bairro GROUP BY b.nome",
+        f"SELECT b.nome, COALESCE(SUM(n_chamados), 0) AS n FROM {ROLLUP} c JOIN {BAIRRO} b ON c.id_bairro = b.id_bairro GROUP BY b.nome",
+    ),
+])
+def test_rewrites_eligible_counts(sql, expected):
+    assert rollups.rewrite_for_rollup(sql, SOURCE_COLUMNS, JOINED_COLUMNS) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    # COUNT de outra coluna contaria as linhas dos agregados
+    f"SELECT tipo, COUNT(subtipo) AS n FROM {CHAMADO} GROUP BY tipo",
+    f"SELECT COUNT(status) AS n FROM {CHAMADO}",
+    f"SELECT COUNT(DISTINCT status) AS n FROM {CHAMADO}",
+    f"SELECT status, COUNT(*) AS n FROM {CHAMADO} GROUP BY status",
+    f"SELECT COUNT(*) AS n FROM {CHAMADO} WHERE data_inicio >= '2024-01-01 12:00:00'",
+    f"SELECT * FROM {CHAMADO} LIMIT 10",
+    f"SELECT AVG(DATE_DIFF(data_fim, data_inicio, DAY)) FROM {CHAMADO}",
+    f"SELECT COUNT(*) FROM (SELECT * FROM {CHAMADO})",
+])
+def test_keeps_ineligible_queries(sql):
+    assert rollups.rewrite_for_rollup(sql, SOURCE_COLUMNS, JOINED_COLUMNS) is None
+
+
+def test_missing_rollup_table_is_remembered(monkeypatch):
+    calls = []
+
+    def missing():
+        calls.append(1)
+        raise RuntimeError("Not found")
+
+    monkeypatch.setattr(rollups, "_table_versions", missing)
+    monkeypatch.setattr(rollups, "_missing_until", 0.0)
+    assert not rollups.rollup_available()
+    assert not rollups.rollup_available()
+    assert len(calls) == 1
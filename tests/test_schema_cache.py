@@ -0,0 +1,61 @@
+import time
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src import schema_cache
+
+
+class SlowClient:
+    """`get_table` que demora para a tabela lenta e conta as chamadas."""
+
+    def __init__(self, slow: str, release: threading.Event):
+        self.slow = slow
+        self.release = release
+        self.calls: list[str] = []
+
+    def get_table(self, table_path):
+        self.calls.append(table_path)
+        if table_path == self.slow:
+            self.release.wait(5)
+        return SimpleNamespace(
+            full_table_id=table_path.replace(".", ":", 1),
+            schema=[SimpleNamespace(name="id", field_type="STRING", description=None)],
+            etag="e1", modified=datetime(2024, 1, 1), time_partitioning=None, clustering_fields=None,
+        )
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    release = threading.Event()
+    client = SlowClient("p.d.lenta", release)
+    monkeypatch.setattr(schema_cache, "get_bq_client", lambda: client)
+    monkeypatch.setattr(schema_cache, "SCHEMA_SNAPSHOT_PATH", tmp_path / "schema_cache.json")
+    monkeypatch.setattr(schema_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(schema_cache, "_entries", {})
+    monkeypatch.setattr(schema_cache, "_fetch_locks", {})
+    monkeypatch.setattr(schema_cache, "_snapshot_loaded", True)
+    yield client
+    release.set()
+
+
+def test_slow_fetch_does_not_block_other_tables(client):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow = pool.submit(schema_cache.get_table_entry, "p.d.lenta")
+        time.sleep(0.05)
+        started = time.perf_counter()
+        assert schema_cache.get_table_entry("p.d.rapida")["table_id"] == "p.d.rapida"
+        assert time.perf_counter() - started < 1
+        client.release.set()
+        assert slow.result()["table_id"] == "p.d.lenta"
+
+
+def test_concurrent_requests_for_a_table_share_one_fetch(client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(schema_cache.get_table_entry, "p.d.lenta") for _ in range(8)]
+        time.sleep(0.05)
+        client.release.set()
+        entries = [future.result() for future in futures]
+    assert client.calls == ["p.d.lenta"]
+    assert all(entry is entries[0] for entry in entries)